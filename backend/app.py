@@ -19,13 +19,33 @@ def create_app(config_name=None):
     config_name = config_name or os.environ.get('FLASK_ENV', 'development')
     app.config.from_object(config[config_name])
     
-    # Initialize extensions
+    # Initialize extensions (read replicas are extra binds routed by utils.replicas,
+    # pool settings and metrics come from utils.db_pool, per-request SQL counts and
+    # Server-Timing from utils.request_metrics)
     from models import db
+    from utils.replicas import replica_binds, init_replicas
+    from utils.db_pool import engine_options, init_pool_metrics
+    from utils.request_metrics import init_request_metrics
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+        **replica_binds(app.config['REPLICA_DATABASE_URLS'])
+    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
     db.init_app(app)
+    init_pool_metrics(app)
+    # Metrics hooks go first so the timings cover the replica hook (JWT and revocation sync)
+    init_request_metrics(app)
+    init_replicas(app)
     
     # Initialize JWT
     jwt = JWTManager(app)
     
+    from utils.revocation import is_token_revoked
+    jwt.token_in_blocklist_loader(is_token_revoked)
+    
     # Initialize Flask-Mail
     from utils.email import mail
     mail.init_app(app)
@@ -37,14 +57,9 @@ def create_app(config_name=None):
         'http://localhost:3000'
     ], supports_credentials=True)
     
-    # Initialize rate limiter
-    from flask_limiter import Limiter
-    from flask_limiter.util import get_remote_address
-    limiter = Limiter(
-        key_func=get_remote_address,
-        app=app,
-        default_limits=["200 per day", "50 per hour"]
-    )
+    # Initialize rate limiter (policies come from RATELIMIT_* config)
+    from utils.rate_limit import limiter
+    limiter.init_app(app)
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -63,14 +78,27 @@ def create_app(config_name=None):
     app.register_blueprint(leaderboard_bp)
     app.register_blueprint(admin_bp)
     
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
+    
+    # Password hashing backpressure
+    from utils.passwords import HashingBusy
+    
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(error):
+        return {'error': 'Server is busy, please retry'}, 503, {'Retry-After': str(error.retry_after)}
+    
     # Health check endpoint
     @app.route('/api/health')
     def health_check():
         return {'status': 'healthy', 'version': '1.0.0'}
     
-    # Create tables on first request (development only)
-    with app.app_context():
-        db.create_all()
+    # Development and tests create tables at boot; production runs `flask db upgrade` on deploy.
+    # Only on the primary: replicas get their schema through replication
+    if app.config['AUTO_CREATE_TABLES']:
+        with app.app_context():
+            db.create_all(bind_key=None)
     
     return app
 
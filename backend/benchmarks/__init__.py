@@ -0,0 +1,5 @@
+"""
+SoundWars Flask API - Benchmarks
+
+Run from the backend/ directory, e.g. `python -m benchmarks.login_throughput`.
+"""
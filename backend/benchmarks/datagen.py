@@ -0,0 +1,261 @@
+"""
+Synthetic Data Generator
+
+Bulk-loads an empty database with users, paid artists, monthly contests,
+songs and votes, reproducibly from --seed. Rows go straight to the DB-API
+cursor with executemany in chunks, skipping the ORM, so a million votes
+load in seconds on SQLite. Indexes are dropped for the load and rebuilt
+at the end. Vote counts, contest winners and the dashboard counters are
+filled in afterwards so every endpoint sees consistent data.
+
+The last contest is active and in its voting phase. Users vote once per
+contest with probability --participation, for songs picked from a
+long-tailed popularity distribution.
+
+    python -m benchmarks.datagen --users 100000 --contests 12 --database-url sqlite:////tmp/bench.db
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+PASSWORD = 'Benchmark1!'
+CHUNK_SIZE = 50000
+LOADED_TABLES = ('users', 'payments', 'artists', 'contests', 'songs', 'votes', 'contest_winners')
+GENRES = ('afrobeats', 'hip-hop', 'gospel', 'highlife', 'r&b', 'pop', 'amapiano', 'reggae')
+
+
+class Loader:
+    """executemany over a raw DB-API connection, in chunks"""
+
+    def __init__(self, engine):
+        self.dialect = engine.dialect
+        self.connection = engine.raw_connection()
+        self.placeholder = '?' if self.dialect.paramstyle == 'qmark' else '%s'
+        self.sqlite = self.dialect.name == 'sqlite'
+        self.rows = Counter()
+        if self.sqlite:
+            cursor = self.connection.cursor()
+            cursor.execute('PRAGMA synchronous=OFF')
+            cursor.close()
+
+    def value(self, value):
+        """Adapt a datetime the way SQLAlchemy stores it on SQLite"""
+        if self.sqlite and isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+        return value
+
+    def _run(self, sql: str, rows) -> int:
+        cursor = self.connection.cursor()
+        count = 0
+        iterator = iter(rows)
+        while True:
+            chunk = list(itertools.islice(iterator, CHUNK_SIZE))
+            if not chunk:
+                break
+            cursor.executemany(sql, chunk)
+            count += len(chunk)
+        cursor.close()
+        return count
+
+    def insert(self, table: str, columns: tuple, rows) -> int:
+        quote = self.dialect.identifier_preparer.quote
+        sql = (f"INSERT INTO {quote(table)} ({', '.join(quote(column) for column in columns)}) "
+               f"VALUES ({', '.join([self.placeholder] * len(columns))})")
+        count = self._run(sql, rows)
+        self.rows[table] += count
+        return count
+
+    def update(self, sql: str, rows) -> int:
+        return self._run(sql.replace('?', self.placeholder), rows)
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def generate(users: int = 100000, artists: int = 1000, contests: int = 12, entry_rate: float = 0.6,
+             participation: float = 0.85, seed: int = 0, log=None) -> dict:
+    """
+    Fill the current app's (empty) database
+    User 1 is an admin; the last `artists` users are paid, verified artists.
+    Returns: row counts, load time, and ids to build requests from (admin, voters who
+    have not voted in the active contest yet, an artist, songs of the active contest)
+    """
+    from sqlalchemy import func, select
+    from werkzeug.security import generate_password_hash
+    from flask import current_app
+    from models import db, User
+    from utils.stats import rebuild_counters
+
+    if db.session.scalar(select(func.count()).select_from(User)):
+        raise RuntimeError('The database already has users; generate into an empty one')
+    if artists >= users:
+        raise ValueError('artists must be fewer than users')
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    started = time.perf_counter()
+
+    indexes = [index for table in LOADED_TABLES for index in db.metadata.tables[table].indexes]
+    with db.engine.begin() as connection:
+        for index in indexes:
+            index.drop(connection)
+
+    loader = Loader(db.engine)
+    v = loader.value
+
+    def step(message):
+        if log:
+            log(f"{time.perf_counter() - started:6.2f}s {message}")
+
+    try:
+        # One real hash shared by everyone, so login works and costs what it does in production
+        password_hash = generate_password_hash(PASSWORD, method=current_app.config['PASSWORD_HASH_METHOD'])
+        first_artist_user = users - artists + 1
+        loader.insert('users', ('id', 'email', 'username', 'password_hash', 'roles', 'user_version',
+                                'created_at', 'updated_at'), (
+            (i, f"user{i}@bench.example", f"user{i}", password_hash,
+             '["user", "admin"]' if i == 1 else '["user"]', 1, v(now - timedelta(minutes=i % 525600)), v(now))
+            for i in range(1, users + 1)
+        ))
+        step(f"{users} users")
+
+        loader.insert('payments', ('id', 'user_id', 'transaction_id', 'tx_ref', 'flw_ref', 'amount', 'currency',
+                                   'status', 'payment_type', 'payment_purpose', 'created_at', 'verified_at'), (
+            (a, first_artist_user + a - 1, f"bench-{a}", f"SW-BENCH-{a}", f"FLW-BENCH-{a}", 25000, 'NGN',
+             'successful', 'card', 'artist_registration', v(now), v(now))
+            for a in range(1, artists + 1)
+        ))
+        loader.insert('artists', ('id', 'user_id', 'stage_name', 'genre', 'is_paid', 'payment_id', 'is_verified',
+                                  'created_at', 'updated_at'), (
+            (a, first_artist_user + a - 1, f"Artist {a}", rng.choice(GENRES), True, a, True, v(now), v(now))
+            for a in range(1, artists + 1)
+        ))
+        step(f"{artists} artists and payments")
+
+        # Monthly contests; the last one is active and open for voting
+        contest_rows = []
+        for c in range(1, contests + 1):
+            start = now - timedelta(days=30 * (contests - c) + 10)
+            submission_end = start + timedelta(days=9)
+            voting_end = start + timedelta(days=25) if c < contests else now + timedelta(days=14)
+            contest_rows.append((c, f"Contest {c}", 'completed' if c < contests else 'voting',
+                                 v(start), v(submission_end), v(voting_end), c == contests, v(start), v(start)))
+        loader.insert('contests', ('id', 'title', 'phase', 'start_date', 'submission_end_date', 'voting_end_date',
+                                   'is_active', 'created_at', 'updated_at'), contest_rows)
+
+        songs = {}
+        song_rows = []
+        for c in range(1, contests + 1):
+            entrants = [a for a in range(1, artists + 1) if rng.random() < entry_rate] or [1]
+            for a in entrants:
+                song_id = len(song_rows) + 1
+                status = 'approved' if rng.random() < 0.95 else 'rejected'
+                created = now - timedelta(days=30 * (contests - c) + 5)
+                song_rows.append((song_id, a, c, f"Song {song_id}", f"https://cdn.bench.example/{song_id}.mp3",
+                                  rng.randint(90, 300), status, 0, v(created), v(created),
+                                  v(created) if status == 'approved' else None))
+                if status == 'approved':
+                    songs.setdefault(c, []).append(song_id)
+        loader.insert('songs', ('id', 'artist_id', 'contest_id', 'title', 'audio_url', 'duration', 'status',
+                                'vote_count', 'created_at', 'updated_at', 'approved_at'), song_rows)
+        step(f"{contests} contests, {len(song_rows)} songs")
+
+        # Votes: a few songs take most of them
+        vote_counts = Counter()
+        fresh_voters = []
+        next_vote_id = itertools.count(1)
+        ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(4096)]
+
+        for c in range(1, contests + 1):
+            candidates = songs[c]
+            weights = list(itertools.accumulate(1 / (rank ** 1.1) for rank in range(1, len(candidates) + 1)))
+            voters = [u for u in range(1, users + 1) if rng.random() < participation]
+            if c == contests:
+                voted = set(voters)
+                fresh_voters = [u for u in range(2, first_artist_user) if u not in voted][:10000]
+            picks = rng.choices(candidates, cum_weights=weights, k=len(voters))
+            vote_counts.update(picks)
+            opened = now - timedelta(days=30 * (contests - c) + 1)
+            times = [v(opened + timedelta(seconds=rng.randint(0, 86400 * 14))) for _ in range(2048)]
+
+            loader.insert('votes', ('id', 'user_id', 'song_id', 'contest_id', 'ip_address', 'is_quarantined',
+                                    'created_at'), (
+                (next(next_vote_id), user_id, song_id, c, ips[user_id & 4095], False, times[user_id & 2047])
+                for user_id, song_id in zip(voters, picks)
+            ))
+            step(f"contest {c}: {len(voters)} votes")
+
+        loader.update('UPDATE songs SET vote_count = ? WHERE id = ?',
+                      [(count, song_id) for song_id, count in vote_counts.items()])
+
+        winners = []
+        for c in range(1, contests):
+            song_id = max(songs[c], key=lambda s: vote_counts[s])
+            artist_id = song_rows[song_id - 1][1]
+            winners.append((c, c, artist_id, song_id, vote_counts[song_id], 100000,
+                            v(now - timedelta(days=30 * (contests - c) - 15))))
+        loader.insert('contest_winners', ('id', 'contest_id', 'artist_id', 'song_id', 'final_vote_count',
+                                          'prize_amount', 'won_at'), winners)
+        loader.commit()
+        step('vote counts and winners')
+    finally:
+        loader.close()
+
+    with db.engine.begin() as connection:
+        for index in indexes:
+            index.create(connection)
+    step(f"{len(indexes)} indexes rebuilt")
+
+    rebuild_counters()
+    db.session.commit()
+    step('dashboard counters')
+
+    current_songs = songs[contests]
+    return {
+        'seconds': round(time.perf_counter() - started, 2),
+        'rows': dict(loader.rows),
+        'password': PASSWORD,
+        'admin_user_id': 1,
+        'voter_user_ids': list(range(2, min(first_artist_user, 1002))),
+        'fresh_voter_user_ids': fresh_voters,
+        'artist_user_id': first_artist_user,
+        'artist_id': 1,
+        'tx_ref': 'SW-BENCH-1',
+        'current_contest_id': contests,
+        'past_contest_id': max(contests - 1, 1),
+        'song_ids': current_songs[:200]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True, help='Empty database to fill (tables are created)')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--contests', type=int, default=12)
+    parser.add_argument('--participation', type=float, default=0.85, help='Share of users voting in each contest')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import create_app
+    from config import config, TestingConfig
+
+    config['datagen'] = type('DatagenConfig', (TestingConfig,), {'SQLALCHEMY_DATABASE_URI': args.database_url})
+    app = create_app('datagen')
+
+    with app.app_context():
+        dataset = generate(users=args.users, artists=args.artists, contests=args.contests,
+                           participation=args.participation, seed=args.seed, log=print)
+
+    print(json.dumps({'seconds': dataset['seconds'], 'rows': dataset['rows']}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+"""
+Endpoint Benchmark
+
+Generates a dataset (benchmarks.datagen) and calls every blueprint's
+endpoints at each --concurrency level, in-process through the Flask test
+client and over HTTP against a threaded WSGI server (werkzeug) on a
+local port. Each result has p50/p95/p99 latency, throughput and the
+average number of SQL statements per request. JSON goes to stdout, or
+to --output for comparing runs.
+
+Endpoints that call Flutterwave (payments initialize/verify) and admin
+actions that change data are not included. POST /api/votes/cast uses a
+voter who has not voted yet for every request.
+
+    python -m benchmarks.endpoints --users 20000 --concurrency 1,8 --requests 200
+    python -m benchmarks.endpoints --endpoints songs.,leaderboard. --server wsgi --output before.json
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Statement count from the Server-Timing header (utils.request_metrics)
+_QUERY_COUNT = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+# name, method, path, caller, body; paths and bodies are filled per request by Scenario
+ENDPOINTS = [
+    ('health', 'GET', '/api/health', None, None),
+    ('auth.login', 'POST', '/api/auth/login', None, 'login'),
+    ('auth.me', 'GET', '/api/auth/me', 'voter', None),
+    ('artists.list', 'GET', '/api/artists', None, None),
+    ('artists.get', 'GET', '/api/artists/{artist_id}', None, None),
+    ('artists.profile', 'GET', '/api/artists/profile', 'artist', None),
+    ('artists.eligibility', 'GET', '/api/artists/check-eligibility', 'artist', None),
+    ('songs.list', 'GET', '/api/songs', None, None),
+    ('songs.get', 'GET', '/api/songs/{song_id}', None, None),
+    ('songs.my_submissions', 'GET', '/api/songs/my-submissions', 'artist', None),
+    ('leaderboard.current', 'GET', '/api/leaderboard', None, None),
+    ('leaderboard.top', 'GET', '/api/leaderboard/top/10', None, None),
+    ('leaderboard.contest', 'GET', '/api/leaderboard/contest/{past_contest_id}', None, None),
+    ('votes.status', 'GET', '/api/votes/status', 'voter', None),
+    ('votes.my_vote', 'GET', '/api/votes/my-vote', 'voter', None),
+    ('votes.cast', 'POST', '/api/votes/cast', 'fresh_voter', 'vote'),
+    ('payments.status', 'GET', '/api/payments/status/{tx_ref}', 'artist', None),
+    ('admin.dashboard', 'GET', '/api/admin/dashboard', 'admin', None),
+    ('admin.contests', 'GET', '/api/admin/contests', 'admin', None),
+    ('admin.winners', 'GET', '/api/admin/winners', 'admin', None),
+    ('admin.pending_songs', 'GET', '/api/admin/songs/pending', 'admin', None),
+    ('admin.vote_flags', 'GET', '/api/admin/vote-flags', 'admin', None),
+    ('admin.users', 'GET', '/api/admin/users', 'admin', None),
+]
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def query_count(headers) -> int:
+    """SQL statements the request ran, according to its Server-Timing header"""
+    match = _QUERY_COUNT.search(headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+class Scenario:
+    """Hands out tokens, ids and bodies for each request"""
+
+    def __init__(self, app, dataset: dict, fresh_voters_needed: int):
+        from models import User
+        from utils.auth import issue_access_token
+
+        self.dataset = dataset
+        self._lock = threading.Lock()
+        self._counter = 0
+
+        fresh = dataset['fresh_voter_user_ids'][:fresh_voters_needed]
+        wanted = [dataset['admin_user_id'], dataset['artist_user_id']] + dataset['voter_user_ids'][:100] + fresh
+        with app.app_context():
+            users = {user.id: user for user in User.query.filter(User.id.in_(wanted))}
+            token = {user_id: issue_access_token(users[user_id]) for user_id in wanted}
+
+        self.tokens = {
+            'admin': [token[dataset['admin_user_id']]],
+            'artist': [token[dataset['artist_user_id']]],
+            'voter': [token[user_id] for user_id in dataset['voter_user_ids'][:100]]
+        }
+        self.fresh_voter_tokens = [token[user_id] for user_id in fresh]
+
+    def _next(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def request(self, method: str, path: str, caller, body):
+        """(method, path, headers, JSON body) for one call"""
+        n = self._next()
+        dataset = self.dataset
+        url = path.format(
+            song_id=dataset['song_ids'][n % len(dataset['song_ids'])],
+            artist_id=dataset['artist_id'],
+            past_contest_id=dataset['past_contest_id'],
+            tx_ref=dataset['tx_ref']
+        )
+
+        headers = {}
+        if caller == 'fresh_voter':
+            with self._lock:
+                if not self.fresh_voter_tokens:
+                    raise RuntimeError('Out of voters who have not voted yet; generate more users')
+                headers['Authorization'] = f"Bearer {self.fresh_voter_tokens.pop()}"
+        elif caller:
+            tokens = self.tokens[caller]
+            headers['Authorization'] = f"Bearer {tokens[n % len(tokens)]}"
+
+        if body == 'login':
+            user_id = dataset['voter_user_ids'][n % len(dataset['voter_user_ids'])]
+            body = {'email': f"user{user_id}@bench.example", 'password': dataset['password']}
+        elif body == 'vote':
+            body = {'song_id': dataset['song_ids'][n % len(dataset['song_ids'])]}
+
+        return method, url, headers, body
+
+
+class TestClientTransport:
+    name = 'test-client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, method, url, headers, body):
+        response = self.app.test_client().open(url, method=method, headers=headers, json=body)
+        return response.status_code, query_count(response.headers)
+
+    def close(self):
+        pass
+
+
+class WSGIServerTransport:
+    """A threaded werkzeug server on a free local port, called with requests"""
+
+    name = 'wsgi'
+
+    def __init__(self, app):
+        import requests
+        from werkzeug.serving import make_server
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.sessions = threading.local()
+        self.requests = requests
+
+    def __call__(self, method, url, headers, body):
+        session = getattr(self.sessions, 'session', None)
+        if session is None:
+            session = self.sessions.session = self.requests.Session()
+        response = session.request(method, self.base_url + url, headers=headers, json=body, timeout=60)
+        return response.status_code, query_count(response.headers)
+
+    def close(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+def measure(transport, scenario: Scenario, endpoint: tuple, requests: int, concurrency: int) -> dict:
+    name, method, path, caller, body = endpoint
+
+    def call(_):
+        request = scenario.request(method, path, caller, body)
+        started = time.perf_counter()
+        try:
+            status, queries = transport(*request)
+        except Exception:
+            # The test client re-raises view errors (TESTING); count them like a 500
+            status, queries = 500, 0
+        return time.perf_counter() - started, status, queries
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - began
+
+    latencies = sorted(latency for latency, _, _ in results)
+    statuses = Counter(status for _, status, _ in results)
+    return {
+        'endpoint': name,
+        'method': method,
+        'path': path,
+        'server': transport.name,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(requests / elapsed, 1),
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(_percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(_percentile(latencies, 0.99) * 1000, 2),
+            'mean': round(statistics.fmean(latencies) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2)
+        },
+        'queries_per_request': round(statistics.fmean(queries for _, _, queries in results), 1)
+    }
+
+
+def run(args) -> dict:
+    from sqlalchemy.engine import make_url
+    from app import create_app
+    from config import config, TestingConfig
+    from models import db
+    from benchmarks.datagen import generate
+
+    workdir = None
+    database_url = args.database_url
+    if not database_url:
+        workdir = tempfile.mkdtemp()
+        database_url = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+
+    endpoints = [endpoint for endpoint in ENDPOINTS
+                 if not args.endpoints or any(endpoint[0].startswith(prefix) for prefix in args.endpoints.split(','))]
+    levels = [int(level) for level in args.concurrency.split(',')]
+    servers = ['test-client', 'wsgi'] if args.server == 'both' else [args.server]
+
+    # One process serves every concurrent request, so the pool must cover the highest level
+    config['endpoint_benchmark'] = type('EndpointBenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'DB_POOL_SIZE': max(levels),
+        'DB_POOL_MAX_OVERFLOW': max(levels),
+        'RATELIMIT_ENABLED': False,
+        'REQUEST_METRICS_ENABLED': True,
+        'REQUEST_METRICS_SERVER_TIMING': True,
+        'REQUEST_METRICS_QUERY_THRESHOLD': 0,
+        'PASSWORD_HASH_SLOTS': args.hash_slots,
+        'PASSWORD_HASH_SLOT_DIR': os.path.join(tempfile.gettempdir(), 'soundwars-benchmark-hash-slots')
+    })
+    app = create_app('endpoint_benchmark')
+
+    try:
+        with app.app_context():
+            dataset = generate(users=args.users, artists=args.artists, contests=args.contests,
+                               participation=args.participation, seed=args.seed)
+
+        votes_needed = (args.requests + 1) * len(levels) * len(servers) if any(
+            endpoint[0] == 'votes.cast' for endpoint in endpoints) else 0
+        scenario = Scenario(app, dataset, votes_needed)
+
+        results = []
+        for server in servers:
+            transport = TestClientTransport(app) if server == 'test-client' else WSGIServerTransport(app)
+            try:
+                for endpoint in endpoints:
+                    measure(transport, scenario, endpoint, 1, 1)  # warm-up
+                    for concurrency in levels:
+                        results.append(measure(transport, scenario, endpoint, args.requests, concurrency))
+                        if args.verbose:
+                            result = results[-1]
+                            print(f"{server:11} {endpoint[0]:22} c={concurrency:<3} "
+                                  f"p50={result['latency_ms']['p50']:8.2f}ms p99={result['latency_ms']['p99']:8.2f}ms "
+                                  f"{result['throughput_rps']:8.1f} req/s {result['queries_per_request']:6.1f} queries "
+                                  f"{result['errors']} errors", flush=True)
+            finally:
+                transport.close()
+
+        return {
+            'dataset': {
+                'database': make_url(database_url).get_backend_name(),
+                'users': args.users,
+                'artists': args.artists,
+                'contests': args.contests,
+                'participation': args.participation,
+                'seed': args.seed,
+                'rows': dataset['rows'],
+                'load_seconds': dataset['seconds']
+            },
+            'requests': args.requests,
+            'results': results
+        }
+    finally:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        if workdir:
+            shutil.rmtree(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='Empty database to fill (default: a temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--contests', type=int, default=12)
+    parser.add_argument('--participation', type=float, default=0.85)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--endpoints', default='', help='Comma-separated name prefixes, e.g. songs.,votes.cast')
+    parser.add_argument('--server', choices=['test-client', 'wsgi', 'both'], default='both')
+    parser.add_argument('--concurrency', default='1,8', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and level')
+    parser.add_argument('--hash-slots', type=int, default=os.cpu_count() or 1, help='PASSWORD_HASH_SLOTS (login)')
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    parser.add_argument('--verbose', action='store_true', help='Print one line per measurement as it finishes')
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
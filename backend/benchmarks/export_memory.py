@@ -0,0 +1,164 @@
+"""
+Export Memory Check
+
+Generates a dataset at each --users size and streams every admin export
+(each table, NDJSON and CSV, plain and gzipped) through the real route.
+Each export runs in a fresh process that resets its peak RSS after
+startup (/proc/self/clear_refs on Linux, so the peak of importing numpy
+and friends does not hide the export) and reports how far the peak
+rises above the RSS it had before the export.
+
+Exports stream in fixed-size partitions, so the rise must stay flat while
+the tables grow: at the largest size it may exceed the smallest size's by
+at most --tolerance-mb. Prints the measurements as JSON and exits with
+status 1 if any export fails the check.
+
+    python -m benchmarks.export_memory --users 2000,20000 --tolerance-mb 8
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+JWT_SECRET = 'benchmark-jwt-secret-of-at-least-32-bytes'
+TABLES = ('users', 'songs', 'votes', 'payments')
+FORMATS = ('ndjson', 'csv')
+
+
+def _reset_peak_rss() -> bool:
+    """Set the kernel's peak RSS to the current RSS; False where unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss cannot be reset; it is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _create_app(database_url: str):
+    from app import create_app
+    from config import config, TestingConfig
+
+    config['export_memory'] = type('ExportMemoryConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'JWT_SECRET_KEY': JWT_SECRET,
+        'RATELIMIT_ENABLED': False,
+        'REQUEST_METRICS_ENABLED': False
+    })
+    return create_app('export_memory')
+
+
+def measure():
+    """Child process: stream one export and print its size and RSS as JSON (settings from BENCH_*)"""
+    app = _create_app(os.environ['BENCH_DATABASE_URL'])
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {os.environ['BENCH_TOKEN']}"}
+
+    # Warm up imports, the connection pool and the JWT/principal path
+    client.get('/api/admin/export/users?status=none', headers=headers).close()
+    resettable = _reset_peak_rss()
+    baseline = _peak_rss_mb()
+
+    response = client.get(os.environ['BENCH_EXPORT_PATH'], headers=headers, buffered=False)
+    size = 0
+    for chunk in response.iter_encoded():
+        size += len(chunk)
+    response.close()
+
+    print(json.dumps({
+        'status': response.status_code,
+        'bytes': size,
+        'baseline_mb': round(baseline, 1),
+        'peak_mb': round(_peak_rss_mb(), 1),
+        'peak_reset': resettable
+    }))
+
+
+def run_export(database_url: str, token: str, path: str) -> dict:
+    env = {
+        **os.environ,
+        'BENCH_DATABASE_URL': database_url,
+        'BENCH_TOKEN': token,
+        'BENCH_EXPORT_PATH': path
+    }
+    output = subprocess.run(
+        [sys.executable, '-c', 'from benchmarks.export_memory import measure; measure()'],
+        env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['rise_mb'] = round(result['peak_mb'] - result['baseline_mb'], 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', default='2000,20000', help='Comma-separated dataset sizes, smallest first')
+    parser.add_argument('--contests', type=int, default=6)
+    parser.add_argument('--tolerance-mb', type=float, default=8.0,
+                        help='Allowed growth of the RSS rise from the smallest to the largest dataset')
+    args = parser.parse_args()
+
+    from models import db, User
+    from utils.auth import issue_access_token
+    from benchmarks.datagen import generate
+
+    sizes = [int(size) for size in args.users.split(',')]
+    exports = [
+        f"/api/admin/export/{table}?format={fmt}&gzip={str(gzip).lower()}"
+        for table in TABLES for fmt in FORMATS for gzip in (False, True)
+    ]
+    workdir = tempfile.mkdtemp()
+    datasets = []
+
+    try:
+        for users in sizes:
+            database_url = f"sqlite:///{os.path.join(workdir, f'export-{users}.db')}"
+            app = _create_app(database_url)
+            with app.app_context():
+                dataset = generate(users=users, artists=max(users // 40, 1), contests=args.contests)
+                token = issue_access_token(db.session.get(User, dataset['admin_user_id']))
+                db.engine.dispose()
+
+            datasets.append({
+                'users': users,
+                'rows': dataset['rows'],
+                'exports': {path: run_export(database_url, token, path) for path in exports}
+            })
+    finally:
+        shutil.rmtree(workdir)
+
+    smallest, largest = datasets[0], datasets[-1]
+    checks = {}
+    for path in exports:
+        small, large = smallest['exports'][path], largest['exports'][path]
+        checks[path] = (
+            small['status'] == large['status'] == 200
+            and large['bytes'] > small['bytes']
+            and large['rise_mb'] - small['rise_mb'] <= args.tolerance_mb
+        )
+
+    print(json.dumps({'tolerance_mb': args.tolerance_mb, 'datasets': datasets, 'checks': checks}, indent=2))
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
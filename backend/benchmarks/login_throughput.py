@@ -0,0 +1,171 @@
+"""
+Login Throughput Benchmark
+
+Runs gunicorn with --processes sync workers (as deployed) against a
+throwaway SQLite database and sends a storm of logins from --concurrency
+client threads, while one more thread keeps calling /api/health. For
+each process count and PASSWORD_HASH_SLOTS value it reports logins per
+second, 503s from the hashing slots, and health check latency, which
+shows whether the rest of the API stays responsive during the storm.
+
+    python -m benchmarks.login_throughput --processes 2,4 --slots 0,1,2 --requests 200 --concurrency 16
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD = 'Benchmark1!'
+EMAIL = 'bench@example.com'
+
+
+def build_app():
+    """Gunicorn app factory; settings come from the BENCH_* variables set by run()"""
+    from app import create_app
+    from config import config, TestingConfig
+
+    config['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': os.environ['BENCH_DATABASE_URL'],
+        'AUTO_CREATE_TABLES': False,
+        'JWT_SECRET_KEY': 'benchmark-jwt-secret-of-at-least-32-bytes',
+        'PASSWORD_HASH_METHOD': os.environ['BENCH_HASH_METHOD'],
+        'PASSWORD_HASH_SLOTS': int(os.environ['BENCH_HASH_SLOTS']),
+        'PASSWORD_HASH_SLOT_DIR': os.environ['BENCH_HASH_SLOT_DIR'],
+        'PASSWORD_HASH_WAIT': float(os.environ['BENCH_HASH_WAIT']),
+        'RATELIMIT_ENABLED': False,
+        'REQUEST_METRICS_ENABLED': False
+    })
+    return create_app('benchmark')
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run(processes: int, slots: int, requests: int, concurrency: int, method: str, wait: float, workdir: str) -> dict:
+    import requests as http
+
+    env = {
+        **os.environ,
+        'BENCH_DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'login.db')}",
+        'BENCH_HASH_METHOD': method,
+        'BENCH_HASH_SLOTS': str(slots),
+        'BENCH_HASH_SLOT_DIR': os.path.join(workdir, 'slots'),
+        'BENCH_HASH_WAIT': str(wait)
+    }
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(processes), '--worker-class', 'sync',
+         '--bind', f"127.0.0.1:{port}", '--log-level', 'warning', 'benchmarks.login_throughput:build_app()'],
+        env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        for _ in range(300):
+            try:
+                http.get(f"{base_url}/api/health", timeout=5)
+                break
+            except http.RequestException:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError('gunicorn did not start')
+
+        def login(_):
+            started = time.perf_counter()
+            response = http.post(f"{base_url}/api/auth/login", json={'email': EMAIL, 'password': PASSWORD}, timeout=60)
+            return response.status_code, time.perf_counter() - started
+
+        # Let every worker import and connect before measuring
+        with ThreadPoolExecutor(processes) as pool:
+            list(pool.map(login, range(processes * 2)))
+
+        storm_over = threading.Event()
+        health = []
+
+        def probe():
+            while not storm_over.is_set():
+                started = time.perf_counter()
+                http.get(f"{base_url}/api/health", timeout=60)
+                health.append(time.perf_counter() - started)
+
+        prober = threading.Thread(target=probe)
+        started = time.perf_counter()
+        prober.start()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(login, range(requests)))
+        elapsed = time.perf_counter() - started
+        storm_over.set()
+        prober.join()
+
+        statuses = [status for status, _ in results]
+        ok_latencies = [seconds for status, seconds in results if status == 200]
+        return {
+            'processes': processes,
+            'slots': slots,
+            'requests': requests,
+            'concurrency': concurrency,
+            'seconds': round(elapsed, 3),
+            'logins_per_second': round(statuses.count(200) / elapsed, 1),
+            'login_p95_ms': round(_percentile(ok_latencies, 0.95) * 1000, 1),
+            'busy_503': statuses.count(503),
+            'errors': len(statuses) - statuses.count(200) - statuses.count(503),
+            'health_p50_ms': round(_percentile(health, 0.5) * 1000, 1),
+            'health_p95_ms': round(_percentile(health, 0.95) * 1000, 1)
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', default='2,4', help='Comma-separated gunicorn worker counts')
+    parser.add_argument('--slots', default='0,1,2', help='Comma-separated PASSWORD_HASH_SLOTS values (0 = no limit)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='Werkzeug hash method')
+    parser.add_argument('--wait', type=float, default=1.0, help='PASSWORD_HASH_WAIT')
+    args = parser.parse_args()
+
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import create_engine, insert
+    from models import db, User
+
+    workdir = tempfile.mkdtemp()
+    try:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'login.db')}")
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(insert(User.__table__).values(
+                email=EMAIL, username='bench', roles=['user'],
+                password_hash=generate_password_hash(PASSWORD, method=args.method)
+            ))
+        engine.dispose()
+
+        results = [
+            run(int(processes), int(slots), args.requests, args.concurrency, args.method, args.wait, workdir)
+            for processes in args.processes.split(',')
+            for slots in args.slots.split(',')
+        ]
+    finally:
+        shutil.rmtree(workdir)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Email Outbox Check
+
+Delivers a queued outbox to a local SMTP stand-in server and checks the
+outcome:
+
+- every message goes out over one connection per batch, plus one
+  reconnect after the server hangs up mid-batch (--drop-after);
+- a 550 recipient is failed at once, a 451 one is rescheduled;
+- the password reset email reaches the server with its link and the
+  configured expiry, and no outbox row keeps the raw token once sent;
+- an undelivered reset email older than PASSWORD_RESET_TOKEN_TTL is
+  given up on and blanked, and `sweep-expired` deletes old sent rows.
+
+Prints the checks as JSON and exits with status 1 if any fails.
+
+    python -m benchmarks.mail_outbox --messages 250 --batch-size 100 --drop-after 40
+"""
+import argparse
+import email
+import json
+import os
+import re
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+
+class StandInSMTP(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP server on a free local port
+    Recipients containing 'bounce' get 550, 'defer' get 451. The first
+    connection is dropped when the client starts message drop_after + 1.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after: int = 0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            dropping = server.connections == 1 and server.drop_after > 0
+        accepted = 0
+        recipients = []
+
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-stand-in')
+                self.reply('250 8BITMIME')
+            elif verb == 'MAIL':
+                if dropping and accepted >= server.drop_after:
+                    return
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if 'bounce' in address:
+                    self.reply('550 No such user')
+                elif 'defer' in address:
+                    self.reply('451 Try again later')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                if not recipients:
+                    self.reply('503 No valid recipients')
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b''):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                with server.lock:
+                    server.messages.append((recipients, b''.join(lines)))
+                accepted += 1
+                self.reply('250 Queued')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+def _html(raw: bytes) -> str:
+    message = email.message_from_bytes(raw)
+    return ''.join(
+        part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8')
+        for part in message.walk() if part.get_content_type() == 'text/html'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=250, help='Welcome emails to queue')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--drop-after', type=int, default=40, help='Hang up the first connection after N messages')
+    parser.add_argument('--reset-ttl', type=int, default=3600, help='PASSWORD_RESET_TOKEN_TTL')
+    args = parser.parse_args()
+
+    from app import create_app
+    from config import config, TestingConfig
+    from models import db, User, EmailOutbox, PasswordResetToken
+    from utils.email import send_welcome_email, send_password_reset_email, _duration_text
+    from utils.mail_outbox import send_outbox
+
+    smtp = StandInSMTP(drop_after=args.drop_after)
+    workdir = tempfile.mkdtemp()
+    config['mail_check'] = type('MailCheckConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'mail.db')}",
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': smtp.port,
+        'MAIL_USE_SSL': False,
+        'MAIL_USE_TLS': False,
+        'MAIL_USERNAME': None,
+        'MAIL_PASSWORD': None,
+        # Flask-Mail suppresses sending under TESTING by default
+        'MAIL_SUPPRESS_SEND': False,
+        'PASSWORD_RESET_TOKEN_TTL': args.reset_ttl,
+        'RATELIMIT_ENABLED': False
+    })
+    app = create_app('mail_check')
+    checks = {}
+
+    try:
+        with app.app_context():
+            db.session.add(User(email='reset@example.com', username='resetter', password_hash='x'))
+            for i in range(args.messages):
+                send_welcome_email(f"user{i}@example.com", f"user{i}")
+            send_welcome_email('bounce@example.com', 'bounce')
+            send_welcome_email('defer@example.com', 'defer')
+            db.session.commit()
+
+        response = app.test_client().post('/api/auth/forgot-password', json={'email': 'reset@example.com'})
+        checks['forgot_password_status'] = response.status_code == 200
+
+        with app.app_context():
+            summary = send_outbox(batch_size=args.batch_size)
+            total = args.messages + 3
+            batches = -(-total // args.batch_size)
+            checks['sent'] = summary['sent'] == args.messages + 1
+            checks['one_connection_per_batch_plus_reconnect'] = (
+                smtp.connections == batches + (1 if args.drop_after and args.drop_after < total else 0)
+            )
+
+            bounced = EmailOutbox.query.filter_by(to_email='bounce@example.com').one()
+            deferred = EmailOutbox.query.filter_by(to_email='defer@example.com').one()
+            checks['550_failed'] = bounced.status == 'failed' and bounced.attempts == 1
+            checks['451_rescheduled'] = (deferred.status == 'pending' and deferred.attempts == 1
+                                         and deferred.next_attempt_at > datetime.utcnow())
+
+            reset_bodies = [_html(raw) for recipients, raw in smtp.messages if recipients == ['reset@example.com']]
+            match = re.search(r'reset-password\?token=([\w-]+)', reset_bodies[0]) if len(reset_bodies) == 1 else None
+            checks['reset_link_delivered'] = bool(match) and PasswordResetToken.find(match.group(1)) is not None
+            expiry = f"expire in {_duration_text(args.reset_ttl)}"
+            checks['reset_expiry_text'] = len(reset_bodies) == 1 and expiry in reset_bodies[0]
+            checks['raw_token_not_stored'] = bool(match) and not EmailOutbox.query.filter(
+                EmailOutbox.html.contains(match.group(1))
+            ).count()
+
+            # A reset email that never went out before its token expired
+            send_password_reset_email('late@example.com', 'late', 'https://example.com/reset-password?token=stale')
+            db.session.flush()
+            stale_row = EmailOutbox.query.filter_by(to_email='late@example.com').one()
+            stale_row.created_at = datetime.utcnow() - timedelta(seconds=args.reset_ttl + 60)
+            db.session.commit()
+            scrubbed = EmailOutbox.expire_sensitive(args.reset_ttl)
+            stale_row = db.session.get(EmailOutbox, stale_row.id)
+            checks['stale_reset_given_up'] = scrubbed == 1 and stale_row.status == 'failed' and stale_row.html == ''
+
+            sent_and_failed = EmailOutbox.query.filter(EmailOutbox.status.in_(('sent', 'failed'))).count()
+            deleted = EmailOutbox.delete_expired(30, now=datetime.utcnow() + timedelta(days=31))
+            checks['sweep_deletes_old_rows'] = deleted == sent_and_failed > 0
+
+        report = {
+            'connections': smtp.connections,
+            'messages_received': len(smtp.messages),
+            'summary': summary,
+            'checks': checks
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        smtp.stop()
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(workdir)
+
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Rate Limit Check Benchmark
+
+Measures the latency of one limit check (limiter.hit) against the shared
+SQLite storage, with several processes hammering the same file the way
+gunicorn workers do, and against in-memory storage for reference. Each
+run uses a throwaway database file.
+
+    python -m benchmarks.rate_limit --processes 1,4,8 --checks 20000 --strategy sliding-window-counter
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+
+def _worker(uri: str, strategy: str, checks: int, keys: int) -> tuple:
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import STRATEGIES
+    import utils.rate_limit  # noqa: F401 (registers the sqlite:// scheme)
+
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    # High enough that every check takes the allow-and-increment path
+    item = parse(f'{checks * 10} per minute')
+    pid = os.getpid()
+
+    timings = []
+    began = time.perf_counter()
+    for i in range(checks):
+        started = time.perf_counter()
+        limiter.hit(item, f'{pid}-{i % keys}')
+        timings.append(time.perf_counter() - started)
+    return timings, time.perf_counter() - began
+
+
+def run(uri: str, processes: int, checks: int, keys: int, strategy: str) -> dict:
+    if processes == 1:
+        results = [_worker(uri, strategy, checks, keys)]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.starmap(_worker, [(uri, strategy, checks, keys)] * processes)
+
+    timings = [t for result, _ in results for t in result]
+    # Start-up is excluded: throughput is over the slowest worker's checking time
+    elapsed = max(wall for _, wall in results)
+
+    timings.sort()
+    return {
+        'storage': uri.split('://')[0],
+        'strategy': strategy,
+        'processes': processes,
+        'checks': len(timings),
+        'mean_us': round(statistics.fmean(timings) * 1e6, 1),
+        'p50_us': round(timings[len(timings) // 2] * 1e6, 1),
+        'p99_us': round(timings[int(len(timings) * 0.99)] * 1e6, 1),
+        'checks_per_second': round(len(timings) / elapsed)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', default='1,4,8', help='Comma-separated numbers of concurrent processes')
+    parser.add_argument('--checks', type=int, default=20000, help='Checks per process')
+    parser.add_argument('--keys', type=int, default=1000, help='Distinct client keys per process')
+    parser.add_argument('--strategy', default='sliding-window-counter', help='limits strategy name')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+
+    try:
+        results = [run('memory://', 1, args.checks, args.keys, args.strategy)]
+        for processes in args.processes.split(','):
+            results.append(run(f'sqlite:///{path}', int(processes), args.checks, args.keys, args.strategy))
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Payment Reconciliation Check
+
+Runs `flask payments reconcile` logic (utils.reconcile) against a local
+stub of the Flutterwave verify-by-reference endpoint. Each payment's
+tx_ref tells the stub how to answer:
+
+- paid / declined / mismatch: a successful, failed or wrong-amount charge;
+- unknown: no transaction (given up on once older than --give-up-after);
+- slow: hangs up after the client's read timeout;
+- down: 503;
+- malformed: a success body whose `data` is not an object.
+
+Three runs are checked:
+
+- mixed: every kind interleaved on the same pages. Each payment gets its
+  outcome, problem payments count as errors, and every page is committed.
+- breaker: a gateway that only returns 503. The circuit breaker stops
+  the run after about FLUTTERWAVE_BREAKER_THRESHOLD calls.
+- budget: --max-calls stops the run after exactly that many calls.
+
+Prints the summaries and checks as JSON and exits with status 1 if any
+check fails.
+
+    python -m benchmarks.reconcile --per-kind 10 --page-size 16 --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+KINDS = ('paid', 'declined', 'mismatch', 'unknown', 'slow', 'down', 'malformed')
+READ_TIMEOUT = 0.2
+
+
+class StubGateway(ThreadingHTTPServer):
+    """Answers GET /transactions/verify_by_reference?tx_ref=<kind>-<n> on a free local port"""
+    daemon_threads = True
+
+    def __init__(self, fee: int):
+        super().__init__(('127.0.0.1', 0), _GatewayHandler)
+        self.fee = fee
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.calls += 1
+
+        tx_ref = parse_qs(urlparse(self.path).query).get('tx_ref', [''])[0]
+        kind = tx_ref.split('-', 1)[0]
+        charge = {
+            'id': f"flw-{tx_ref}", 'tx_ref': tx_ref, 'flw_ref': f"FLW-{tx_ref}",
+            'status': 'successful', 'amount': server.fee, 'currency': 'NGN', 'payment_type': 'card'
+        }
+
+        if kind == 'slow':
+            # The client has given up by now; just hang up
+            time.sleep(READ_TIMEOUT * 3)
+        elif kind == 'down':
+            self.reply(503, {'status': 'error', 'message': 'Service unavailable'})
+        elif kind == 'unknown':
+            self.reply(404, {'status': 'error', 'message': 'No transaction was found', 'data': None})
+        elif kind == 'malformed':
+            self.reply(200, {'status': 'success', 'data': ['unexpected']})
+        elif kind == 'declined':
+            self.reply(200, {'status': 'success', 'data': {**charge, 'status': 'failed'}})
+        elif kind == 'mismatch':
+            self.reply(200, {'status': 'success', 'data': {**charge, 'amount': 1}})
+        else:
+            self.reply(200, {'status': 'success', 'data': charge})
+
+
+def seed(kinds: list, per_kind: int, give_up_hours: int) -> None:
+    """Replace the payments with per_kind of each kind, interleaved by id"""
+    from flask import current_app
+    from models import db, Payment
+
+    db.session.query(Payment).delete()
+    now = datetime.utcnow()
+    for n in range(per_kind):
+        for kind in kinds:
+            # Half of the unknown payments are past the give-up age
+            old = kind == 'unknown' and n % 2 == 0
+            tx_ref = f"{kind}-{n}"
+            db.session.add(Payment(
+                user_id=1, transaction_id=f"pending-{tx_ref}", tx_ref=tx_ref,
+                amount=current_app.config['ARTIST_REGISTRATION_FEE'], currency='NGN', status='pending',
+                created_at=now - (timedelta(hours=give_up_hours * 2) if old else timedelta(hours=1))
+            ))
+    db.session.commit()
+
+
+def run(app, gateway, kinds: list, per_kind: int, give_up_hours: int, **options) -> dict:
+    from models import db, Payment
+    from utils.reconcile import reconcile_payments
+
+    with app.app_context():
+        seed(kinds, per_kind, give_up_hours)
+        # Fresh client: a closed breaker and an empty verification cache
+        app.extensions.pop('flutterwave', None)
+        gateway.calls = 0
+
+        started = time.perf_counter()
+        summary = reconcile_payments(min_age_minutes=15, give_up_hours=give_up_hours, rate=0, **options)
+        summary['seconds'] = round(time.perf_counter() - started, 2)
+        summary['gateway_calls'] = gateway.calls
+
+        db.session.rollback()
+        statuses = {}
+        for tx_ref, status in db.session.query(Payment.tx_ref, Payment.status):
+            kind = tx_ref.split('-', 1)[0]
+            statuses.setdefault(kind, {}).setdefault(status, 0)
+            statuses[kind][status] += 1
+        summary['statuses'] = statuses
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--per-kind', type=int, default=10, help='Payments of each kind in the mixed run')
+    parser.add_argument('--page-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--give-up-after', type=int, default=24, help='Hours')
+    parser.add_argument('--breaker-threshold', type=int, default=5)
+    parser.add_argument('--breaker-payments', type=int, default=50, help='Payments in the breaker run')
+    parser.add_argument('--budget-payments', type=int, default=50, help='Payments in the budget run')
+    parser.add_argument('--max-calls', type=int, default=20, help='Call budget of the budget run')
+    args = parser.parse_args()
+
+    from app import create_app
+    from config import config, TestingConfig
+    from models import db, User
+
+    workdir = tempfile.mkdtemp()
+    gateway = None
+    checks = {}
+
+    try:
+        config['reconcile_check'] = type('ReconcileCheckConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'reconcile.db')}",
+            'FLUTTERWAVE_SECRET_KEY': 'stub',
+            'FLUTTERWAVE_CONNECT_TIMEOUT': 1,
+            'FLUTTERWAVE_READ_TIMEOUT': READ_TIMEOUT,
+            'FLUTTERWAVE_BREAKER_THRESHOLD': args.breaker_threshold,
+            'FLUTTERWAVE_BREAKER_RESET_SECONDS': 60,
+            'RATELIMIT_ENABLED': False
+        })
+        app = create_app('reconcile_check')
+        gateway = StubGateway(app.config['ARTIST_REGISTRATION_FEE'])
+        app.config['FLUTTERWAVE_BASE_URL'] = gateway.base_url
+        with app.app_context():
+            db.session.add(User(id=1, email='payer@example.com', username='payer', password_hash='x'))
+            db.session.commit()
+
+        # Every kind on the same pages; a breaker that never trips so slow and down count as errors
+        app.config['FLUTTERWAVE_BREAKER_THRESHOLD'] = 10 ** 6
+        n = args.per_kind
+        mixed = run(app, gateway, list(KINDS), n, args.give_up_after,
+                    page_size=args.page_size, max_workers=args.workers)
+        statuses = mixed['statuses']
+        checks['mixed_every_payment_called'] = mixed['gateway_calls'] == n * len(KINDS)
+        checks['mixed_paid_settled'] = mixed['settled'] == n and statuses['paid'] == {'successful': n}
+        checks['mixed_declined_failed'] = statuses['declined'] == {'failed': n}
+        checks['mixed_unknown_given_up_when_old'] = statuses['unknown'] == {'failed': (n + 1) // 2, 'pending': n // 2}
+        checks['mixed_failed_count'] = mixed['failed'] == n + (n + 1) // 2
+        checks['mixed_still_pending'] = mixed['still_pending'] == n // 2
+        checks['mixed_mismatch_left_pending'] = mixed['mismatch'] == n and statuses['mismatch'] == {'pending': n}
+        checks['mixed_slow_down_malformed_are_errors'] = mixed['errors'] == 3 * n and all(
+            statuses[kind] == {'pending': n} for kind in ('slow', 'down', 'malformed')
+        )
+        checks['mixed_ran_to_the_end'] = mixed['stopped'] is None
+
+        app.config['FLUTTERWAVE_BREAKER_THRESHOLD'] = args.breaker_threshold
+        breaker = run(app, gateway, ['down'], args.breaker_payments, args.give_up_after,
+                      page_size=args.page_size, max_workers=args.workers)
+        checks['breaker_stops_run'] = breaker['stopped'] == 'circuit breaker open'
+        # Calls already in flight when the breaker opens still reach the gateway
+        checks['breaker_caps_calls'] = breaker['gateway_calls'] <= args.breaker_threshold + args.workers - 1
+
+        budget = run(app, gateway, ['paid'], args.budget_payments, args.give_up_after,
+                     page_size=args.page_size, max_workers=args.workers, max_calls=args.max_calls)
+        checks['budget_stops_run'] = budget['stopped'] == 'call budget exhausted'
+        checks['budget_exact_calls'] = budget['gateway_calls'] == args.max_calls
+        checks['budget_settles_what_it_checked'] = budget['settled'] == args.max_calls
+
+        print(json.dumps({'mixed': mixed, 'breaker': breaker, 'budget': budget, 'checks': checks}, indent=2))
+    finally:
+        if gateway:
+            gateway.stop()
+        shutil.rmtree(workdir)
+
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
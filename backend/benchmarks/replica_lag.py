@@ -0,0 +1,152 @@
+"""
+Read Replica Routing Check
+
+Runs the app against two SQLite files: a primary, and a replica that a
+background thread refreshes from it every --lag seconds (simulated
+replication lag), plus an unreachable replica to exercise the health
+check. An artist submits a song, then lists their submissions. Every
+request uses a new client, so no cookie carries over, like the
+frontend's fetch() calls:
+
+- within the sticky window the artist's list is served by the primary
+  and includes the new song;
+- another user fetching the new song is served by the replica and gets
+  a 404 until the next refresh;
+- after the window the artist is back on the replica.
+
+    python -m benchmarks.replica_lag --lag 2 --sticky 1
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+
+class Replicator(threading.Thread):
+    """Copies the primary SQLite file over the replica every `lag` seconds"""
+
+    def __init__(self, primary: str, replica: str, lag: float):
+        super().__init__(daemon=True)
+        self.primary = primary
+        self.replica = replica
+        self.lag = lag
+        self.stopped = threading.Event()
+
+    def sync(self):
+        source = sqlite3.connect(self.primary)
+        target = sqlite3.connect(self.replica)
+        with target:
+            source.backup(target)
+        source.close()
+        target.close()
+
+    def run(self):
+        while not self.stopped.wait(self.lag):
+            self.sync()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lag', type=float, default=2.0, help='Seconds between replica refreshes')
+    parser.add_argument('--sticky', type=int, default=1, help='REPLICA_STICKY_SECONDS')
+    args = parser.parse_args()
+
+    from sqlalchemy import event
+
+    from app import create_app
+    from config import config, TestingConfig
+    from models import db, User, Artist, Contest
+    from utils.auth import issue_access_token
+
+    workdir = tempfile.mkdtemp()
+    primary = os.path.join(workdir, 'primary.db')
+    replica = os.path.join(workdir, 'replica.db')
+    down = os.path.join(workdir, 'missing', 'replica.db')
+
+    config['replica_check'] = type('ReplicaCheckConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'REPLICA_DATABASE_URLS': [f'sqlite:///{replica}', f'sqlite:///{down}'],
+        'REPLICA_STICKY_SECONDS': args.sticky,
+        'REPLICA_STICKY_STORAGE_URI': f'sqlite:///{os.path.join(workdir, "sticky.db")}',
+        'RATELIMIT_ENABLED': False
+    })
+    app = create_app('replica_check')
+    replicator = Replicator(primary, replica, args.lag)
+
+    served_by = Counter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        database = conn.engine.url.database
+        served_by['primary' if database == primary else 'replica'] += 1
+
+    try:
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', record)
+
+            now = datetime.utcnow()
+            db.session.add(Contest(
+                title='Check', start_date=now - timedelta(days=1),
+                submission_end_date=now + timedelta(days=7), voting_end_date=now + timedelta(days=14)
+            ))
+            user = User(email='artist@example.com', username='artist', password_hash='x')
+            other = User(email='fan@example.com', username='fan', password_hash='x')
+            db.session.add_all([user, other])
+            db.session.flush()
+            db.session.add(Artist(user_id=user.id, stage_name='Artist', is_paid=True, is_verified=True))
+            db.session.commit()
+            token = issue_access_token(user)
+            other_token = issue_access_token(other)
+
+        replicator.sync()
+        replicator.start()
+        headers = {'Authorization': f'Bearer {token}'}
+        other_headers = {'Authorization': f'Bearer {other_token}'}
+
+        def submissions():
+            served_by.clear()
+            response = app.test_client().get('/api/songs/my-submissions', headers=headers)
+            return {'songs': len(response.get_json()['songs']), 'queries': dict(served_by)}
+
+        def other_user_fetch(song_id):
+            served_by.clear()
+            response = app.test_client().get(f'/api/songs/{song_id}', headers=other_headers)
+            return {'status': response.status_code, 'queries': dict(served_by)}
+
+        results = {'before': submissions()}
+
+        response = app.test_client().post('/api/songs/submit', headers=headers, json={
+            'title': 'New song', 'audio_url': 'https://example.com/song.mp3', 'duration': 180
+        })
+        song_id = response.get_json()['song']['id']
+        results['submit_status'] = response.status_code
+        results['writer_right_after'] = submissions()
+        results['other_user_right_after'] = other_user_fetch(song_id)
+
+        time.sleep(args.lag + 0.5)
+        results['other_user_after_lag'] = other_user_fetch(song_id)
+        time.sleep(max(0, args.sticky - args.lag - 0.5) + 0.1)
+        results['writer_after_sticky_window'] = submissions()
+
+        with app.app_context():
+            from utils.replicas import get_replicas
+            results['replicas'] = get_replicas().status()
+
+        print(json.dumps(results, indent=2))
+    finally:
+        replicator.stopped.set()
+        replicator.join()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
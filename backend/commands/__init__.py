@@ -0,0 +1,26 @@
+"""
+SoundWars Flask API - CLI Commands
+"""
+from .db import db_cli
+from .mail import mail_cli
+from .maintenance import sweep_expired_command, boot_profile_command
+from .payments import payments_cli
+from .songs import songs_cli
+from .stats import stats_cli
+from .users import users_cli
+
+
+def register_commands(app):
+    """Attach command groups to the app's `flask` CLI"""
+    app.cli.add_command(db_cli)
+    app.cli.add_command(mail_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(songs_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(sweep_expired_command)
+    app.cli.add_command(boot_profile_command)
+
+
+__all__ = ['register_commands', 'db_cli', 'mail_cli', 'payments_cli', 'songs_cli', 'stats_cli', 'users_cli',
+           'sweep_expired_command', 'boot_profile_command']
@@ -0,0 +1,94 @@
+"""
+Database Schema Commands
+"""
+import click
+from flask.cli import AppGroup
+
+db_cli = AppGroup('db', help='Database schema commands')
+
+
+@db_cli.command('upgrade')
+@click.option('--dry-run', is_flag=True, help='Only list the changes')
+def upgrade_command(dry_run):
+    """Create missing tables, columns and indexes (run on every deploy)"""
+    from utils.schema import upgrade_schema
+    
+    applied = upgrade_schema(dry_run=dry_run, log=lambda step: click.echo(f"  {step}"))
+    
+    if not applied:
+        click.echo('Schema is up to date')
+    elif dry_run:
+        click.echo(f"{len(applied)} changes pending")
+    else:
+        click.echo(f"Applied {len(applied)} changes")
+
+
+@db_cli.command('pool')
+def pool_command():
+    """Show the effective connection pool settings and the connection budget"""
+    from flask import current_app
+    from utils.db_pool import engine_options
+    
+    config = current_app.config
+    options = engine_options(config)
+    if not options:
+        click.echo('In-memory SQLite: single shared connection, no pool settings')
+        return
+    
+    click.echo(f"Profile: {config['DB_POOL_PROFILE']}")
+    for key, value in options.items():
+        if key != 'poolclass':
+            click.echo(f"  {key} = {value}")
+    
+    per_process = options['pool_size'] + options['max_overflow']
+    engines = 1 + len(config['REPLICA_DATABASE_URLS'])
+    total = per_process * config['DB_POOL_PROCESSES']
+    click.echo(f"Up to {per_process} connections per process and database, "
+               f"{total} for {config['DB_POOL_PROCESSES']} processes ({engines} databases)")
+    
+    if config['DB_MAX_CONNECTIONS'] and total > config['DB_MAX_CONNECTIONS']:
+        click.echo(f"Warning: exceeds DB_MAX_CONNECTIONS={config['DB_MAX_CONNECTIONS']}", err=True)
+
+
+@db_cli.command('check-plans')
+@click.option('--database-url', default=None, help='Empty scratch database to seed (default: a temporary SQLite file)')
+@click.option('--users', type=int, default=2000, show_default=True, help='Voters to seed')
+@click.option('--artists', type=int, default=100, show_default=True, help='Artists to seed')
+@click.option('--verbose', is_flag=True, help='Print each request and every plan')
+def check_plans_command(database_url, users, artists, verbose):
+    """EXPLAIN every query of the hot endpoints on seeded data; fails on full table scans"""
+    import os
+    import shutil
+    import tempfile
+    from app import create_app
+    from config import config, TestingConfig
+    from utils.query_plans import check_plans
+    
+    workdir = None
+    if not database_url:
+        workdir = tempfile.mkdtemp()
+        database_url = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+    
+    config['plan_check'] = type('PlanCheckConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'RATELIMIT_ENABLED': False
+    })
+    
+    try:
+        app = create_app('plan_check')
+        checked, findings = check_plans(app, users=users, artists=artists, log=click.echo if verbose else None)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if workdir:
+            shutil.rmtree(workdir)
+    
+    for finding in findings:
+        click.echo(f"\n{finding.endpoint}: full scan of {', '.join(finding.tables)}")
+        click.echo(f"  {' '.join(finding.sql.split())}")
+        for line in finding.plan:
+            click.echo(f"    {line}")
+    
+    click.echo(f"\n{checked} statements checked, {len(findings)} with unexpected full scans")
+    if findings:
+        raise SystemExit(1)
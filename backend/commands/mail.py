@@ -0,0 +1,121 @@
+"""
+Mail Commands
+"""
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+mail_cli = AppGroup('mail', help='Email outbox commands')
+
+
+@mail_cli.command('send-outbox')
+@click.option('--batch-size', type=int, default=None, help='Messages per SMTP connection (default: MAIL_OUTBOX_BATCH_SIZE)')
+@click.option('--loop', is_flag=True, help='Keep polling instead of exiting once the outbox is drained')
+@click.option('--interval', type=float, default=5.0, show_default=True, help='Seconds between polls with --loop')
+def send_outbox_command(batch_size, loop, interval):
+    """Deliver queued emails"""
+    from utils.mail_outbox import send_outbox
+    
+    batch_size = batch_size or current_app.config['MAIL_OUTBOX_BATCH_SIZE']
+    
+    while True:
+        summary = send_outbox(batch_size=batch_size)
+        if summary['sent'] or summary['failed'] or not loop:
+            click.echo(f"Sent {summary['sent']}, failed {summary['failed']}")
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@mail_cli.command('status')
+def status_command():
+    """Show outbox message counts by status"""
+    from utils.mail_outbox import outbox_status
+    
+    for status, count in outbox_status().items():
+        click.echo(f"{status}: {count}")
+
+
+@mail_cli.command('create-campaign')
+@click.option('--contest-id', type=int, default=None, help='Announce this contest (default: the current one)')
+@click.option('--kind', type=click.Choice(['contest_open', 'voting_started']), default='contest_open', show_default=True)
+@click.option('--template-file', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Custom HTML template with a $username placeholder (requires --subject)')
+@click.option('--subject', default=None, help='Subject line (overrides the built-in one)')
+@click.option('--audience', type=click.Choice(['all', 'artists']), default='all', show_default=True)
+def create_campaign_command(contest_id, kind, template_file, subject, audience):
+    """Create a bulk email campaign"""
+    from models import db, Contest, EmailCampaign
+    from utils.email import contest_announcement
+    
+    contest = Contest.query.get(contest_id) if contest_id else Contest.get_current()
+    
+    if template_file:
+        if not subject:
+            raise click.UsageError('--subject is required with --template-file')
+        with open(template_file, encoding='utf-8') as f:
+            template = f.read()
+        name = subject
+    else:
+        if not contest:
+            raise click.ClickException('No contest to announce')
+        default_subject, template = contest_announcement(contest, kind)
+        subject = subject or default_subject
+        name = f"{kind}: {contest.title}"
+    
+    campaign = EmailCampaign(
+        name=name,
+        subject=subject,
+        template=template,
+        audience=audience,
+        contest_id=contest.id if contest else None
+    )
+    db.session.add(campaign)
+    db.session.commit()
+    
+    click.echo(f"Created campaign {campaign.id}: {campaign.name}")
+
+
+@mail_cli.command('send-campaign')
+@click.argument('campaign_id', type=int)
+@click.option('--connections', type=int, default=None, help='Parallel SMTP connections (default: MAIL_CAMPAIGN_CONNECTIONS)')
+@click.option('--rate', type=float, default=None, help='Messages per second, 0 for no limit (default: MAIL_CAMPAIGN_RATE)')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Recipients per checkpoint')
+def send_campaign_command(campaign_id, connections, rate, chunk_size):
+    """Send (or resume) a bulk email campaign"""
+    from models import EmailCampaign
+    from utils.campaigns import send_campaign
+    
+    campaign = EmailCampaign.query.get(campaign_id)
+    if not campaign:
+        raise click.ClickException(f"Campaign {campaign_id} not found")
+    if campaign.status == 'completed':
+        raise click.ClickException(f"Campaign {campaign_id} was already sent")
+    
+    if campaign.last_user_id:
+        click.echo(f"Resuming after user {campaign.last_user_id}")
+    
+    config = current_app.config
+    results = send_campaign(
+        campaign,
+        connections=connections or config['MAIL_CAMPAIGN_CONNECTIONS'],
+        rate=config['MAIL_CAMPAIGN_RATE'] if rate is None else rate,
+        chunk_size=chunk_size,
+        progress=lambda c: click.echo(f"  checkpoint user {c.last_user_id}: {c.sent_count} sent, {c.failed_count} failed")
+    )
+    
+    click.echo(f"Campaign {campaign.id} completed: {results['sent']} sent, {results['failed']} failed this run")
+
+
+@mail_cli.command('campaigns')
+def campaigns_command():
+    """List campaigns and their progress"""
+    from models import EmailCampaign
+    
+    for campaign in EmailCampaign.query.order_by(EmailCampaign.id).all():
+        click.echo(
+            f"{campaign.id}\t{campaign.status}\t{campaign.sent_count} sent\t"
+            f"{campaign.failed_count} failed\t{campaign.name}"
+        )
@@ -0,0 +1,81 @@
+"""
+Maintenance Commands
+"""
+import click
+
+
+@click.command('sweep-expired')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows deleted per commit')
+def sweep_expired_command(batch_size):
+    """Delete expired and used one-time records"""
+    from flask import current_app
+    from models import PasswordResetToken, RevokedToken, IdempotencyKey, EmailOutbox
+    
+    for model in (PasswordResetToken, RevokedToken, IdempotencyKey):
+        deleted = model.delete_expired(batch_size=batch_size)
+        click.echo(f"{model.__tablename__}: {deleted} deleted")
+    
+    # Reset emails hold the raw token until sent; drop them once the token is dead
+    scrubbed = EmailOutbox.expire_sensitive(current_app.config['PASSWORD_RESET_TOKEN_TTL'])
+    deleted = EmailOutbox.delete_expired(current_app.config['MAIL_OUTBOX_RETENTION_DAYS'], batch_size=batch_size)
+    click.echo(f"{EmailOutbox.__tablename__}: {deleted} deleted, {scrubbed} expired reset links blanked")
+
+
+# Run in a fresh interpreter so the timings include every import
+_BOOT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[2])
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'status': response.status_code,
+    'modules': len(sys.modules)
+}))
+'''
+
+
+@click.command('boot-profile')
+@click.option('--config', 'config_name', default='production', show_default=True, help='Config to boot with')
+@click.option('--path', default='/api/health', show_default=True, help='First request to time')
+@click.option('--top', type=int, default=15, show_default=True, help='Slowest imports to list')
+def boot_profile_command(config_name, path, top):
+    """Time a cold worker start: imports, create_app and the first request"""
+    import json
+    import os
+    import re
+    import subprocess
+    import sys
+    
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _BOOT_SCRIPT, config_name, path],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise click.ClickException(result.stderr.strip().splitlines()[-1] if result.stderr else 'boot failed')
+    
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    total = timings['import'] + timings['create_app'] + timings['first_request']
+    
+    click.echo(f"import app:     {timings['import'] * 1000:8.1f} ms")
+    click.echo(f"create_app:     {timings['create_app'] * 1000:8.1f} ms")
+    click.echo(f"first request:  {timings['first_request'] * 1000:8.1f} ms  ({path} -> {timings['status']})")
+    click.echo(f"total:          {total * 1000:8.1f} ms, {timings['modules']} modules loaded")
+    
+    # -X importtime lines: "import time: self | cumulative | name"; top-level packages only
+    imports = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$', line)
+        if match and len(match.group(2)) <= 2:
+            imports.append((int(match.group(1)), match.group(3)))
+    
+    click.echo("\nSlowest imports (cumulative):")
+    for microseconds, name in sorted(imports, reverse=True)[:top]:
+        click.echo(f"  {microseconds / 1000:8.1f} ms  {name}")
@@ -0,0 +1,62 @@
+"""
+Payment Commands
+"""
+import time
+
+import click
+from flask.cli import AppGroup
+
+payments_cli = AppGroup('payments', help='Payment processing commands')
+
+
+@payments_cli.command('process-events')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Events per transaction')
+@click.option('--loop', is_flag=True, help='Keep polling instead of exiting once the inbox is empty')
+@click.option('--interval', type=float, default=2.0, show_default=True, help='Seconds between polls with --loop')
+def process_events_command(batch_size, loop, interval):
+    """Apply stored Flutterwave webhook events"""
+    from utils.payment_events import process_all_events
+    
+    while True:
+        summary = process_all_events(batch_size=batch_size)
+        if any(summary.values()) or not loop:
+            click.echo(
+                f"Processed {summary['processed']} charges ({summary['settled']} payments settled, "
+                f"{summary['artists_paid']} artists paid); {summary['ignored']} ignored, "
+                f"{summary['rejected']} rejected"
+            )
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@payments_cli.command('reconcile')
+@click.option('--min-age', type=int, default=15, show_default=True, help='Only check payments pending for this many minutes')
+@click.option('--give-up-after', type=int, default=24, show_default=True,
+              help='Mark payments failed when Flutterwave has no transaction after this many hours')
+@click.option('--page-size', type=int, default=200, show_default=True, help='Payments per page (one commit each)')
+@click.option('--workers', type=int, default=4, show_default=True, help='Concurrent gateway calls')
+@click.option('--rate', type=float, default=5, show_default=True, help='Gateway calls per second (0 = unlimited)')
+@click.option('--max-calls', type=int, default=None, help='Stop after this many gateway calls')
+@click.option('--verbose', is_flag=True, help='Log every page and problem payment')
+def reconcile_command(min_age, give_up_after, page_size, workers, rate, max_calls, verbose):
+    """Verify stale pending payments against Flutterwave"""
+    from utils.reconcile import reconcile_payments
+    
+    summary = reconcile_payments(
+        min_age_minutes=min_age,
+        give_up_hours=give_up_after,
+        page_size=page_size,
+        max_workers=workers,
+        rate=rate,
+        max_calls=max_calls,
+        log=click.echo if verbose else None
+    )
+    
+    click.echo(
+        f"Checked {summary['checked']}: {summary['settled']} settled ({summary['artists_paid']} artists paid), "
+        f"{summary['failed']} failed, {summary['still_pending']} still pending, "
+        f"{summary['mismatch']} amount mismatches, {summary['errors']} errors"
+    )
+    if summary['stopped']:
+        click.echo(f"Stopped early: {summary['stopped']}")
@@ -0,0 +1,23 @@
+"""
+Song Commands
+"""
+import click
+from flask.cli import AppGroup
+
+songs_cli = AppGroup('songs', help='Song maintenance commands')
+
+
+@songs_cli.command('analyze')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+@click.option('--batch-size', type=int, default=100, show_default=True, help='Rows per commit')
+@click.option('--force', is_flag=True, help='Re-analyze songs that already have results')
+def analyze_command(workers, batch_size, force):
+    """Compute waveform peaks and fingerprints for existing songs"""
+    from utils.audio_pipeline import backfill_analysis
+    
+    summary = backfill_analysis(max_workers=workers, batch_size=batch_size, force=force)
+    
+    click.echo(
+        f"Analyzed: {summary['ready']} ready, "
+        f"{summary['unavailable']} unavailable, {summary['failed']} failed"
+    )
@@ -0,0 +1,20 @@
+"""
+Stats Commands
+"""
+import click
+from flask.cli import AppGroup
+
+stats_cli = AppGroup('stats', help='Dashboard counter commands')
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recompute dashboard counters from the tables"""
+    from models import db
+    from utils.stats import rebuild_counters
+    
+    totals = rebuild_counters()
+    db.session.commit()
+    
+    for name, value in totals.items():
+        click.echo(f"{name}: {value}")
@@ -0,0 +1,41 @@
+"""
+User Commands
+"""
+import os
+import time
+
+import click
+from flask.cli import AppGroup
+
+users_cli = AppGroup('users', help='User account commands')
+
+
+@users_cli.command('import')
+@click.argument('csv_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False), default=None,
+              help='Reject report path (default: <csv_file>.rejects.csv)')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows per commit')
+@click.option('--workers', type=int, default=None, help='Hashing processes (default: all cores)')
+@click.option('--mark-paid', is_flag=True, help='Mark imported artist profiles as paid')
+def import_command(csv_file, rejects_path, batch_size, workers, mark_paid):
+    """Import users and artist profiles from a CSV file"""
+    from utils.user_import import import_users
+    
+    rejects_path = rejects_path or f"{os.path.splitext(csv_file)[0]}.rejects.csv"
+    started = time.perf_counter()
+    
+    with open(csv_file, newline='', encoding='utf-8-sig') as stream, \
+            open(rejects_path, 'w', newline='', encoding='utf-8') as reject_stream:
+        try:
+            summary = import_users(stream, reject_stream, batch_size=batch_size,
+                                   max_workers=workers, mark_paid=mark_paid)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f"Imported {summary['imported']} users ({summary['artists']} artists) "
+        f"from {summary['read']} rows in {elapsed:.1f}s; {summary['rejected']} rejected"
+    )
+    if summary['rejected']:
+        click.echo(f"Reject report: {rejects_path}")
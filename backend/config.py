@@ -13,6 +13,39 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
+    # Password hashing (Werkzeug method string, e.g. scrypt:32768:8:1 or pbkdf2:sha256:600000)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Hashes running at once across all workers on the host (see utils.passwords), 0 = no limit
+    PASSWORD_HASH_SLOTS = int(os.environ.get('PASSWORD_HASH_SLOTS', os.cpu_count() or 1))
+    PASSWORD_HASH_SLOT_DIR = os.environ.get('PASSWORD_HASH_SLOT_DIR', '/tmp/soundwars-hash-slots')
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 1))
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 2))
+    PASSWORD_RESET_TOKEN_TTL = int(os.environ.get('PASSWORD_RESET_TOKEN_TTL', 3600))
+    
+    # Token revocation (see utils.revocation)
+    REVOCATION_SYNC_SECONDS = int(os.environ.get('REVOCATION_SYNC_SECONDS', 30))
+    REVOCATION_BLOOM_CAPACITY = int(os.environ.get('REVOCATION_BLOOM_CAPACITY', 100000))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.environ.get('REVOCATION_BLOOM_ERROR_RATE', 0.001))
+    
+    # Rate limiting (see utils.rate_limit); counters are shared by all workers on the host
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'sqlite:////tmp/soundwars-ratelimit.db')
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'sliding-window-counter')
+    RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '200 per day;50 per hour')
+    RATELIMIT_HEADERS_ENABLED = True
+    RATELIMIT_LOGIN = os.environ.get('RATELIMIT_LOGIN', '10 per minute;50 per hour')
+    RATELIMIT_REGISTER = os.environ.get('RATELIMIT_REGISTER', '5 per hour')
+    RATELIMIT_PASSWORD_RESET = os.environ.get('RATELIMIT_PASSWORD_RESET', '5 per hour')
+    RATELIMIT_VOTE = os.environ.get('RATELIMIT_VOTE', '10 per minute')
+    
+    # Idempotency-Key replay (see utils.idempotency)
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 86400))
+    IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 5))
+    
+    # Principal cache (see utils.auth)
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+    
     # Database
     DB_USER = os.environ.get('DB_USER', 'root')
     DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
@@ -21,11 +54,55 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Run create_all at boot; production manages the schema with `flask db upgrade`
+    AUTO_CREATE_TABLES = os.environ.get('AUTO_CREATE_TABLES', 'false').lower() == 'true'
+    
+    # Connection pool (see utils.db_pool): a profile per deployment, DB_POOL_* override single values
+    DB_POOL_PROFILE = os.environ.get('DB_POOL_PROFILE', 'cpanel')
+    DB_POOL_PROFILES = {
+        # Passenger runs several single-threaded processes against a shared MySQL with a low
+        # connection cap and a short wait_timeout
+        'cpanel': {'pool_size': 1, 'max_overflow': 2, 'pool_timeout': 10, 'pool_recycle': 280, 'pool_pre_ping': True},
+        # Threaded gunicorn workers against a dedicated RDS instance
+        'aws': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 5, 'pool_recycle': 1800, 'pool_pre_ping': True}
+    }
+    DB_POOL_SIZE = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+    DB_POOL_MAX_OVERFLOW = int(os.environ['DB_POOL_MAX_OVERFLOW']) if os.environ.get('DB_POOL_MAX_OVERFLOW') else None
+    DB_POOL_TIMEOUT = int(os.environ['DB_POOL_TIMEOUT']) if os.environ.get('DB_POOL_TIMEOUT') else None
+    DB_POOL_RECYCLE = int(os.environ['DB_POOL_RECYCLE']) if os.environ.get('DB_POOL_RECYCLE') else None
+    DB_POOL_PRE_PING = os.environ['DB_POOL_PRE_PING'].lower() == 'true' if os.environ.get('DB_POOL_PRE_PING') else None
+    # Pool size advice: processes sharing the database's max_connections (0 = unknown)
+    DB_POOL_PROCESSES = int(os.environ.get('DB_POOL_PROCESSES', 1))
+    DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 0))
+    DB_POOL_AUTOTUNE = os.environ.get('DB_POOL_AUTOTUNE', 'false').lower() == 'true'
+    DB_POOL_AUTOTUNE_SECONDS = int(os.environ.get('DB_POOL_AUTOTUNE_SECONDS', 300))
+    
+    # Read replicas (see utils.replicas): comma-separated URLs, same schema as the primary
+    REPLICA_DATABASE_URLS = [url for url in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if url]
+    REPLICA_BLUEPRINTS = os.environ.get('REPLICA_BLUEPRINTS', 'songs,leaderboard,artists').split(',')
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    # Where per-user sticky marks live (limits storage URI; default: RATELIMIT_STORAGE_URI)
+    REPLICA_STICKY_STORAGE_URI = os.environ.get('REPLICA_STICKY_STORAGE_URI')
+    REPLICA_CHECK_SECONDS = int(os.environ.get('REPLICA_CHECK_SECONDS', 10))
+    
+    # Per-request SQL count and timings (see utils.request_metrics); 0 disables the threshold warning
+    REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', 'true').lower() == 'true'
+    REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', 'true').lower() == 'true'
+    REQUEST_METRICS_QUERY_THRESHOLD = int(os.environ.get('REQUEST_METRICS_QUERY_THRESHOLD', 30))
     
     # Flutterwave
     FLUTTERWAVE_SECRET_KEY = os.environ.get('FLUTTERWAVE_SECRET_KEY')
     FLUTTERWAVE_PUBLIC_KEY = os.environ.get('FLUTTERWAVE_PUBLIC_KEY')
     FLUTTERWAVE_ENCRYPTION_KEY = os.environ.get('FLUTTERWAVE_ENCRYPTION_KEY')
+    FLUTTERWAVE_WEBHOOK_SECRET = os.environ.get('FLUTTERWAVE_WEBHOOK_SECRET')
+    FLUTTERWAVE_BASE_URL = os.environ.get('FLUTTERWAVE_BASE_URL', 'https://api.flutterwave.com/v3')
+    FLUTTERWAVE_CONNECT_TIMEOUT = float(os.environ.get('FLUTTERWAVE_CONNECT_TIMEOUT', 3))
+    FLUTTERWAVE_READ_TIMEOUT = float(os.environ.get('FLUTTERWAVE_READ_TIMEOUT', 10))
+    FLUTTERWAVE_POOL_SIZE = int(os.environ.get('FLUTTERWAVE_POOL_SIZE', 10))
+    FLUTTERWAVE_BREAKER_THRESHOLD = int(os.environ.get('FLUTTERWAVE_BREAKER_THRESHOLD', 5))
+    FLUTTERWAVE_BREAKER_RESET_SECONDS = int(os.environ.get('FLUTTERWAVE_BREAKER_RESET_SECONDS', 30))
+    FLUTTERWAVE_VERIFY_CACHE_TTL = int(os.environ.get('FLUTTERWAVE_VERIFY_CACHE_TTL', 600))
+    FLUTTERWAVE_VERIFY_CACHE_SIZE = int(os.environ.get('FLUTTERWAVE_VERIFY_CACHE_SIZE', 10000))
     
     # Email
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
@@ -36,6 +113,19 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@soundwars.com')
     
+    # Email outbox (see utils.mail_outbox)
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 100))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 6))
+    MAIL_OUTBOX_BACKOFF_SECONDS = int(os.environ.get('MAIL_OUTBOX_BACKOFF_SECONDS', 60))
+    MAIL_OUTBOX_MAX_BACKOFF_SECONDS = int(os.environ.get('MAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+    MAIL_OUTBOX_LEASE_SECONDS = int(os.environ.get('MAIL_OUTBOX_LEASE_SECONDS', 300))
+    # Sent and failed messages are deleted by `flask sweep-expired` after this many days
+    MAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get('MAIL_OUTBOX_RETENTION_DAYS', 30))
+    
+    # Bulk campaigns (see utils.campaigns); keep the rate under the SMTP provider's quota
+    MAIL_CAMPAIGN_CONNECTIONS = int(os.environ.get('MAIL_CAMPAIGN_CONNECTIONS', 2))
+    MAIL_CAMPAIGN_RATE = float(os.environ.get('MAIL_CAMPAIGN_RATE', 10))
+    
     # Frontend URL
     FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
     
@@ -44,9 +134,32 @@ class Config:
     MAX_CONTENT_LENGTH = 15 * 1024 * 1024  # 15MB
     ALLOWED_AUDIO_EXTENSIONS = {'mp3', 'wav', 'ogg', 'm4a'}
     
+    # Audio pipeline
+    AUDIO_PIPELINE_ENABLED = os.environ.get('AUDIO_PIPELINE_ENABLED', 'true').lower() == 'true'
+    AUDIO_PIPELINE_WORKERS = int(os.environ.get('AUDIO_PIPELINE_WORKERS', 1))
+    WAVEFORM_PEAKS = int(os.environ.get('WAVEFORM_PEAKS', 1000))
+    FINGERPRINT_MATCH_THRESHOLD = float(os.environ.get('FINGERPRINT_MATCH_THRESHOLD', 0.3))
+    
     # Contest settings
     ARTIST_REGISTRATION_FEE = int(os.environ.get('ARTIST_REGISTRATION_FEE', 25000))
     WINNER_BLOCK_MONTHS = 12
+    
+    # Vote fraud detection
+    FRAUD_DETECTION_ENABLED = os.environ.get('FRAUD_DETECTION_ENABLED', 'true').lower() == 'true'
+    FRAUD_QUARANTINE_ENABLED = os.environ.get('FRAUD_QUARANTINE_ENABLED', 'false').lower() == 'true'
+    FRAUD_WINDOW_MINUTES = int(os.environ.get('FRAUD_WINDOW_MINUTES', 10))
+    FRAUD_MIN_VOTES_PER_MINUTE = float(os.environ.get('FRAUD_MIN_VOTES_PER_MINUTE', 10))
+    FRAUD_YOUNG_ACCOUNT_HOURS = int(os.environ.get('FRAUD_YOUNG_ACCOUNT_HOURS', 24))
+    FRAUD_SUBNET_SHARE = float(os.environ.get('FRAUD_SUBNET_SHARE', 0.5))
+    FRAUD_DISTINCT_IP_RATIO = float(os.environ.get('FRAUD_DISTINCT_IP_RATIO', 0.3))
+    FRAUD_MAX_TRACKED_SONGS = int(os.environ.get('FRAUD_MAX_TRACKED_SONGS', 1000))
+    
+    # Moderation queue
+    MODERATION_LEASE_SECONDS = int(os.environ.get('MODERATION_LEASE_SECONDS', 600))
+    MODERATION_CLAIM_LIMIT = int(os.environ.get('MODERATION_CLAIM_LIMIT', 50))
+    
+    # Dashboard counters (rows per counter, spreads write contention)
+    STATS_COUNTER_SLOTS = int(os.environ.get('STATS_COUNTER_SLOTS', 8))
 
 
 class DevelopmentConfig(Config):
@@ -54,6 +167,7 @@ class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///soundwars_dev.db'
+    AUTO_CREATE_TABLES = True
 
 
 class ProductionConfig(Config):
@@ -65,6 +179,10 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    RATELIMIT_STORAGE_URI = 'memory://'
+    AUTO_CREATE_TABLES = True
+    AUDIO_PIPELINE_ENABLED = False
+    PASSWORD_HASH_SLOTS = 0
 
 
 config = {
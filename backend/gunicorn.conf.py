@@ -0,0 +1,42 @@
+"""
+Gunicorn Configuration
+
+    gunicorn --config gunicorn.conf.py wsgi:app
+
+With GUNICORN_PRELOAD=true the app is imported and built once in the
+master, along with the modules that are otherwise loaded on first use
+(numpy, requests, bleach), and workers are forked from it: a new or
+restarted worker is serving in milliseconds and shares those pages
+copy-on-write. Nothing that holds a socket may be opened before the
+fork; post_fork drops any pooled database connections just in case.
+"""
+import importlib
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+timeout = 30
+keepalive = 2
+proc_name = 'soundwars'
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+# Modules the request path imports lazily; preloading pays for them once in the master
+PRELOAD_MODULES = ('utils.audio_pipeline', 'utils.fraud', 'utils.flutterwave', 'requests', 'bleach')
+
+
+def when_ready(server):
+    if preload_app:
+        for name in PRELOAD_MODULES:
+            importlib.import_module(name)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from wsgi import app
+        from models import db
+
+        # Connections inherited from the master must not be shared with it
+        with app.app_context():
+            db.engine.dispose(close=False)
@@ -3,13 +3,24 @@ SoundWars Flask API - Database Models
 """
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from .session import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 from .user import User
 from .artist import Artist
-from .song import Song
-from .vote import Vote
+from .song import Song, SongPeaks
+from .vote import Vote, VoteFlag
 from .contest import Contest, ContestWinner
-from .payment import Payment
+from .payment import Payment, PaymentEvent
+from .fingerprint import SongFingerprint, FingerprintHash
+from .stats import StatsCounter
+from .password_reset import PasswordResetToken
+from .revocation import RevokedToken
+from .email import EmailOutbox
+from .campaign import EmailCampaign
+from .idempotency import IdempotencyKey
 
-__all__ = ['db', 'User', 'Artist', 'Song', 'Vote', 'Contest', 'ContestWinner', 'Payment']
+__all__ = ['db', 'User', 'Artist', 'Song', 'SongPeaks', 'Vote', 'VoteFlag', 'Contest', 'ContestWinner', 'Payment',
+           'PaymentEvent', 'SongFingerprint', 'FingerprintHash', 'StatsCounter', 'PasswordResetToken',
+           'RevokedToken', 'EmailOutbox', 'EmailCampaign', 'IdempotencyKey']
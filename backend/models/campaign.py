@@ -0,0 +1,51 @@
+"""
+Email Campaign Model
+"""
+from datetime import datetime
+from . import db
+
+
+class EmailCampaign(db.Model):
+    """
+    Bulk email sent to every user in an audience
+
+    last_user_id is the resume checkpoint: recipients are processed in
+    ascending user id, so an interrupted send continues after it.
+    """
+    __tablename__ = 'email_campaigns'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    template = db.Column(db.Text, nullable=False)  # HTML with a $username placeholder
+    audience = db.Column(db.String(20), default='all')  # all, artists
+    contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'), nullable=True)
+    
+    # Progress
+    status = db.Column(db.String(20), default='draft')  # draft, sending, completed
+    last_user_id = db.Column(db.Integer, nullable=False, default=0)
+    sent_count = db.Column(db.Integer, nullable=False, default=0)
+    failed_count = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON response"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'subject': self.subject,
+            'audience': self.audience,
+            'contest_id': self.contest_id,
+            'status': self.status,
+            'last_user_id': self.last_user_id,
+            'sent_count': self.sent_count,
+            'failed_count': self.failed_count,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
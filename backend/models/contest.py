@@ -33,6 +33,11 @@ class Contest(db.Model):
     votes = db.relationship('Vote', backref='contest', lazy=True)
     winner = db.relationship('ContestWinner', backref='contest', uselist=False, lazy=True)
     
+    __table_args__ = (
+        # get_current() runs on most requests
+        db.Index('ix_contests_is_active', 'is_active'),
+    )
+    
     @classmethod
     def get_current(cls):
         """Get the current active contest"""
@@ -82,6 +87,11 @@ class ContestWinner(db.Model):
     # Timestamps
     won_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Eligibility checks: an artist's latest win
+        db.Index('ix_contest_winners_artist_won', 'artist_id', 'won_at'),
+    )
+    
     def to_dict(self):
         """Convert to dictionary for JSON response"""
         return {
@@ -0,0 +1,98 @@
+"""
+Email Outbox Model
+"""
+from datetime import datetime, timedelta
+from . import db
+
+
+class EmailOutbox(db.Model):
+    """
+    Message waiting to be delivered by `flask mail send-outbox`
+
+    Requests only insert rows; the sender claims due rows, delivers them
+    over one SMTP connection and reschedules failures with backoff.
+    Bodies in SENSITIVE_CATEGORIES carry a live credential (the raw reset
+    token in the link) and are blanked once the message is done with.
+    """
+    __tablename__ = 'email_outbox'
+    
+    SENSITIVE_CATEGORIES = ('password_reset',)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    category = db.Column(db.String(50), nullable=True)  # password_reset, welcome, ...
+    
+    # Delivery state
+    status = db.Column(db.String(20), default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def scrub(self):
+        """Drop the body of a sensitive message that will not be sent again (caller commits)"""
+        if self.category in self.SENSITIVE_CATEGORIES:
+            self.html = ''
+    
+    @classmethod
+    def expire_sensitive(cls, ttl_seconds, now=None):
+        """
+        Give up on sensitive messages older than the credential they carry and
+        blank every such body still stored (commits)
+        Returns: number of rows scrubbed
+        """
+        cutoff = (now or datetime.utcnow()) - timedelta(seconds=ttl_seconds)
+        stale = db.and_(cls.category.in_(cls.SENSITIVE_CATEGORIES), cls.html != '', cls.created_at < cutoff)
+        
+        # A leased row is being delivered right now; its sender scrubs it
+        cls.query.filter(stale, cls.status == 'pending').update(
+            {'status': 'failed', 'last_error': 'Link expired before delivery'}, synchronize_session=False
+        )
+        scrubbed = cls.query.filter(stale, cls.status != 'sending').update({'html': ''}, synchronize_session=False)
+        db.session.commit()
+        return scrubbed
+    
+    @classmethod
+    def delete_expired(cls, retention_days, now=None, batch_size=1000):
+        """
+        Delete sent and failed messages older than retention_days in batches, committing after each
+        Returns: number of rows deleted
+        """
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        deleted = 0
+        
+        while True:
+            ids = [row.id for row in db.session.query(cls.id).filter(
+                cls.status.in_(('sent', 'failed')), cls.updated_at < cutoff
+            ).limit(batch_size)]
+            if not ids:
+                return deleted
+            
+            deleted += cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON response"""
+        return {
+            'id': self.id,
+            'to_email': self.to_email,
+            'subject': self.subject,
+            'category': self.category,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
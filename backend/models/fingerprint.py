@@ -0,0 +1,46 @@
+"""
+Fingerprint Models
+"""
+from datetime import datetime
+from . import db
+
+
+class SongFingerprint(db.Model):
+    """Audio fingerprint summary and duplicate flag for a song"""
+    __tablename__ = 'song_fingerprints'
+    
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), primary_key=True)
+    hash_count = db.Column(db.Integer, default=0)
+    
+    # Status
+    status = db.Column(db.String(20), default='ready')  # ready, unavailable
+    
+    # Closest earlier song sharing enough hashes to be a likely re-upload
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=True)
+    similarity = db.Column(db.Float, nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    duplicate_of = db.relationship('Song', foreign_keys=[duplicate_of_id], lazy=True)
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON response"""
+        return {
+            'song_id': self.song_id,
+            'hash_count': self.hash_count,
+            'status': self.status,
+            'duplicate_of_id': self.duplicate_of_id,
+            'similarity': round(self.similarity, 3) if self.similarity is not None else None,
+            'duplicate_of': self.duplicate_of.to_dict() if self.duplicate_of else None
+        }
+
+
+class FingerprintHash(db.Model):
+    """Inverted index from spectral-peak hash to the songs containing it"""
+    __tablename__ = 'fingerprint_hashes'
+    
+    # Hash leads the primary key so lookups are an index range scan
+    hash = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), primary_key=True, autoincrement=False)
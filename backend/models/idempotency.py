@@ -0,0 +1,48 @@
+"""
+Idempotency Key Model
+"""
+from datetime import datetime
+from . import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    A client-supplied Idempotency-Key and the response it produced
+
+    key_hash is the SHA-256 of user, endpoint and key, so a lookup is a
+    unique index probe and two users can never collide. While the first
+    request runs the row is 'processing' and locked_until bounds how long
+    a crashed worker can hold the key.
+    """
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    endpoint = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='processing')  # processing, completed
+    response_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @classmethod
+    def delete_expired(cls, now=None, batch_size=1000):
+        """
+        Delete expired keys in batches, committing after each
+        Returns: number of rows deleted
+        """
+        now = now or datetime.utcnow()
+        deleted = 0
+        
+        while True:
+            ids = [row.id for row in db.session.query(cls.id).filter(cls.expires_at < now).limit(batch_size)]
+            if not ids:
+                return deleted
+            
+            deleted += cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
@@ -0,0 +1,93 @@
+"""
+Password Reset Token Model
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from . import db
+
+
+class PasswordResetToken(db.Model):
+    """
+    One-time password reset token
+
+    Only the SHA-256 of the token is stored, so a leaked table cannot be
+    used to reset passwords, and lookups are a unique index probe.
+    """
+    __tablename__ = 'password_reset_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    used_at = db.Column(db.DateTime, nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    user = db.relationship('User', lazy='joined')
+    
+    @staticmethod
+    def hash_token(token):
+        """SHA-256 hex digest of a raw token"""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def issue(cls, user, ttl_seconds):
+        """
+        Create a token for a user, replacing any outstanding ones (caller commits)
+        Returns: the raw token to send to the user
+        """
+        cls.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+        
+        token = secrets.token_urlsafe(32)
+        db.session.add(cls(
+            user_id=user.id,
+            token_hash=cls.hash_token(token),
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        ))
+        return token
+    
+    @classmethod
+    def find(cls, token):
+        """Look up a token by its raw value"""
+        if not token or not isinstance(token, str):
+            return None
+        return cls.query.filter_by(token_hash=cls.hash_token(token)).first()
+    
+    def is_valid(self, now=None):
+        """Check if the token is unused and unexpired"""
+        return self.used_at is None and (now or datetime.utcnow()) <= self.expires_at
+    
+    def consume(self, now=None):
+        """
+        Mark the token used if nobody else has (caller commits)
+        Returns: True if this call claimed the token
+        """
+        now = now or datetime.utcnow()
+        claimed = db.session.query(PasswordResetToken).filter(
+            PasswordResetToken.id == self.id,
+            PasswordResetToken.used_at.is_(None),
+            PasswordResetToken.expires_at >= now
+        ).update({'used_at': now}, synchronize_session=False)
+        return claimed == 1
+    
+    @classmethod
+    def delete_expired(cls, now=None, batch_size=1000):
+        """
+        Delete used and expired tokens in batches, committing after each
+        Returns: number of rows deleted
+        """
+        now = now or datetime.utcnow()
+        deleted = 0
+        
+        while True:
+            ids = [row.id for row in db.session.query(cls.id).filter(
+                db.or_(cls.expires_at < now, cls.used_at.isnot(None))
+            ).limit(batch_size)]
+            if not ids:
+                return deleted
+            
+            deleted += cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
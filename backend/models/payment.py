@@ -35,6 +35,10 @@ class Payment(db.Model):
     # Relationship
     user = db.relationship('User', backref='payments')
     
+    __table_args__ = (
+        db.Index('ix_payments_user', 'user_id'),
+    )
+    
     def to_dict(self):
         """Convert to dictionary for JSON response"""
         return {
@@ -50,3 +54,38 @@ class Payment(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'verified_at': self.verified_at.isoformat() if self.verified_at else None
         }
+
+
+class PaymentEvent(db.Model):
+    """
+    Raw Flutterwave webhook event waiting to be applied
+
+    The webhook only inserts rows here; `flask payments process-events`
+    applies them in batches. event_key is unique, so a redelivered event
+    is stored once.
+    """
+    __tablename__ = 'payment_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_key = db.Column(db.String(200), unique=True, nullable=False)
+    event_type = db.Column(db.String(50), nullable=True)
+    tx_ref = db.Column(db.String(100), nullable=True, index=True)
+    payload = db.Column(db.JSON, nullable=False)
+    
+    # Processing state
+    status = db.Column(db.String(20), default='received')  # received, processed, ignored, rejected
+    error = db.Column(db.String(255), nullable=True)
+    
+    # Timestamps
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_payment_events_status_id', 'status', 'id'),
+    )
+    
+    @staticmethod
+    def key_for(payload):
+        """Dedup key: the same transaction can legitimately be reported again with a new status"""
+        data = payload.get('data') or {}
+        return f"{payload.get('event')}:{data.get('id')}:{data.get('status')}"
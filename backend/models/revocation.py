@@ -0,0 +1,35 @@
+"""
+Token Revocation Model
+"""
+from datetime import datetime
+from . import db
+
+
+class RevokedToken(db.Model):
+    """A single revoked JWT, kept until the token would have expired anyway"""
+    __tablename__ = 'revoked_tokens'
+    
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    token_type = db.Column(db.String(10), nullable=False, default='access')
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    # Timestamps
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    @classmethod
+    def delete_expired(cls, now=None, batch_size=1000):
+        """
+        Delete entries for tokens that have expired, committing after each batch
+        Returns: number of rows deleted
+        """
+        now = now or datetime.utcnow()
+        deleted = 0
+        
+        while True:
+            jtis = [row.jti for row in db.session.query(cls.jti).filter(cls.expires_at < now).limit(batch_size)]
+            if not jtis:
+                return deleted
+            
+            deleted += cls.query.filter(cls.jti.in_(jtis)).delete(synchronize_session=False)
+            db.session.commit()
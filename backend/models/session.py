@@ -0,0 +1,24 @@
+"""
+Routed Session
+"""
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from the replica chosen for the current request
+
+    utils.replicas sets g.db_replica for read-only requests. Anything
+    that flushes switches the rest of the request back to the primary,
+    so a request never reads from a replica after writing.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing:
+                g.db_replica = None
+            elif g.get('db_replica') is not None:
+                return g.db_replica
+        
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -22,6 +22,10 @@ class Song(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
     rejection_reason = db.Column(db.Text, nullable=True)
     
+    # Moderation lease (see /api/admin/queue)
+    claimed_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    claim_expires_at = db.Column(db.DateTime, nullable=True)
+    
     # Vote count (denormalized for performance)
     vote_count = db.Column(db.Integer, default=0)
     
@@ -33,6 +37,30 @@ class Song(db.Model):
     # Relationships
     votes = db.relationship('Vote', backref='song', lazy=True)
     
+    __table_args__ = (
+        # Contest listings and leaderboards: approved songs of a contest by votes
+        db.Index('ix_songs_contest_status_votes', 'contest_id', 'status', 'vote_count'),
+        # One submission per artist per contest, and an artist's submissions
+        db.Index('ix_songs_artist_contest', 'artist_id', 'contest_id'),
+    )
+    
+    def has_active_claim(self, now=None):
+        """Check if a moderator holds an unexpired lease on this song"""
+        return (
+            self.claimed_by is not None
+            and self.claim_expires_at is not None
+            and self.claim_expires_at > (now or datetime.utcnow())
+        )
+    
+    def is_claimed_by_other(self, user_id, now=None):
+        """Check if a moderator other than user_id holds the lease"""
+        return self.has_active_claim(now) and self.claimed_by != user_id
+    
+    def release_claim(self):
+        """Drop any moderation lease"""
+        self.claimed_by = None
+        self.claim_expires_at = None
+    
     def to_dict(self, include_artist=True):
         """Convert to dictionary for JSON response"""
         data = {
@@ -57,3 +85,23 @@ class Song(db.Model):
             }
         
         return data
+
+
+class SongPeaks(db.Model):
+    """Precomputed waveform peaks for a song"""
+    __tablename__ = 'song_peaks'
+    
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), primary_key=True)
+    
+    # Interleaved (min, max) int8 pairs, see utils.audio.peaks_from_frames
+    peaks = db.Column(db.LargeBinary, nullable=True)
+    num_peaks = db.Column(db.Integer, default=0)
+    sample_rate = db.Column(db.Integer, nullable=True)
+    duration = db.Column(db.Float, nullable=True)
+    
+    # Status
+    status = db.Column(db.String(20), default='ready')  # ready, unavailable
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,22 @@
+"""
+Stats Counter Model
+"""
+from datetime import datetime
+from . import db
+
+
+class StatsCounter(db.Model):
+    """
+    Running totals for the admin dashboard
+
+    Each counter is split over a few slots so concurrent writers rarely
+    wait on the same row lock; the value is the sum over all slots.
+    """
+    __tablename__ = 'stats_counters'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -2,7 +2,6 @@
 User Model
 """
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 
 
@@ -16,9 +15,11 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     roles = db.Column(db.JSON, default=['user'])
     
-    # Password reset
-    reset_token = db.Column(db.String(255), nullable=True)
-    reset_token_expires = db.Column(db.DateTime, nullable=True)
+    # Bumped whenever roles or the artist profile change (see utils.auth)
+    user_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
+    # Tokens issued before this moment are rejected (see utils.revocation)
+    tokens_revoked_before = db.Column(db.DateTime, nullable=True, index=True)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -30,16 +31,29 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the password"""
-        self.password_hash = generate_password_hash(password)
+        from utils.passwords import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Check if password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        """Check if password matches hash, upgrading outdated hashes in place"""
+        from utils.passwords import verify_password, needs_rehash
+        
+        if not verify_password(self.password_hash, password):
+            return False
+        
+        if needs_rehash(self.password_hash):
+            self.set_password(password)
+        
+        return True
     
     def has_role(self, role):
         """Check if user has a specific role"""
         return role in (self.roles or [])
     
+    def bump_version(self):
+        """Invalidate cached principals and token claims for this user"""
+        self.user_version = (self.user_version or 1) + 1
+    
     def to_dict(self):
         """Convert to dictionary for JSON response"""
         return {
@@ -14,12 +14,18 @@ class Vote(db.Model):
     song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False)
     contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'), nullable=False)
     
+    # Fraud screening
+    ip_address = db.Column(db.String(45), nullable=True)
+    is_quarantined = db.Column(db.Boolean, default=False)
+    flag_id = db.Column(db.Integer, db.ForeignKey('vote_flags.id'), nullable=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Unique constraint: one vote per user per contest
+    # Unique constraint: one vote per user per contest (also serves the user's vote lookups)
     __table_args__ = (
         db.UniqueConstraint('user_id', 'contest_id', name='unique_user_contest_vote'),
+        db.Index('ix_votes_song', 'song_id'),
     )
     
     def to_dict(self):
@@ -31,3 +37,42 @@ class Vote(db.Model):
             'contest_id': self.contest_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class VoteFlag(db.Model):
+    """Suspicious voting burst raised by the fraud detector for admin review"""
+    __tablename__ = 'vote_flags'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False)
+    contest_id = db.Column(db.Integer, db.ForeignKey('contests.id'), nullable=False)
+    
+    # Detector output
+    reasons = db.Column(db.JSON, default=list)
+    stats = db.Column(db.JSON, default=dict)
+    
+    # Review
+    status = db.Column(db.String(20), default='open')  # open, released, confirmed
+    resolved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    votes = db.relationship('Vote', backref='flag', lazy='dynamic')
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON response"""
+        return {
+            'id': self.id,
+            'song_id': self.song_id,
+            'contest_id': self.contest_id,
+            'reasons': self.reasons or [],
+            'stats': self.stats or {},
+            'status': self.status,
+            'quarantined_votes': self.votes.filter_by(is_quarantined=True).count(),
+            'resolved_by': self.resolved_by,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
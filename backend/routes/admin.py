@@ -1,44 +1,72 @@
 """
 Admin Routes
 """
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+import os
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from datetime import datetime, timedelta
 from functools import wraps
+from sqlalchemy import select, update, case, or_
 
-from models import db, User, Artist, Song, Vote, Contest, ContestWinner, Payment
+from models import (db, User, Artist, Song, SongPeaks, SongFingerprint, Vote, VoteFlag, Contest, ContestWinner, Payment,
+                    EmailOutbox)
+from utils.stats import bump_counters, read_counters
+from utils.export import stream_export, EXPORT_FORMATS
+from utils.auth import get_principal, has_role
+from utils.revocation import revoke_user_tokens
+from utils.mail_outbox import outbox_status
+from utils.db_pool import pool_report
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# Largest batch accepted by /songs/bulk
+BULK_MODERATION_LIMIT = 1000
+
+DEFAULT_REJECTION_REASON = 'Does not meet guidelines'
+
+# Columns included in each streaming export
+EXPORT_TABLES = {
+    'users': (User, ['id', 'email', 'username', 'roles', 'created_at']),
+    'songs': (Song, ['id', 'artist_id', 'contest_id', 'title', 'audio_url', 'status',
+                     'rejection_reason', 'vote_count', 'created_at', 'approved_at']),
+    'votes': (Vote, ['id', 'user_id', 'song_id', 'contest_id', 'created_at']),
+    'payments': (Payment, ['id', 'user_id', 'transaction_id', 'tx_ref', 'amount', 'currency', 'status',
+                           'payment_type', 'payment_purpose', 'created_at', 'verified_at'])
+}
+
 
 def admin_required(f):
     """Decorator to require admin role"""
     @wraps(f)
     @jwt_required()
     def decorated_function(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        # Tokens without the admin claim are rejected without a lookup;
+        # the cached principal catches admins demoted since the token was issued
+        roles = get_jwt().get('roles')
+        if roles is not None and 'admin' not in roles:
+            return jsonify({'error': 'Admin access required'}), 403
         
-        if not user or 'admin' not in (user.roles or []):
+        if not has_role(get_principal(), 'admin'):
             return jsonify({'error': 'Admin access required'}), 403
         
         return f(*args, **kwargs)
     return decorated_function
 
 
+def available_for(moderator_id, now):
+    """SQL condition: song is pending and not leased to another moderator"""
+    return (Song.status == 'pending') & or_(
+        Song.claimed_by.is_(None),
+        Song.claimed_by == moderator_id,
+        Song.claim_expires_at < now
+    )
+
+
 @admin_bp.route('/dashboard', methods=['GET'])
 @admin_required
 def get_dashboard():
     """Get admin dashboard statistics"""
-    stats = {
-        'total_users': User.query.count(),
-        'total_artists': Artist.query.filter_by(is_paid=True).count(),
-        'total_songs': Song.query.count(),
-        'pending_songs': Song.query.filter_by(status='pending').count(),
-        'approved_songs': Song.query.filter_by(status='approved').count(),
-        'total_votes': Vote.query.count(),
-        'total_payments': Payment.query.filter_by(status='successful').count()
-    }
+    stats = read_counters()
     
     contest = Contest.get_current()
     
@@ -54,8 +82,26 @@ def get_pending_songs():
     """Get all pending song submissions"""
     songs = Song.query.filter_by(status='pending').all()
     
+    # Flag likely re-uploads found by the fingerprint index
+    flagged = {
+        fingerprint.song_id: fingerprint
+        for fingerprint in SongFingerprint.query.filter(
+            SongFingerprint.song_id.in_([song.id for song in songs]),
+            SongFingerprint.duplicate_of_id.isnot(None)
+        ).all()
+    } if songs else {}
+    
+    now = datetime.utcnow()
+    result = []
+    for song in songs:
+        data = song.to_dict()
+        fingerprint = flagged.get(song.id)
+        data['duplicate'] = fingerprint.to_dict() if fingerprint else None
+        data['claimed_by'] = song.claimed_by if song.has_active_claim(now) else None
+        result.append(data)
+    
     return jsonify({
-        'songs': [song.to_dict() for song in songs]
+        'songs': result
     }), 200
 
 
@@ -71,10 +117,19 @@ def approve_song(song_id):
     if song.status != 'pending':
         return jsonify({'error': 'Song is not pending'}), 400
     
+    if song.is_claimed_by_other(int(get_jwt_identity())):
+        return jsonify({'error': 'Song is claimed by another moderator'}), 409
+    
     song.status = 'approved'
     song.approved_at = datetime.utcnow()
+    song.release_claim()
+    bump_counters(pending_songs=-1, approved_songs=1)
     db.session.commit()
     
+    if not SongPeaks.query.get(song.id):
+        from utils.audio_pipeline import schedule_song_analysis
+        schedule_song_analysis(song)
+    
     return jsonify({
         'message': 'Song approved',
         'song': song.to_dict()
@@ -93,10 +148,15 @@ def reject_song(song_id):
     if song.status != 'pending':
         return jsonify({'error': 'Song is not pending'}), 400
     
+    if song.is_claimed_by_other(int(get_jwt_identity())):
+        return jsonify({'error': 'Song is claimed by another moderator'}), 409
+    
     data = request.get_json()
     
     song.status = 'rejected'
-    song.rejection_reason = data.get('reason', 'Does not meet guidelines')
+    song.release_claim()
+    song.rejection_reason = data.get('reason', DEFAULT_REJECTION_REASON)
+    bump_counters(pending_songs=-1)
     db.session.commit()
     
     return jsonify({
@@ -105,6 +165,283 @@ def reject_song(song_id):
     }), 200
 
 
+@admin_bp.route('/songs/bulk', methods=['POST'])
+@admin_required
+def bulk_moderate_songs():
+    """Approve or reject many pending songs in one statement"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    action = data.get('action')
+    
+    if action not in ('approve', 'reject'):
+        return jsonify({'error': 'Action must be approve or reject'}), 400
+    
+    song_ids = data.get('song_ids') or []
+    if not isinstance(song_ids, list) or not all(
+        isinstance(song_id, int) and not isinstance(song_id, bool) for song_id in song_ids
+    ):
+        return jsonify({'error': 'song_ids must be a list of integers'}), 400
+    
+    reasons = data.get('reasons') or {}
+    if not isinstance(reasons, dict) or not all(
+        isinstance(reason, str) or reason is None for reason in reasons.values()
+    ):
+        return jsonify({'error': 'reasons must map song ids to strings'}), 400
+    
+    if not isinstance(data.get('reason') or '', str):
+        return jsonify({'error': 'reason must be a string'}), 400
+    
+    song_ids = list(dict.fromkeys(song_ids))
+    if not song_ids:
+        return jsonify({'error': 'song_ids required'}), 400
+    
+    if len(song_ids) > BULK_MODERATION_LIMIT:
+        return jsonify({'error': f'At most {BULK_MODERATION_LIMIT} songs per request'}), 400
+    
+    moderator_id = int(get_jwt_identity())
+    now = datetime.utcnow()
+    
+    # Lock the rows so the outcomes reported match what the UPDATE changed
+    current = {
+        song.id: song
+        for song in Song.query.filter(Song.id.in_(song_ids)).with_for_update().all()
+    }
+    done = 'approved' if action == 'approve' else 'rejected'
+    outcomes = {}
+    for song_id in song_ids:
+        song = current.get(song_id)
+        if not song:
+            outcomes[song_id] = 'not_found'
+        elif song.status != 'pending':
+            outcomes[song_id] = 'not_pending'
+        elif song.is_claimed_by_other(moderator_id, now):
+            outcomes[song_id] = 'claimed'
+        else:
+            outcomes[song_id] = done
+    
+    pending_ids = [song_id for song_id, outcome in outcomes.items() if outcome == done]
+    processed = 0
+    
+    if pending_ids:
+        stmt = update(Song).where(
+            Song.id.in_(pending_ids),
+            available_for(moderator_id, now)
+        ).values(claimed_by=None, claim_expires_at=None)
+        
+        if action == 'approve':
+            stmt = stmt.values(status='approved', approved_at=now)
+        else:
+            default_reason = data.get('reason') or DEFAULT_REJECTION_REASON
+            reasons = {
+                int(song_id): reason
+                for song_id, reason in reasons.items()
+                if str(song_id).isdigit() and int(song_id) in current and reason
+            }
+            stmt = stmt.values(
+                status='rejected',
+                rejection_reason=case(reasons, value=Song.id, else_=default_reason) if reasons else default_reason
+            )
+        
+        processed = db.session.execute(stmt.execution_options(synchronize_session=False)).rowcount
+        
+        if action == 'approve':
+            bump_counters(pending_songs=-processed, approved_songs=processed)
+        else:
+            bump_counters(pending_songs=-processed)
+    
+    db.session.commit()
+    
+    # Queue audio analysis for approved songs that don't have it yet
+    if action == 'approve' and pending_ids:
+        from utils.audio_pipeline import schedule_song_analysis
+        for song in Song.query.outerjoin(
+            SongPeaks, SongPeaks.song_id == Song.id
+        ).filter(Song.id.in_(pending_ids), SongPeaks.song_id.is_(None)).all():
+            schedule_song_analysis(song)
+    
+    return jsonify({
+        'message': f'{processed} songs {done}',
+        'processed': processed,
+        'results': [
+            {'song_id': song_id, 'outcome': outcome}
+            for song_id, outcome in outcomes.items()
+        ]
+    }), 200
+
+
+@admin_bp.route('/queue', methods=['GET'])
+@admin_required
+def get_my_queue():
+    """Get the pending songs currently leased to this moderator"""
+    moderator_id = int(get_jwt_identity())
+    
+    return jsonify(_queue_response(moderator_id, datetime.utcnow())), 200
+
+
+@admin_bp.route('/queue/claim', methods=['POST'])
+@admin_required
+def claim_queue():
+    """Lease the next page of pending songs to this moderator"""
+    data = request.get_json(silent=True) or {}
+    moderator_id = int(get_jwt_identity())
+    max_claim = current_app.config['MODERATION_CLAIM_LIMIT']
+    
+    try:
+        limit = max(1, min(int(data.get('limit', max_claim)), max_claim))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config['MODERATION_LEASE_SECONDS'])
+    
+    # SKIP LOCKED lets concurrent claimers pass over each other's rows (MySQL 8);
+    # the guarded UPDATE keeps claims exclusive where it is unsupported (SQLite)
+    candidate_ids = [
+        song_id for song_id, in db.session.query(Song.id)
+        .filter(available_for(moderator_id, now))
+        .order_by(Song.created_at, Song.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    ]
+    
+    if candidate_ids:
+        db.session.execute(
+            update(Song)
+            .where(Song.id.in_(candidate_ids), available_for(moderator_id, now))
+            .values(claimed_by=moderator_id, claim_expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    
+    return jsonify(_queue_response(moderator_id, now)), 200
+
+
+@admin_bp.route('/queue/renew', methods=['POST'])
+@admin_required
+def renew_queue():
+    """Extend this moderator's unexpired leases"""
+    moderator_id = int(get_jwt_identity())
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config['MODERATION_LEASE_SECONDS'])
+    
+    db.session.execute(
+        update(Song)
+        .where(Song.claimed_by == moderator_id, Song.claim_expires_at > now, Song.status == 'pending')
+        .values(claim_expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
+    return jsonify(_queue_response(moderator_id, now)), 200
+
+
+@admin_bp.route('/queue/release', methods=['POST'])
+@admin_required
+def release_queue():
+    """Return leased songs to the pool (all of them unless song_ids is given)"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    
+    song_ids = data.get('song_ids')
+    if song_ids is not None and (not isinstance(song_ids, list) or not all(
+        isinstance(song_id, int) and not isinstance(song_id, bool) for song_id in song_ids
+    )):
+        return jsonify({'error': 'song_ids must be a list of integers'}), 400
+    
+    moderator_id = int(get_jwt_identity())
+    stmt = update(Song).where(Song.claimed_by == moderator_id)
+    if song_ids:
+        stmt = stmt.where(Song.id.in_(song_ids))
+    
+    released = db.session.execute(
+        stmt.values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    
+    return jsonify({'message': f'{released} songs released'}), 200
+
+
+def _queue_response(moderator_id, now):
+    """Songs leased to a moderator plus the size of the unclaimed pool"""
+    songs = Song.query.filter(
+        Song.claimed_by == moderator_id,
+        Song.claim_expires_at > now,
+        Song.status == 'pending'
+    ).order_by(Song.created_at, Song.id).all()
+    
+    available = Song.query.filter(
+        Song.status == 'pending',
+        or_(Song.claimed_by.is_(None), Song.claim_expires_at < now)
+    ).count()
+    
+    return {
+        'songs': [
+            {**song.to_dict(), 'claim_expires_at': song.claim_expires_at.isoformat()}
+            for song in songs
+        ],
+        'available': available
+    }
+
+
+@admin_bp.route('/vote-flags', methods=['GET'])
+@admin_required
+def get_vote_flags():
+    """Get fraud detector flags (open ones by default)"""
+    status = request.args.get('status', 'open')
+    
+    flags = VoteFlag.query.filter_by(status=status).order_by(VoteFlag.created_at.desc()).limit(200).all()
+    
+    return jsonify({
+        'flags': [flag.to_dict() for flag in flags]
+    }), 200
+
+
+@admin_bp.route('/vote-flags/<int:flag_id>/resolve', methods=['POST'])
+@admin_required
+def resolve_vote_flag(flag_id):
+    """Release a flag's quarantined votes back into the count, or confirm them as fraud"""
+    flag = VoteFlag.query.get(flag_id)
+    
+    if not flag:
+        return jsonify({'error': 'Flag not found'}), 404
+    
+    if flag.status != 'open':
+        return jsonify({'error': 'Flag already resolved'}), 400
+    
+    data = request.get_json() or {}
+    action = data.get('action')
+    
+    if action not in ('release', 'confirm'):
+        return jsonify({'error': 'Action must be release or confirm'}), 400
+    
+    released = 0
+    if action == 'release':
+        released = Vote.query.filter_by(
+            flag_id=flag.id, is_quarantined=True
+        ).update({'is_quarantined': False}, synchronize_session=False)
+        
+        if released:
+            Song.query.filter_by(id=flag.song_id).update(
+                {'vote_count': Song.vote_count + released}, synchronize_session=False
+            )
+    
+    flag.status = 'released' if action == 'release' else 'confirmed'
+    flag.resolved_by = int(get_jwt_identity())
+    flag.resolved_at = datetime.utcnow()
+    db.session.commit()
+    
+    return jsonify({
+        'message': f'Flag {flag.status}',
+        'released_votes': released,
+        'flag': flag.to_dict()
+    }), 200
+
+
 @admin_bp.route('/contests', methods=['GET'])
 @admin_required
 def get_contests():
@@ -217,3 +554,77 @@ def get_users():
     return jsonify({
         'users': [user.to_dict() for user in users]
     }), 200
+
+
+@admin_bp.route('/users/<int:user_id>/revoke-tokens', methods=['POST'])
+@admin_required
+def revoke_tokens(user_id):
+    """Sign a user out everywhere by revoking every token issued so far"""
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    revoke_user_tokens(user)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Tokens revoked',
+        'tokens_revoked_before': user.tokens_revoked_before.isoformat()
+    }), 200
+
+
+@admin_bp.route('/email-outbox', methods=['GET'])
+@admin_required
+def get_email_outbox():
+    """Outbox delivery status: counts per status and the latest failures"""
+    failures = EmailOutbox.query.filter(
+        EmailOutbox.last_error.isnot(None)
+    ).order_by(EmailOutbox.updated_at.desc()).limit(50).all()
+    
+    return jsonify({
+        'counts': outbox_status(),
+        'recent_failures': [message.to_dict() for message in failures]
+    }), 200
+
+
+@admin_bp.route('/db-pool', methods=['GET'])
+@admin_required
+def get_db_pool():
+    """Connection pool metrics and sizing advice of the worker process that serves the request"""
+    return jsonify({
+        'pid': os.getpid(),
+        'profile': current_app.config['DB_POOL_PROFILE'],
+        'engines': pool_report(current_app)
+    }), 200
+
+
+@admin_bp.route('/export/<string:table>', methods=['GET'])
+@admin_required
+def export_table(table):
+    """Stream a table as NDJSON or CSV, optionally gzipped"""
+    if table not in EXPORT_TABLES:
+        return jsonify({'error': 'Unknown export'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+    
+    compress = request.args.get('gzip', 'false').lower() in ('1', 'true')
+    
+    model, columns = EXPORT_TABLES[table]
+    stmt = select(*[getattr(model, column) for column in columns]).order_by(model.id)
+    
+    # Optional filters
+    if 'status' in request.args and hasattr(model, 'status'):
+        stmt = stmt.where(model.status == request.args['status'])
+    if 'contest_id' in request.args and hasattr(model, 'contest_id'):
+        stmt = stmt.where(model.contest_id == request.args.get('contest_id', type=int))
+    
+    filename = f'{table}.{fmt}' + ('.gz' if compress else '')
+    
+    return Response(
+        stream_with_context(stream_export(stmt, fmt, compress)),
+        mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
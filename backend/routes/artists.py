@@ -6,10 +6,16 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from models import db, User, Artist
 from utils.security import sanitize_input
+from utils.auth import get_principal, get_principal_artist, invalidate_principal, issue_access_token
 
 artists_bp = Blueprint('artists', __name__, url_prefix='/api/artists')
 
 
+def _current_artist():
+    """Load the authenticated user's artist profile"""
+    return get_principal_artist(get_principal())
+
+
 @artists_bp.route('', methods=['GET'])
 def get_artists():
     """Get all verified artists"""
@@ -34,27 +40,24 @@ def get_artist(artist_id):
 @jwt_required()
 def get_artist_profile():
     """Get current user's artist profile"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    artist = _current_artist()
     
-    if not user or not user.artist:
+    if not artist:
         return jsonify({'error': 'Artist profile not found'}), 404
     
-    return jsonify({'artist': user.artist.to_dict()}), 200
+    return jsonify({'artist': artist.to_dict()}), 200
 
 
 @artists_bp.route('/profile', methods=['PUT'])
 @jwt_required()
 def update_artist_profile():
     """Update artist profile"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    artist = _current_artist()
     
-    if not user or not user.artist:
+    if not artist:
         return jsonify({'error': 'Artist profile not found'}), 404
     
     data = request.get_json()
-    artist = user.artist
     
     # Update allowed fields
     if 'stage_name' in data:
@@ -103,11 +106,15 @@ def create_artist_profile():
         user.roles = user.roles + ['artist']
     
     db.session.add(artist)
+    user.bump_version()
     db.session.commit()
     
+    invalidate_principal(user.id)
+    
     return jsonify({
         'message': 'Artist profile created',
-        'artist': artist.to_dict()
+        'artist': artist.to_dict(),
+        'token': issue_access_token(user)
     }), 201
 
 
@@ -115,13 +122,11 @@ def create_artist_profile():
 @jwt_required()
 def check_eligibility():
     """Check if artist can participate in current contest"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    artist = _current_artist()
     
-    if not user or not user.artist:
+    if not artist:
         return jsonify({'error': 'Artist profile not found'}), 404
     
-    artist = user.artist
     can_participate = artist.can_participate()
     
     return jsonify({
@@ -2,22 +2,21 @@
 Authentication Routes
 """
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import (
-    create_access_token, create_refresh_token,
-    jwt_required, get_jwt_identity
-)
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
-import secrets
-
-from models import db, User
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, decode_token
+
+from models import db, User, PasswordResetToken
 from utils.security import sanitize_input, validate_email, validate_password
-from utils.email import send_password_reset_email
+from utils.email import send_password_reset_email, send_welcome_email
+from utils.stats import bump_counters
+from utils.auth import issue_tokens, issue_access_token
+from utils.revocation import revoke_token, revoke_user_tokens
+from utils.rate_limit import limit_from_config
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 
 @auth_bp.route('/register', methods=['POST'])
+@limit_from_config('RATELIMIT_REGISTER')
 def register():
     """Register a new user"""
     data = request.get_json()
@@ -50,16 +49,17 @@ def register():
     user = User(
         email=email,
         username=username,
-        password_hash=generate_password_hash(password),
         roles=[role]
     )
+    user.set_password(password)
     
     db.session.add(user)
+    bump_counters(total_users=1)
+    send_welcome_email(email, username)
     db.session.commit()
     
     # Generate tokens
-    access_token = create_access_token(identity=str(user.id))
-    refresh_token = create_refresh_token(identity=str(user.id))
+    access_token, refresh_token = issue_tokens(user)
     
     response = {
         'message': 'Registration successful',
@@ -73,6 +73,7 @@ def register():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@limit_from_config('RATELIMIT_LOGIN')
 def login():
     """Login user"""
     data = request.get_json()
@@ -82,11 +83,14 @@ def login():
     
     user = User.query.filter_by(email=email).first()
     
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user or not user.check_password(password):
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    access_token = create_access_token(identity=str(user.id))
-    refresh_token = create_refresh_token(identity=str(user.id))
+    # Persist a hash upgraded to the current parameters
+    if db.session.is_modified(user):
+        db.session.commit()
+    
+    access_token, refresh_token = issue_tokens(user)
     
     return jsonify({
         'token': access_token,
@@ -96,6 +100,7 @@ def login():
 
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@limit_from_config('RATELIMIT_PASSWORD_RESET')
 def forgot_password():
     """Request password reset"""
     data = request.get_json()
@@ -105,44 +110,38 @@ def forgot_password():
     user = User.query.filter_by(email=email).first()
     
     if user:
-        # Generate secure reset token
-        reset_token = secrets.token_urlsafe(32)
-        user.reset_token = reset_token
-        user.reset_token_expires = datetime.utcnow() + timedelta(hours=1)
-        db.session.commit()
+        # Generate secure reset token (only its hash is stored)
+        reset_token = PasswordResetToken.issue(user, current_app.config['PASSWORD_RESET_TOKEN_TTL'])
         
-        # Send reset email
+        # Queue reset email; it is delivered by `flask mail send-outbox`
         reset_url = f"{current_app.config['FRONTEND_URL']}/reset-password?token={reset_token}"
         send_password_reset_email(user.email, user.username, reset_url)
+        db.session.commit()
     
     return jsonify({'message': 'If an account exists, reset instructions have been sent'}), 200
 
 
 @auth_bp.route('/verify-reset-token', methods=['POST'])
+@limit_from_config('RATELIMIT_PASSWORD_RESET')
 def verify_reset_token():
     """Verify password reset token"""
     data = request.get_json()
-    token = data.get('token', '')
-    
-    user = User.query.filter_by(reset_token=token).first()
+    reset_token = PasswordResetToken.find(data.get('token', ''))
     
-    if not user or not user.reset_token_expires:
+    if not reset_token or reset_token.used_at:
         return jsonify({'error': 'Invalid or expired token'}), 400
     
-    if datetime.utcnow() > user.reset_token_expires:
-        user.reset_token = None
-        user.reset_token_expires = None
-        db.session.commit()
+    if not reset_token.is_valid():
         return jsonify({'error': 'Token has expired'}), 400
     
     return jsonify({'valid': True}), 200
 
 
 @auth_bp.route('/reset-password', methods=['POST'])
+@limit_from_config('RATELIMIT_PASSWORD_RESET')
 def reset_password():
     """Reset password with token"""
     data = request.get_json()
-    token = data.get('token', '')
     new_password = data.get('password', '')
     
     # Validate password
@@ -150,21 +149,22 @@ def reset_password():
     if not password_valid:
         return jsonify({'error': password_msg}), 400
     
-    user = User.query.filter_by(reset_token=token).first()
+    reset_token = PasswordResetToken.find(data.get('token', ''))
     
-    if not user or not user.reset_token_expires:
+    if not reset_token or reset_token.used_at:
         return jsonify({'error': 'Invalid or expired token'}), 400
     
-    if datetime.utcnow() > user.reset_token_expires:
-        user.reset_token = None
-        user.reset_token_expires = None
-        db.session.commit()
+    if not reset_token.is_valid():
         return jsonify({'error': 'Token has expired'}), 400
     
-    # Update password
-    user.password_hash = generate_password_hash(new_password)
-    user.reset_token = None
-    user.reset_token_expires = None
+    # Claim the token first so a concurrent request cannot reuse it
+    if not reset_token.consume():
+        db.session.rollback()
+        return jsonify({'error': 'Invalid or expired token'}), 400
+    
+    # Update password and sign out every existing session
+    reset_token.user.set_password(new_password)
+    revoke_user_tokens(reset_token.user)
     db.session.commit()
     
     return jsonify({'message': 'Password reset successful'}), 200
@@ -173,12 +173,48 @@ def reset_password():
 @auth_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh():
-    """Refresh access token"""
+    """Refresh access token with the user's current claims"""
     user_id = get_jwt_identity()
-    access_token = create_access_token(identity=user_id)
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    access_token = issue_access_token(user)
     return jsonify({'token': access_token}), 200
 
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the current access token, its refresh token if given, or all of the user's tokens"""
+    data = request.get_json(silent=True) or {}
+    claims = get_jwt()
+    
+    if data.get('all_devices'):
+        user = User.query.get(get_jwt_identity())
+        if user:
+            revoke_user_tokens(user)
+    else:
+        revoke_token(claims)
+        
+        refresh_token = data.get('refresh_token')
+        if refresh_token:
+            try:
+                refresh_claims = decode_token(refresh_token)
+            except Exception:
+                return jsonify({'error': 'Invalid refresh token'}), 400
+            
+            if refresh_claims.get('sub') != claims.get('sub') or refresh_claims.get('type') != 'refresh':
+                return jsonify({'error': 'Invalid refresh token'}), 400
+            
+            revoke_token(refresh_claims)
+    
+    db.session.commit()
+    
+    return jsonify({'message': 'Logged out successfully'}), 200
+
+
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
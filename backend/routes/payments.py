@@ -4,22 +4,27 @@ Payment Routes - Flutterwave Integration
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
-import requests
 import hashlib
 import hmac
 
-from models import db, User, Artist, Payment
+from models import db, Payment
 from utils.security import sanitize_input, validate_transaction_ref
+from utils.stats import bump_counters
+from utils.auth import get_principal, get_principal_artist
+from utils.flutterwave import get_client, FlutterwaveError, CircuitOpen
+from utils.payment_events import record_event
+from utils.idempotency import idempotent
+from utils.rate_limit import limiter
 
 payments_bp = Blueprint('payments', __name__, url_prefix='/api/payments')
 
 
 @payments_bp.route('/initialize', methods=['POST'])
 @jwt_required()
+@idempotent
 def initialize_payment():
     """Initialize Flutterwave payment for artist registration"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_principal()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -59,12 +64,13 @@ def initialize_payment():
 @jwt_required()
 def verify_payment():
     """Verify Flutterwave payment"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_principal()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
+    artist = get_principal_artist(user)
+    
     data = request.get_json()
     transaction_id = data.get('transaction_id')
     tx_ref = data.get('tx_ref')
@@ -72,22 +78,9 @@ def verify_payment():
     if not transaction_id:
         return jsonify({'error': 'Transaction ID required'}), 400
     
-    # Verify with Flutterwave API
-    flw_secret = current_app.config['FLUTTERWAVE_SECRET_KEY']
-    
-    headers = {
-        'Authorization': f'Bearer {flw_secret}',
-        'Content-Type': 'application/json'
-    }
-    
+    # Verify with Flutterwave API (pooled, cached and deduplicated per transaction)
     try:
-        response = requests.get(
-            f'https://api.flutterwave.com/v3/transactions/{transaction_id}/verify',
-            headers=headers,
-            timeout=30
-        )
-        
-        result = response.json()
+        result = get_client().verify_transaction(transaction_id)
         
         if result.get('status') != 'success':
             return jsonify({'error': 'Payment verification failed'}), 400
@@ -106,6 +99,8 @@ def verify_payment():
         # Update or create payment record
         payment = Payment.query.filter_by(tx_ref=tx_ref).first()
         
+        newly_successful = not payment or payment.status != 'successful'
+        
         if payment:
             payment.transaction_id = str(transaction_id)
             payment.flw_ref = payment_data.get('flw_ref')
@@ -127,11 +122,13 @@ def verify_payment():
             db.session.add(payment)
         
         # Update artist profile
-        if user.artist:
-            user.artist.is_paid = True
-            user.artist.is_verified = True
-            user.artist.payment_id = payment.id
+        newly_paid = bool(artist and not artist.is_paid)
+        if artist:
+            artist.is_paid = True
+            artist.is_verified = True
+            artist.payment_id = payment.id
         
+        bump_counters(total_payments=int(newly_successful), total_artists=int(newly_paid))
         db.session.commit()
         
         return jsonify({
@@ -139,45 +136,30 @@ def verify_payment():
             'payment': payment.to_dict()
         }), 200
         
-    except requests.exceptions.RequestException as e:
+    except CircuitOpen as e:
+        return jsonify({'error': 'Payment provider unavailable, please retry'}), 503, {'Retry-After': str(e.retry_after)}
+    except FlutterwaveError as e:
         current_app.logger.error(f"Flutterwave API error: {e}")
-        return jsonify({'error': 'Payment verification failed'}), 500
+        return jsonify({'error': 'Payment verification failed'}), 502
 
 
 @payments_bp.route('/webhook', methods=['POST'])
+@limiter.exempt
 def payment_webhook():
-    """Handle Flutterwave webhook"""
+    """Handle Flutterwave webhook: store the event and acknowledge right away"""
     # Verify webhook signature
-    signature = request.headers.get('verif-hash')
+    signature = request.headers.get('verif-hash') or ''
     secret_hash = current_app.config.get('FLUTTERWAVE_WEBHOOK_SECRET')
     
-    if secret_hash and signature != secret_hash:
+    if secret_hash and not hmac.compare_digest(signature, secret_hash):
         return jsonify({'error': 'Invalid signature'}), 401
     
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid payload'}), 400
     
-    if data.get('event') == 'charge.completed':
-        payment_data = data.get('data', {})
-        
-        if payment_data.get('status') == 'successful':
-            tx_ref = payment_data.get('tx_ref')
-            
-            payment = Payment.query.filter_by(tx_ref=tx_ref).first()
-            
-            if payment and payment.status == 'pending':
-                payment.transaction_id = str(payment_data.get('id'))
-                payment.flw_ref = payment_data.get('flw_ref')
-                payment.status = 'successful'
-                payment.payment_type = payment_data.get('payment_type')
-                payment.verified_at = datetime.utcnow()
-                
-                # Update artist
-                user = User.query.get(payment.user_id)
-                if user and user.artist:
-                    user.artist.is_paid = True
-                    user.artist.is_verified = True
-                
-                db.session.commit()
+    # Applied later by `flask payments process-events`; redeliveries are deduplicated
+    record_event(data)
     
     return jsonify({'status': 'received'}), 200
 
@@ -1,12 +1,15 @@
 """
 Song Routes
 """
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, make_response
+from flask_jwt_extended import jwt_required
 from datetime import datetime
 
-from models import db, User, Song, Contest
+from models import db, Song, SongPeaks, Contest
 from utils.security import sanitize_input
+from utils.stats import bump_counters
+from utils.auth import get_principal, get_principal_artist
+from utils.idempotency import idempotent
 
 songs_bp = Blueprint('songs', __name__, url_prefix='/api/songs')
 
@@ -40,17 +43,38 @@ def get_song(song_id):
     return jsonify({'song': song.to_dict()}), 200
 
 
+@songs_bp.route('/<int:song_id>/peaks', methods=['GET'])
+def get_song_peaks(song_id):
+    """Get precomputed waveform peaks as interleaved (min, max) int8 pairs"""
+    peaks = SongPeaks.query.get(song_id)
+    
+    if not peaks or peaks.status != 'ready':
+        return jsonify({'error': 'Waveform not available'}), 404
+    
+    etag = f'{song_id}-{int(peaks.updated_at.timestamp())}' if peaks.updated_at else str(song_id)
+    if request.if_none_match.contains(etag):
+        return '', 304
+    
+    response = make_response(peaks.peaks)
+    response.headers['Content-Type'] = 'application/octet-stream'
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    response.headers['X-Peaks-Count'] = str(peaks.num_peaks)
+    response.headers['X-Duration'] = f'{peaks.duration:.3f}'
+    response.set_etag(etag)
+    
+    return response
+
+
 @songs_bp.route('/my-submissions', methods=['GET'])
 @jwt_required()
 def get_my_submissions():
     """Get current user's song submissions"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    artist = get_principal_artist(get_principal())
     
-    if not user or not user.artist:
+    if not artist:
         return jsonify({'songs': []}), 200
     
-    songs = Song.query.filter_by(artist_id=user.artist.id).all()
+    songs = Song.query.filter_by(artist_id=artist.id).all()
     
     return jsonify({
         'songs': [song.to_dict(include_artist=False) for song in songs]
@@ -59,16 +83,14 @@ def get_my_submissions():
 
 @songs_bp.route('/submit', methods=['POST'])
 @jwt_required()
+@idempotent
 def submit_song():
     """Submit a song for the current contest"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    artist = get_principal_artist(get_principal())
     
-    if not user or not user.artist:
+    if not artist:
         return jsonify({'error': 'Artist profile required'}), 403
     
-    artist = user.artist
-    
     # Check if artist has paid
     if not artist.is_paid:
         return jsonify({'error': 'Payment required to submit songs'}), 403
@@ -112,8 +134,12 @@ def submit_song():
     )
     
     db.session.add(song)
+    bump_counters(total_songs=1, pending_songs=1)
     db.session.commit()
     
+    from utils.audio_pipeline import schedule_song_analysis
+    schedule_song_analysis(song)
+    
     return jsonify({
         'message': 'Song submitted successfully. Pending approval.',
         'song': song.to_dict()
@@ -124,15 +150,13 @@ def submit_song():
 @jwt_required()
 def update_song(song_id):
     """Update song (only if pending)"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    
     song = Song.query.get(song_id)
     
     if not song:
         return jsonify({'error': 'Song not found'}), 404
     
-    if not user.artist or song.artist_id != user.artist.id:
+    artist = get_principal_artist(get_principal())
+    if not artist or song.artist_id != artist.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
     if song.status != 'pending':
@@ -140,6 +164,8 @@ def update_song(song_id):
     
     data = request.get_json()
     
+    audio_changed = 'audio_url' in data and data['audio_url'] != song.audio_url
+    
     if 'title' in data:
         song.title = sanitize_input(data['title'])
     if 'audio_url' in data:
@@ -149,6 +175,10 @@ def update_song(song_id):
     
     db.session.commit()
     
+    if audio_changed:
+        from utils.audio_pipeline import schedule_song_analysis
+        schedule_song_analysis(song)
+    
     return jsonify({
         'message': 'Song updated',
         'song': song.to_dict()
@@ -4,17 +4,22 @@ Voting Routes
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from models import db, User, Song, Vote, Contest
+from models import db, Song, Vote, Contest
+from utils.stats import bump_counters
+from utils.auth import get_principal
+from utils.idempotency import idempotent
+from utils.rate_limit import limit_from_config
 
 votes_bp = Blueprint('votes', __name__, url_prefix='/api/votes')
 
 
 @votes_bp.route('/cast', methods=['POST'])
+@limit_from_config('RATELIMIT_VOTE')
 @jwt_required()
+@idempotent
 def cast_vote():
     """Cast a vote for a song"""
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_principal()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -60,13 +65,17 @@ def cast_vote():
     vote = Vote(
         user_id=user.id,
         song_id=song.id,
-        contest_id=contest.id
+        contest_id=contest.id,
+        ip_address=request.remote_addr
     )
     
-    # Increment song vote count
-    song.vote_count += 1
+    # Increment song vote count unless the vote is held for fraud review
+    from utils.fraud import screen_vote
+    if not screen_vote(vote, user.created_at):
+        song.vote_count += 1
     
     db.session.add(vote)
+    bump_counters(total_votes=1)
     db.session.commit()
     
     return jsonify({
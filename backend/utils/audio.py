@@ -0,0 +1,369 @@
+"""
+Audio Utilities
+
+Pure functions that run inside the audio pipeline's worker processes.
+They must not touch the database or the Flask application.
+"""
+import ipaddress
+import os
+import socket
+import struct
+import tempfile
+from urllib.parse import urljoin, urlparse
+
+import numpy as np
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_FLOAT = 3
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 3
+
+# Fingerprinting
+FINGERPRINT_SAMPLE_RATE = 11025
+DOWNMIX_BLOCK_FRAMES = 1 << 20
+FFT_SIZE = 1024
+FFT_HOP = 512
+PEAK_NEIGHBORHOOD = 15
+PEAKS_PER_SECOND = 5
+FAN_OUT = 3
+MAX_DT = 63
+
+
+class UnsupportedAudioError(ValueError):
+    """Raised when an audio file cannot be decoded without an external codec"""
+
+
+def read_wav_header(path: str) -> dict:
+    """
+    Walk the RIFF chunks of a WAV file
+    Returns: dict with format, channels, sample_rate, bits, data_offset, data_size
+    """
+    with open(path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise UnsupportedAudioError('Not a RIFF/WAVE file')
+
+        header = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if audio_format == WAV_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    audio_format = struct.unpack('<H', fmt[24:26])[0]
+                header.update(
+                    format=audio_format,
+                    channels=channels,
+                    sample_rate=sample_rate,
+                    bits=bits
+                )
+            elif chunk_id == b'data':
+                header['data_offset'] = f.tell()
+                header['data_size'] = min(chunk_size, os.path.getsize(path) - f.tell())
+                break
+            else:
+                f.seek(chunk_size, os.SEEK_CUR)
+
+            # Chunks are word aligned
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+
+    if 'format' not in header or 'data_offset' not in header:
+        raise UnsupportedAudioError('WAV file is missing fmt or data chunk')
+
+    return header
+
+
+def load_pcm(path: str) -> tuple:
+    """
+    Memory-map the sample data of a WAV file without reading it into RAM
+    Returns: (frames: ndarray of shape (n_frames, channels), sample_rate: int, full_scale: float)
+    """
+    header = read_wav_header(path)
+    audio_format, bits, channels = header['format'], header['bits'], header['channels']
+
+    if audio_format == WAV_FORMAT_PCM and bits in (8, 16, 32):
+        dtype = {8: np.uint8, 16: np.dtype('<i2'), 32: np.dtype('<i4')}[bits]
+        full_scale = float(2 ** (bits - 1))
+    elif audio_format == WAV_FORMAT_FLOAT and bits in (32, 64):
+        dtype = np.dtype('<f4') if bits == 32 else np.dtype('<f8')
+        full_scale = 1.0
+    else:
+        raise UnsupportedAudioError(f'Unsupported WAV encoding (format={audio_format}, bits={bits})')
+
+    frame_bytes = channels * (bits // 8)
+    n_frames = header['data_size'] // frame_bytes
+    if n_frames == 0:
+        raise UnsupportedAudioError('WAV file contains no samples')
+
+    frames = np.memmap(
+        path, dtype=dtype, mode='r',
+        offset=header['data_offset'], shape=(n_frames, channels)
+    )
+    return frames, header['sample_rate'], full_scale
+
+
+def check_public_host(url: str) -> str:
+    """
+    Refuse URLs whose host resolves to a private, loopback or otherwise non-public address
+    Returns: the checked address to connect to
+    """
+    host = urlparse(url).hostname
+    if not host:
+        raise UnsupportedAudioError('Audio URL has no host')
+
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)]
+    except socket.gaierror:
+        raise UnsupportedAudioError(f'Cannot resolve audio host {host}')
+
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%', 1)[0]).is_global:
+            raise UnsupportedAudioError(f'Audio host {host} is not a public address')
+
+    return addresses[0]
+
+
+def _pinned_session(address: str):
+    """
+    requests Session that connects to address whatever the URL's host
+    resolves to by then, so a rebinding DNS name cannot swap in a private
+    address after check_public_host(). The Host header, SNI and certificate
+    check still use the URL's host. Environment proxies are ignored, since
+    the connection must go to the checked address itself.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class Pinned:
+        def _new_conn(self):
+            self._dns_host = address
+            return super()._new_conn()
+
+    pool_classes = {
+        'http': type('PinnedHTTPConnectionPool', (HTTPConnectionPool,), {
+            'ConnectionCls': type('PinnedHTTPConnection', (Pinned, HTTPConnection), {})
+        }),
+        'https': type('PinnedHTTPSConnectionPool', (HTTPSConnectionPool,), {
+            'ConnectionCls': type('PinnedHTTPSConnection', (Pinned, HTTPSConnection), {})
+        })
+    }
+
+    class PinnedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = pool_classes
+
+    session = requests.Session()
+    session.trust_env = False
+    session.mount('http://', PinnedAdapter(max_retries=0))
+    session.mount('https://', PinnedAdapter(max_retries=0))
+    return session
+
+
+def _get(url: str) -> tuple:
+    """Streamed GET of url over a connection to the address check_public_host() approved"""
+    session = _pinned_session(check_public_host(url))
+    try:
+        return session, session.get(url, stream=True, timeout=(5, 60), allow_redirects=False)
+    except Exception:
+        session.close()
+        raise
+
+
+def download_audio(audio_url: str, path: str, max_bytes: int) -> None:
+    """
+    Download a remote audio file to path, at most max_bytes of it
+    Every hop of a redirect is checked with check_public_host() and
+    fetched from the address that was checked.
+    """
+    url = audio_url
+    for _ in range(MAX_REDIRECTS + 1):
+        session, response = _get(url)
+        if not response.is_redirect:
+            break
+        url = urljoin(url, response.headers['Location'])
+        response.close()
+        session.close()
+        if urlparse(url).scheme not in ('http', 'https'):
+            raise UnsupportedAudioError('Audio URL redirects to an unsupported scheme')
+    else:
+        raise UnsupportedAudioError('Too many redirects downloading audio')
+
+    with session, response, open(path, 'wb') as f:
+        response.raise_for_status()
+
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > max_bytes:
+            raise UnsupportedAudioError(f'Audio file is larger than {max_bytes} bytes')
+
+        # Content-Length can be missing or wrong, so count what actually arrives
+        received = 0
+        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_bytes:
+                raise UnsupportedAudioError(f'Audio file is larger than {max_bytes} bytes')
+            f.write(chunk)
+
+
+def resolve_audio_path(audio_url: str, upload_folder: str, max_download_bytes: int) -> tuple:
+    """
+    Map a song's audio_url to a local file, downloading remote files if needed
+    Returns: (path: str, is_temporary: bool)
+    """
+    parsed = urlparse(audio_url or '')
+    filename = os.path.basename(parsed.path)
+
+    if not filename:
+        raise UnsupportedAudioError('Song has no audio file')
+
+    # Files we host ourselves are read straight from the upload folder
+    local_path = os.path.join(upload_folder, filename)
+    if os.path.isfile(local_path):
+        return local_path, False
+
+    if parsed.scheme not in ('http', 'https'):
+        raise UnsupportedAudioError(f'Audio file not found: {filename}')
+
+    suffix = os.path.splitext(filename)[1]
+    fd, temp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        download_audio(audio_url, temp_path, max_download_bytes)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+    return temp_path, True
+
+
+def peaks_from_frames(frames, sample_rate: int, full_scale: float, num_peaks: int) -> dict:
+    """
+    Downsample a track to num_peaks min/max pairs
+
+    The blob is num_peaks interleaved (min, max) signed bytes, scaled so
+    that +/-127 is full scale, i.e. 2 * num_peaks bytes per song.
+    """
+    n_frames, channels = frames.shape
+
+    num_peaks = min(num_peaks, n_frames)
+    bucket = n_frames // num_peaks
+
+    # Each row holds every sample (all channels) of one bucket
+    buckets = frames[:bucket * num_peaks].reshape(num_peaks, bucket * channels)
+    mins = buckets.min(axis=1).astype(np.float64)
+    maxs = buckets.max(axis=1).astype(np.float64)
+
+    if frames.dtype == np.uint8:
+        mins -= 128
+        maxs -= 128
+
+    peaks = np.empty(num_peaks * 2, dtype=np.float64)
+    peaks[0::2] = mins / full_scale
+    peaks[1::2] = maxs / full_scale
+    blob = np.clip(np.round(peaks * 127), -127, 127).astype(np.int8).tobytes()
+
+    return {
+        'peaks': blob,
+        'num_peaks': num_peaks,
+        'sample_rate': sample_rate,
+        'duration': n_frames / sample_rate
+    }
+
+
+def _downmix(frames, sample_rate: int, full_scale: float) -> tuple:
+    """Average channels and decimate to roughly FINGERPRINT_SAMPLE_RATE"""
+    factor = max(1, sample_rate // FINGERPRINT_SAMPLE_RATE)
+    n_frames, channels = frames.shape
+    usable = (n_frames // factor) * factor
+
+    mono = np.empty(usable // factor, dtype=np.float32)
+    step = DOWNMIX_BLOCK_FRAMES - DOWNMIX_BLOCK_FRAMES % factor
+
+    # Work block by block so only one block of the memmap is resident
+    for start in range(0, usable, step):
+        block = np.asarray(frames[start:min(start + step, usable)], dtype=np.float32)
+        if frames.dtype == np.uint8:
+            block -= 128
+        out = start // factor
+        mono[out:out + len(block) // factor] = block.reshape(-1, factor * channels).mean(axis=1)
+
+    return mono / full_scale, sample_rate / factor
+
+
+def _max_filter(values, size: int, axis: int):
+    """Sliding-window maximum along one axis, same shape as the input"""
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (size // 2, size // 2)
+    padded = np.pad(values, pad, mode='constant', constant_values=-np.inf)
+    return np.lib.stride_tricks.sliding_window_view(padded, size, axis=axis).max(axis=-1)
+
+
+def fingerprint_from_frames(frames, sample_rate: int, full_scale: float) -> np.ndarray:
+    """
+    Build a set of spectral-peak pair hashes for a track
+
+    Peaks are local maxima of the log spectrogram; each peak is paired
+    with the next few peaks and hashed as (f1, f2, dt) packed in 24 bits.
+    The hashes don't encode absolute time, so matching is a set overlap.
+    Returns: sorted ndarray of unique uint32 hashes
+    """
+    mono, rate = _downmix(frames, sample_rate, full_scale)
+    if len(mono) < FFT_SIZE:
+        return np.empty(0, dtype=np.uint32)
+
+    windows = np.lib.stride_tricks.sliding_window_view(mono, FFT_SIZE)[::FFT_HOP]
+    spectrum = np.abs(np.fft.rfft(windows * np.hanning(FFT_SIZE).astype(np.float32), axis=1))
+    spectrum = np.log1p(spectrum * 1000)
+
+    # Separable 2-D maximum filter picks out the constellation
+    local_max = _max_filter(_max_filter(spectrum, PEAK_NEIGHBORHOOD, 0), PEAK_NEIGHBORHOOD, 1)
+    is_peak = (spectrum == local_max) & (spectrum > spectrum.mean())
+    times, freqs = np.nonzero(is_peak)
+
+    # Keep only the strongest peaks so hash sets stay compact
+    max_peaks = max(1, int(len(mono) / rate * PEAKS_PER_SECOND))
+    if len(times) > max_peaks:
+        strongest = np.argpartition(spectrum[times, freqs], -max_peaks)[-max_peaks:]
+        times, freqs = times[strongest], freqs[strongest]
+
+    order = np.lexsort((freqs, times))
+    times, freqs = times[order], freqs[order] >> 1
+
+    hashes = []
+    for offset in range(1, FAN_OUT + 1):
+        dt = times[offset:] - times[:-offset]
+        valid = (dt > 0) & (dt <= MAX_DT)
+        hashes.append(
+            (freqs[:-offset][valid].astype(np.uint32) << 15)
+            | (freqs[offset:][valid].astype(np.uint32) << 6)
+            | dt[valid].astype(np.uint32)
+        )
+
+    return np.unique(np.concatenate(hashes))
+
+
+def analyze_audio(audio_url: str, upload_folder: str, num_peaks: int, max_download_bytes: int) -> dict:
+    """
+    Decode a song once and compute everything the pipeline stores
+    Returns: peaks_from_frames() result plus 'fingerprint' (uint32 hashes as bytes)
+    """
+    path, is_temporary = resolve_audio_path(audio_url, upload_folder, max_download_bytes)
+    try:
+        frames, sample_rate, full_scale = load_pcm(path)
+        result = peaks_from_frames(frames, sample_rate, full_scale, num_peaks)
+        result['fingerprint'] = fingerprint_from_frames(frames, sample_rate, full_scale).tobytes()
+        del frames
+        return result
+    finally:
+        if is_temporary:
+            os.unlink(path)
@@ -0,0 +1,235 @@
+"""
+Audio Pipeline - background analysis of submitted songs
+
+Decoding runs in a process pool so request workers never pay for it.
+Results are written back from the parent process, which owns the
+database connections.
+"""
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, insert
+
+from models import db, Song, SongPeaks, SongFingerprint, FingerprintHash
+from .audio import analyze_audio, UnsupportedAudioError
+
+# Keeps IN (...) lists well under driver parameter limits
+HASH_LOOKUP_CHUNK = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _new_executor(max_workers: int) -> ProcessPoolExecutor:
+    # Spawn rather than fork: the parent holds DB connections and threads
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Get the per-process pool used for request-triggered jobs"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = _new_executor(current_app.config['AUDIO_PIPELINE_WORKERS'])
+
+    return _executor
+
+
+def store_peaks(song_id: int, result: dict = None) -> SongPeaks:
+    """Insert or replace the peaks row for a song (caller commits)"""
+    peaks = db.session.get(SongPeaks, song_id) or SongPeaks(song_id=song_id)
+
+    if result:
+        peaks.peaks = result['peaks']
+        peaks.num_peaks = result['num_peaks']
+        peaks.sample_rate = result['sample_rate']
+        peaks.duration = result['duration']
+        peaks.status = 'ready'
+    else:
+        peaks.peaks = None
+        peaks.num_peaks = 0
+        peaks.status = 'unavailable'
+
+    db.session.add(peaks)
+    return peaks
+
+
+def find_duplicate(song_id: int, hashes: list) -> tuple:
+    """
+    Find the indexed song sharing the most hashes with this one
+    Returns: (song_id, similarity) or (None, 0.0)
+    """
+    if not hashes:
+        return None, 0.0
+
+    shared = Counter()
+    for start in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+        chunk = hashes[start:start + HASH_LOOKUP_CHUNK]
+        rows = db.session.query(
+            FingerprintHash.song_id, func.count()
+        ).filter(
+            FingerprintHash.hash.in_(chunk),
+            FingerprintHash.song_id != song_id
+        ).group_by(FingerprintHash.song_id).all()
+
+        for other_id, count in rows:
+            shared[other_id] += count
+
+    if not shared:
+        return None, 0.0
+
+    other_id, count = shared.most_common(1)[0]
+    return other_id, count / len(hashes)
+
+
+def store_fingerprint(song_id: int, fingerprint: bytes = None) -> SongFingerprint:
+    """Replace a song's index entries and flag it if it duplicates another song (caller commits)"""
+    record = db.session.get(SongFingerprint, song_id) or SongFingerprint(song_id=song_id)
+    db.session.add(record)
+
+    FingerprintHash.query.filter_by(song_id=song_id).delete(synchronize_session=False)
+
+    if fingerprint is None:
+        record.hash_count = 0
+        record.status = 'unavailable'
+        return record
+
+    hashes = np.frombuffer(fingerprint, dtype=np.uint32).tolist()
+    record.hash_count = len(hashes)
+    record.status = 'ready'
+
+    if hashes:
+        db.session.execute(
+            insert(FingerprintHash),
+            [{'hash': h, 'song_id': song_id} for h in hashes]
+        )
+
+    match_id, similarity = find_duplicate(song_id, hashes)
+    record.duplicate_of_id = None
+    record.similarity = None
+
+    if match_id and similarity >= current_app.config['FINGERPRINT_MATCH_THRESHOLD']:
+        if match_id < song_id:
+            record.duplicate_of_id = match_id
+            record.similarity = similarity
+        else:
+            # The match was indexed first (e.g. during a backfill) but is the newer upload
+            other = db.session.get(SongFingerprint, match_id)
+            if other and other.duplicate_of_id is None:
+                other.duplicate_of_id = song_id
+                other.similarity = similarity
+
+    return record
+
+
+def store_analysis(song_id: int, result: dict = None) -> None:
+    """Persist every artifact of an analyze_audio() run (caller commits)"""
+    store_peaks(song_id, result)
+    store_fingerprint(song_id, result['fingerprint'] if result else None)
+
+
+def _on_analysis_done(app, song_id, future):
+    """Persist a finished analysis job; runs on the pool's callback thread"""
+    with app.app_context():
+        try:
+            result = future.result()
+        except UnsupportedAudioError as e:
+            app.logger.info(f"Cannot analyze audio for song {song_id}: {e}")
+            result = None
+        except Exception as e:
+            app.logger.error(f"Audio analysis failed for song {song_id}: {e}")
+            return
+
+        try:
+            store_analysis(song_id, result)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Failed to store audio analysis for song {song_id}: {e}")
+
+
+def schedule_song_analysis(song: Song) -> None:
+    """Queue background analysis of a song after it is submitted or approved"""
+    app = current_app._get_current_object()
+
+    if not app.config['AUDIO_PIPELINE_ENABLED']:
+        return
+
+    song_id = song.id
+    try:
+        future = get_executor().submit(
+            analyze_audio,
+            song.audio_url,
+            app.config['UPLOAD_FOLDER'],
+            app.config['WAVEFORM_PEAKS'],
+            app.config['MAX_CONTENT_LENGTH']
+        )
+    except RuntimeError as e:
+        # Pool is shutting down with the worker process
+        app.logger.warning(f"Could not schedule analysis for song {song_id}: {e}")
+        return
+
+    future.add_done_callback(lambda f: _on_analysis_done(app, song_id, f))
+
+
+def backfill_analysis(max_workers: int = None, batch_size: int = 100, force: bool = False) -> dict:
+    """
+    Analyze every song missing peaks or a fingerprint, using all cores
+    Returns: dict with ready, unavailable and failed counts
+    """
+    query = db.session.query(Song.id, Song.audio_url)
+    if not force:
+        query = query.outerjoin(
+            SongPeaks, SongPeaks.song_id == Song.id
+        ).outerjoin(
+            SongFingerprint, SongFingerprint.song_id == Song.id
+        ).filter(
+            db.or_(SongPeaks.song_id.is_(None), SongFingerprint.song_id.is_(None))
+        )
+
+    songs = query.order_by(Song.id).all()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    num_peaks = current_app.config['WAVEFORM_PEAKS']
+    max_bytes = current_app.config['MAX_CONTENT_LENGTH']
+    summary = {'ready': 0, 'unavailable': 0, 'failed': 0}
+
+    if not songs:
+        return summary
+
+    pending = 0
+    with _new_executor(max_workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(analyze_audio, audio_url, upload_folder, num_peaks, max_bytes): song_id
+            for song_id, audio_url in songs
+        }
+
+        for future in as_completed(futures):
+            song_id = futures[future]
+            try:
+                store_analysis(song_id, future.result())
+                summary['ready'] += 1
+            except UnsupportedAudioError:
+                store_analysis(song_id, None)
+                summary['unavailable'] += 1
+            except Exception as e:
+                current_app.logger.error(f"Audio analysis failed for song {song_id}: {e}")
+                summary['failed'] += 1
+                continue
+
+            pending += 1
+            if pending >= batch_size:
+                db.session.commit()
+                pending = 0
+
+    db.session.commit()
+    return summary
@@ -0,0 +1,127 @@
+"""
+Authentication Utilities
+
+Tokens carry the user's roles, artist_id and user_version as extra
+claims. The principal for a request is resolved once per request (g)
+and cached per process for PRINCIPAL_CACHE_TTL seconds, so most
+authorized calls never load the user row. A token whose user_version
+differs from the cached principal forces a reload, and role changes
+bump the version so fresh tokens are never served stale roles.
+
+A cached artist_id of None can be stale for up to PRINCIPAL_CACHE_TTL
+in other workers after a profile is created (the old token keeps its
+user_version), so get_principal_artist() looks the profile up by user_id instead
+of trusting it.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, g
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt, get_jwt_identity
+
+from models import db, User, Artist
+
+Principal = namedtuple('Principal', ['id', 'roles', 'artist_id', 'created_at', 'version'])
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def token_claims(user: User) -> dict:
+    """Additional JWT claims describing the user's authorization state"""
+    return {
+        'roles': user.roles or ['user'],
+        'artist_id': user.artist.id if user.artist else None,
+        'uv': user.user_version
+    }
+
+
+def issue_tokens(user: User) -> tuple:
+    """Create an access and refresh token pair for a user"""
+    claims = token_claims(user)
+    return (
+        create_access_token(identity=str(user.id), additional_claims=claims),
+        create_refresh_token(identity=str(user.id), additional_claims=claims)
+    )
+
+
+def issue_access_token(user: User) -> str:
+    """Create an access token for a user"""
+    return create_access_token(identity=str(user.id), additional_claims=token_claims(user))
+
+
+def has_role(principal: Principal, role: str) -> bool:
+    """Check if a principal has a specific role"""
+    return principal is not None and role in (principal.roles or [])
+
+
+def _load_principal(user_id: int):
+    user = db.session.get(User, user_id)
+    if not user:
+        return None
+
+    return Principal(
+        id=user.id,
+        roles=tuple(user.roles or ['user']),
+        artist_id=user.artist.id if user.artist else None,
+        created_at=user.created_at,
+        version=user.user_version
+    )
+
+
+def get_principal():
+    """
+    Resolve the authenticated user for this request
+    Must be called inside a @jwt_required() view.
+    Returns: Principal or None if the user no longer exists
+    """
+    if 'principal' in g:
+        return g.principal
+
+    user_id = int(get_jwt_identity())
+    token_version = get_jwt().get('uv')
+    now = time.monotonic()
+
+    with _cache_lock:
+        entry = _cache.get(user_id)
+
+    principal = None
+    if entry and entry[0] > now and token_version in (None, entry[1].version):
+        principal = entry[1]
+    else:
+        principal = _load_principal(user_id)
+        if principal:
+            ttl = current_app.config['PRINCIPAL_CACHE_TTL']
+            with _cache_lock:
+                _cache[user_id] = (now + ttl, principal)
+                _cache.move_to_end(user_id)
+                while len(_cache) > current_app.config['PRINCIPAL_CACHE_SIZE']:
+                    _cache.popitem(last=False)
+
+    g.principal = principal
+    return principal
+
+
+def get_principal_artist(principal):
+    """
+    The principal's artist profile, read from the database
+    Returns: Artist or None
+    """
+    if principal is None:
+        return None
+    if principal.artist_id:
+        return db.session.get(Artist, principal.artist_id)
+
+    artist = Artist.query.filter_by(user_id=principal.id).first()
+    if artist:
+        # Created since this principal was cached
+        invalidate_principal(principal.id)
+    return artist
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop a cached principal after its roles or artist profile change"""
+    with _cache_lock:
+        _cache.pop(int(user_id), None)
+    g.pop('principal', None)
@@ -0,0 +1,173 @@
+"""
+Bulk Email Campaigns
+
+Recipients are read from users in ascending id one keyset page at a
+time, so memory stays flat however large the audience. (A single
+streaming cursor would sit idle for hours while throttled sends drain,
+which MySQL's net_write_timeout does not allow.) The template is parsed
+once and only $username is substituted per recipient. A small pool of
+sender threads each keeps one SMTP connection open, and a shared token
+bucket caps the overall send rate.
+
+After every chunk of recipients the campaign's last_user_id checkpoint
+is committed; an interrupted campaign resumes after it, so at most one
+chunk is sent twice.
+"""
+import queue
+import smtplib
+import threading
+from datetime import datetime
+from html import escape
+from string import Template
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import select
+
+from models import db, User, Artist, EmailCampaign
+from .email import mail
+from .mail_outbox import REJECTIONS
+from .throttle import RateLimiter
+
+AUDIENCES = ('all', 'artists')
+
+
+def recipients_page(campaign: EmailCampaign, size: int) -> list:
+    """Next (id, email, username) rows after the campaign's checkpoint, in id order"""
+    stmt = select(User.id, User.email, User.username).where(User.id > campaign.last_user_id)
+    if campaign.audience == 'artists':
+        stmt = stmt.join(Artist, Artist.user_id == User.id)
+    return db.session.execute(stmt.order_by(User.id).limit(size)).all()
+
+
+class _Sender(threading.Thread):
+    """Sends queued messages over one persistent SMTP connection"""
+
+    def __init__(self, app, jobs: queue.Queue, limiter: RateLimiter, results: dict, lock: threading.Lock):
+        super().__init__(daemon=True)
+        self.app = app
+        self.jobs = jobs
+        self.limiter = limiter
+        self.results = results
+        self.lock = lock
+        self.connection = None
+
+    def _count(self, key):
+        with self.lock:
+            self.results[key] += 1
+
+    def _send(self, message) -> None:
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self.connection = mail.connect().__enter__()
+                self.connection.send(message)
+                self._count('sent')
+                return
+            except REJECTIONS as e:
+                # The server refused this message; the connection is fine
+                error = e
+                break
+            except smtplib.SMTPServerDisconnected as e:
+                # Close the dead connection and retry once on a new one
+                self._close()
+                error = e
+            except smtplib.SMTPException as e:
+                # Any other SMTP error leaves the session in an unknown state
+                self._close()
+                error = e
+                break
+            except OSError as e:
+                self._close()
+                error = e
+            except Exception as e:
+                error = e
+                break
+
+        self.app.logger.warning(f"Campaign send to {message.recipients[0]} failed: {error}")
+        self._count('failed')
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def run(self):
+        with self.app.app_context():
+            while True:
+                message = self.jobs.get()
+                try:
+                    if message is None:
+                        self._close()
+                        return
+
+                    self.limiter.acquire()
+                    self._send(message)
+                finally:
+                    self.jobs.task_done()
+
+
+def send_campaign(campaign: EmailCampaign, connections: int = 2, rate: float = 0,
+                  chunk_size: int = 500, progress=None) -> dict:
+    """
+    Send a campaign to every remaining recipient
+    rate is messages per second across all connections (0 = unthrottled).
+    progress, if given, is called with the campaign after each checkpoint.
+    Returns: dict with sent and failed counts for this run
+    """
+    app = current_app._get_current_object()
+    sender = app.config['MAIL_DEFAULT_SENDER']
+    template = Template(campaign.template)
+
+    results = {'sent': 0, 'failed': 0}
+    lock = threading.Lock()
+    limiter = RateLimiter(rate, burst=max(1, int(rate)))
+
+    # Bounded so the reader never runs far ahead of the senders
+    jobs = queue.Queue(maxsize=connections * 50)
+    senders = [_Sender(app, jobs, limiter, results, lock) for _ in range(connections)]
+    for thread in senders:
+        thread.start()
+
+    campaign.status = 'sending'
+    campaign.started_at = campaign.started_at or datetime.utcnow()
+    db.session.commit()
+
+    try:
+        while True:
+            chunk = recipients_page(campaign, chunk_size)
+            if not chunk:
+                break
+
+            before = dict(results)
+            for user_id, email, username in chunk:
+                jobs.put(Message(
+                    subject=campaign.subject,
+                    sender=sender,
+                    recipients=[email],
+                    html=template.safe_substitute(username=escape(username))
+                ))
+
+            # Checkpoint only once the whole chunk has been handed to SMTP
+            jobs.join()
+            campaign.last_user_id = chunk[-1][0]
+            campaign.sent_count += results['sent'] - before['sent']
+            campaign.failed_count += results['failed'] - before['failed']
+            db.session.commit()
+
+            if progress:
+                progress(campaign)
+    finally:
+        for _ in senders:
+            jobs.put(None)
+        for thread in senders:
+            thread.join()
+
+    campaign.status = 'completed'
+    campaign.completed_at = datetime.utcnow()
+    db.session.commit()
+
+    return results
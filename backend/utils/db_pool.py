@@ -0,0 +1,301 @@
+"""
+Database Connection Pool
+
+Pool settings come from a per-deployment profile (DB_POOL_PROFILE, see
+Config.DB_POOL_PROFILES) with single values overridable through
+DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and
+DB_POOL_PRE_PING. In-memory SQLite keeps Flask-SQLAlchemy's StaticPool.
+
+Every engine gets pool event listeners that record, per process:
+checkout time (waiting for a free connection plus opening or pinging
+it), how long connections are held, checked-out and overflow counts
+and their peaks, how often a checkout took the last free connection,
+timeouts, and connection age. Long checkouts with short holds mean the
+pool is too small; long holds mean slow queries or long transactions,
+which a bigger pool will not fix.
+
+recommend_pool() turns the observed concurrency into pool_size and
+max_overflow, capped by the database's connection limit shared across
+DB_POOL_PROCESSES. With DB_POOL_AUTOTUNE the recommendation is logged
+every DB_POOL_AUTOTUNE_SECONDS when it differs from the current
+settings; nothing is resized at runtime.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+# Samples kept for percentiles
+SAMPLE_SIZE = 1000
+
+# Holding a connection longer than this (p95) points at the database, not the pool
+SLOW_HOLD_SECONDS = 0.25
+
+# Extra room over the observed peak when sizing max_overflow
+OVERFLOW_HEADROOM = 0.25
+
+OVERRIDES = {
+    'DB_POOL_SIZE': 'pool_size',
+    'DB_POOL_MAX_OVERFLOW': 'max_overflow',
+    'DB_POOL_TIMEOUT': 'pool_timeout',
+    'DB_POOL_RECYCLE': 'pool_recycle',
+    'DB_POOL_PRE_PING': 'pool_pre_ping'
+}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that times each checkout and counts checkout timeouts"""
+
+    metrics = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            if self.metrics:
+                self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        if self.metrics:
+            self.metrics.record_checkout_time(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # dispose() replaces the pool; keep recording into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(config) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured pool profile"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+
+    profile = config['DB_POOL_PROFILE']
+    if profile not in config['DB_POOL_PROFILES']:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {profile!r}, expected one of {sorted(config['DB_POOL_PROFILES'])}")
+
+    options = dict(config['DB_POOL_PROFILES'][profile])
+    for key, option in OVERRIDES.items():
+        if config.get(key) is not None:
+            options[option] = config[key]
+    options['poolclass'] = TimedQueuePool
+    return options
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary(samples) -> dict:
+    """avg/p95/max of a sample of seconds, in milliseconds"""
+    if not samples:
+        return {'avg': 0.0, 'p95': 0.0, 'max': 0.0}
+    return {
+        'avg': round(sum(samples) / len(samples) * 1000, 2),
+        'p95': round(_percentile(samples, 0.95) * 1000, 2),
+        'max': round(max(samples) * 1000, 2)
+    }
+
+
+class PoolMetrics:
+    """Pool counters for one engine in this process, fed by pool events"""
+
+    def __init__(self, name: str, engine, app):
+        self.name = name
+        self.engine = engine
+        self.logger = app.logger
+        self.processes = app.config['DB_POOL_PROCESSES']
+        self.max_connections = app.config['DB_MAX_CONNECTIONS']
+        self.autotune_seconds = app.config['DB_POOL_AUTOTUNE_SECONDS'] if app.config['DB_POOL_AUTOTUNE'] else 0
+        self.next_autotune = time.monotonic() + self.autotune_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        if isinstance(engine.pool, TimedQueuePool):
+            engine.pool.metrics = self
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.at_capacity = 0
+            self.timeouts = 0
+            self.connections_opened = 0
+            self.invalidated = 0
+            self.peak_checked_out = 0
+            self.peak_overflow = 0
+            self.checkout_times = deque(maxlen=SAMPLE_SIZE)
+            self.hold_times = deque(maxlen=SAMPLE_SIZE)
+            self.concurrency = deque(maxlen=SAMPLE_SIZE)
+            self.ages = deque(maxlen=SAMPLE_SIZE)
+
+    @property
+    def capacity(self):
+        """pool_size + max_overflow, or None for pools without a limit"""
+        pool = self.engine.pool
+        if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+            return None
+        return pool.size() + pool._max_overflow
+
+    def _counts(self):
+        pool = self.engine.pool
+        if not isinstance(pool, QueuePool):
+            return 0, 0
+        return pool.checkedout(), max(pool.overflow(), 0)
+
+    def record_checkout_time(self, seconds: float) -> None:
+        self.checkout_times.append(seconds)
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.checkout_times.append(seconds)
+        self.logger.warning(f"Database pool {self.name} timed out after {seconds:.1f}s: {self.snapshot()}")
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        connection_record.info['opened_at'] = time.monotonic()
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        now = time.monotonic()
+        connection_record.info['checked_out_at'] = now
+        checked_out, overflow = self._counts()
+        capacity = self.capacity
+
+        with self._lock:
+            self.checkouts += 1
+            self.concurrency.append(checked_out)
+            self.ages.append(now - connection_record.info.get('opened_at', now))
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+            if capacity is not None and checked_out >= capacity:
+                self.at_capacity += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        if checked_out_at is not None:
+            self.hold_times.append(time.monotonic() - checked_out_at)
+
+        if self.autotune_seconds and time.monotonic() >= self.next_autotune:
+            self.next_autotune = time.monotonic() + self.autotune_seconds
+            self._autotune()
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidated += 1
+
+    def _autotune(self) -> None:
+        advice = recommend_pool(self)
+        pool = self.engine.pool
+        if not isinstance(pool, QueuePool) or advice['pool_size'] is None:
+            return
+        if (advice['pool_size'], advice['max_overflow']) != (pool.size(), pool._max_overflow):
+            self.logger.warning(
+                f"Database pool {self.name}: pool_size={pool.size()} max_overflow={pool._max_overflow}, "
+                f"recommended pool_size={advice['pool_size']} max_overflow={advice['max_overflow']} "
+                f"({'; '.join(advice['diagnosis'])})"
+            )
+
+    def snapshot(self) -> dict:
+        checked_out, overflow = self._counts()
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                'pool': type(pool).__name__,
+                'pool_size': pool.size() if isinstance(pool, QueuePool) else None,
+                'max_overflow': pool._max_overflow if isinstance(pool, QueuePool) else None,
+                'checked_out': checked_out,
+                'overflow': overflow,
+                'peak_checked_out': self.peak_checked_out,
+                'peak_overflow': self.peak_overflow,
+                'checkouts': self.checkouts,
+                'at_capacity': self.at_capacity,
+                'timeouts': self.timeouts,
+                'connections_opened': self.connections_opened,
+                'invalidated': self.invalidated,
+                'checkout_ms': _summary(list(self.checkout_times)),
+                'held_ms': _summary(list(self.hold_times)),
+                'connection_age_s': {
+                    'avg': round(sum(self.ages) / len(self.ages), 1) if self.ages else 0.0,
+                    'max': round(max(self.ages), 1) if self.ages else 0.0
+                }
+            }
+
+
+def recommend_pool(metrics: PoolMetrics) -> dict:
+    """
+    pool_size and max_overflow for the concurrency seen by this process
+    pool_size covers the 95th percentile of connections in use, max_overflow
+    the peak plus headroom; both are capped so that DB_POOL_PROCESSES
+    processes stay within DB_MAX_CONNECTIONS (when set).
+    Returns: dict with pool_size, max_overflow (None before any checkout) and diagnosis notes
+    """
+    with metrics._lock:
+        concurrency = list(metrics.concurrency)
+        holds = list(metrics.hold_times)
+        at_capacity, timeouts, checkouts = metrics.at_capacity, metrics.timeouts, metrics.checkouts
+        peak = metrics.peak_checked_out
+
+    if not concurrency:
+        return {'pool_size': None, 'max_overflow': None, 'diagnosis': ['no checkouts observed yet']}
+
+    pool_size = max(1, math.ceil(_percentile(concurrency, 0.95)))
+    max_overflow = max(0, math.ceil(peak * (1 + OVERFLOW_HEADROOM)) - pool_size)
+    diagnosis = []
+
+    slow_holds = _percentile(holds, 0.95) >= SLOW_HOLD_SECONDS
+    if slow_holds:
+        diagnosis.append(f"p95 hold time is over {SLOW_HOLD_SECONDS * 1000:.0f}ms: "
+                         "slow queries or long transactions, a bigger pool will not help")
+    if timeouts or at_capacity:
+        if slow_holds:
+            diagnosis.append(f"{at_capacity} of {checkouts} checkouts took the last free connection")
+        else:
+            diagnosis.append(f"pool too small: {at_capacity} of {checkouts} checkouts took the last free "
+                             f"connection, {timeouts} timed out")
+
+    if metrics.max_connections:
+        per_process = max(1, metrics.max_connections // max(metrics.processes, 1))
+        if pool_size + max_overflow > per_process:
+            pool_size = min(pool_size, per_process)
+            max_overflow = per_process - pool_size
+            diagnosis.append(f"capped at {per_process} connections per process "
+                             f"(DB_MAX_CONNECTIONS={metrics.max_connections} / {metrics.processes} processes)")
+
+    if not diagnosis:
+        diagnosis.append('pool is not a bottleneck')
+
+    return {'pool_size': pool_size, 'max_overflow': max_overflow, 'diagnosis': diagnosis}
+
+
+def init_pool_metrics(app) -> None:
+    """Attach PoolMetrics to every engine of the app (call after db.init_app)"""
+    with app.app_context():
+        app.extensions['pool_metrics'] = {
+            name or 'primary': PoolMetrics(name or 'primary', engine, app) for name, engine in db.engines.items()
+        }
+
+
+def pool_report(app) -> dict:
+    """Metrics and recommendation for each engine in this process"""
+    return {
+        name: {**metrics.snapshot(), 'recommendation': recommend_pool(metrics)}
+        for name, metrics in app.extensions.get('pool_metrics', {}).items()
+    }
@@ -1,115 +1,194 @@
 """
 Email Utilities
+
+The send_* helpers only queue messages in the email outbox, so requests
+never wait on SMTP. `flask mail send-outbox` delivers them.
 """
+from html import escape
+
 from flask import current_app
 from flask_mail import Message, Mail
 
+from models import db, EmailOutbox
+
 mail = Mail()
 
 
+def queue_email(to_email: str, subject: str, html: str, category: str = None) -> EmailOutbox:
+    """Add a message to the outbox (caller commits)"""
+    message = EmailOutbox(to_email=to_email, subject=subject, html=html, category=category)
+    db.session.add(message)
+    return message
+
+
+def build_message(outbox: EmailOutbox) -> Message:
+    """Turn an outbox row into a Flask-Mail message"""
+    return Message(
+        subject=outbox.subject,
+        sender=current_app.config['MAIL_DEFAULT_SENDER'],
+        recipients=[outbox.to_email],
+        html=outbox.html
+    )
+
+
+def _duration_text(seconds: int) -> str:
+    """'1 hour', '30 minutes', '2 days'..."""
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size and seconds % size == 0:
+            count = seconds // size
+            return f"{count} {unit}{'s' if count != 1 else ''}"
+    return f"{seconds} seconds"
+
+
 def send_password_reset_email(to_email: str, username: str, reset_url: str) -> bool:
-    """Send password reset email"""
-    try:
-        msg = Message(
-            subject="Reset Your SoundWars Password",
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients=[to_email]
-        )
-        
-        msg.html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #00c9a7, #00b4d8); padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                .header h1 {{ color: #fff; margin: 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-                .button {{ display: inline-block; background: #00c9a7; color: #fff; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-                .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🎵 SoundWars</h1>
-                </div>
-                <div class="content">
-                    <h2>Password Reset Request</h2>
-                    <p>Hi {username},</p>
-                    <p>We received a request to reset your password. Click the button below to create a new password:</p>
-                    <p style="text-align: center;">
-                        <a href="{reset_url}" class="button">Reset Password</a>
-                    </p>
-                    <p>This link will expire in 1 hour.</p>
-                    <p>If you didn't request this, you can safely ignore this email.</p>
-                    <p>Best,<br>The SoundWars Team</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 SoundWars. All rights reserved.</p>
-                </div>
+    """Queue password reset email (caller commits)"""
+    expires_in = _duration_text(current_app.config['PASSWORD_RESET_TOKEN_TTL'])
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #00c9a7, #00b4d8); padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .header h1 {{ color: #fff; margin: 0; }}
+            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .button {{ display: inline-block; background: #00c9a7; color: #fff; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🎵 SoundWars</h1>
             </div>
-        </body>
-        </html>
-        """
-        
-        mail.send(msg)
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Failed to send email: {e}")
-        return False
+            <div class="content">
+                <h2>Password Reset Request</h2>
+                <p>Hi {username},</p>
+                <p>We received a request to reset your password. Click the button below to create a new password:</p>
+                <p style="text-align: center;">
+                    <a href="{reset_url}" class="button">Reset Password</a>
+                </p>
+                <p>This link will expire in {expires_in}.</p>
+                <p>If you didn't request this, you can safely ignore this email.</p>
+                <p>Best,<br>The SoundWars Team</p>
+            </div>
+            <div class="footer">
+                <p>© 2024 SoundWars. All rights reserved.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    queue_email(to_email, "Reset Your SoundWars Password", html, category='password_reset')
+    return True
 
 
 def send_welcome_email(to_email: str, username: str) -> bool:
-    """Send welcome email to new users"""
-    try:
-        msg = Message(
-            subject="Welcome to SoundWars! 🎵",
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
-            recipients=[to_email]
-        )
-        
-        msg.html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #00c9a7, #00b4d8); padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                .header h1 {{ color: #fff; margin: 0; }}
-                .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-                .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🎵 SoundWars</h1>
-                </div>
-                <div class="content">
-                    <h2>Welcome to SoundWars!</h2>
-                    <p>Hi {username},</p>
-                    <p>Thank you for joining SoundWars - the ultimate music competition platform!</p>
-                    <p>You can now:</p>
-                    <ul>
-                        <li>Vote for your favorite songs</li>
-                        <li>Discover amazing new artists</li>
-                        <li>Support the music community</li>
-                    </ul>
-                    <p>Best,<br>The SoundWars Team</p>
-                </div>
-                <div class="footer">
-                    <p>© 2024 SoundWars. All rights reserved.</p>
-                </div>
+    """Queue welcome email for new users (caller commits)"""
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #00c9a7, #00b4d8); padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .header h1 {{ color: #fff; margin: 0; }}
+            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🎵 SoundWars</h1>
+            </div>
+            <div class="content">
+                <h2>Welcome to SoundWars!</h2>
+                <p>Hi {username},</p>
+                <p>Thank you for joining SoundWars - the ultimate music competition platform!</p>
+                <p>You can now:</p>
+                <ul>
+                    <li>Vote for your favorite songs</li>
+                    <li>Discover amazing new artists</li>
+                    <li>Support the music community</li>
+                </ul>
+                <p>Best,<br>The SoundWars Team</p>
+            </div>
+            <div class="footer">
+                <p>© 2024 SoundWars. All rights reserved.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    queue_email(to_email, "Welcome to SoundWars! 🎵", html, category='welcome')
+    return True
+
+
+def contest_announcement(contest, kind: str) -> tuple:
+    """
+    Build a campaign subject and template announcing a contest phase
+    kind is 'contest_open' or 'voting_started'. The template is rendered
+    here once; only $username is left for per-recipient substitution.
+    Returns: (subject, template)
+    """
+    # Contest text is literal in the template: escape HTML and $ placeholders
+    title = escape(contest.title).replace('$', '$$')
+    frontend_url = current_app.config['FRONTEND_URL']
+    
+    if kind == 'voting_started':
+        subject = f"Voting is open: {contest.title} 🗳️"
+        heading = "Voting Has Started!"
+        body = f"""<p>The submissions for <strong>{title}</strong> are in, and it's time to pick a winner.</p>
+                <p>Voting closes on {contest.voting_end_date.strftime('%B %d, %Y')}. You get one vote, so make it count!</p>"""
+        button = "Vote Now"
+        link = f"{frontend_url}/leaderboard"
+    else:
+        subject = f"New contest: {contest.title} 🎵"
+        heading = "A New Contest Is Open!"
+        body = f"""<p><strong>{title}</strong> is now accepting submissions.</p>
+                <p>Submissions close on {contest.submission_end_date.strftime('%B %d, %Y')}.</p>"""
+        button = "Enter the Contest"
+        link = f"{frontend_url}/submit"
+    
+    template = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #00c9a7, #00b4d8); padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .header h1 {{ color: #fff; margin: 0; }}
+            .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .button {{ display: inline-block; background: #00c9a7; color: #fff; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
+            .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🎵 SoundWars</h1>
+            </div>
+            <div class="content">
+                <h2>{heading}</h2>
+                <p>Hi $username,</p>
+                {body}
+                <p style="text-align: center;">
+                    <a href="{link}" class="button">{button}</a>
+                </p>
+                <p>Best,<br>The SoundWars Team</p>
+            </div>
+            <div class="footer">
+                <p>© 2024 SoundWars. All rights reserved.</p>
             </div>
-        </body>
-        </html>
-        """
-        
-        mail.send(msg)
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Failed to send welcome email: {e}")
-        return False
+        </div>
+    </body>
+    </html>
+    """
+    
+    return subject, template
@@ -0,0 +1,88 @@
+"""
+Streaming Export Utilities
+
+Rows are fetched through a server-side cursor in fixed-size partitions and
+serialized one partition at a time, so memory use does not grow with the
+size of the table.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from models import db
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def _serialize(columns: list, partitions, fmt: str):
+    """Yield one text chunk per partition of rows"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        for rows in partitions:
+            for row in rows:
+                writer.writerow([_csv_value(value) for value in row])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for rows in partitions:
+            yield ''.join(
+                json.dumps(dict(zip(columns, row)), default=_json_default) + '\n'
+                for row in rows
+            )
+
+
+def stream_export(stmt, fmt: str = 'ndjson', compress: bool = False, batch_size: int = 1000):
+    """
+    Generate an export of a Core select() as encoded chunks
+    Column labels of the statement become NDJSON keys / the CSV header.
+    """
+    columns = [column.key for column in stmt.selected_columns]
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+
+    try:
+        chunks = (chunk.encode('utf-8') for chunk in _serialize(columns, result.partitions(), fmt))
+
+        if not compress:
+            yield from chunks
+            return
+
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        result.close()
@@ -0,0 +1,208 @@
+"""
+Flutterwave API Client
+
+One client per process keeps a pooled keep-alive requests.Session with
+short connect/read timeouts. A circuit breaker stops calling the API
+after repeated failures, so a Flutterwave outage fails requests fast
+instead of tying up workers. Verification results are cached by
+transaction id, and concurrent verifies of the same transaction share a
+single upstream call.
+"""
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import current_app
+
+# Results that are not final (pending, failed, errors) are only reused briefly
+NON_FINAL_CACHE_TTL = 5
+
+
+class FlutterwaveError(Exception):
+    """The API could not be reached or answered with a server error"""
+
+
+class CircuitOpen(FlutterwaveError):
+    """Calls are suspended after repeated failures"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Flutterwave is unavailable')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one probe through after `reset_seconds`"""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_seconds or self.probing:
+                raise CircuitOpen(max(1, int(self.reset_seconds - waited)))
+
+            # Half-open: this caller is the probe
+            self.probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FlutterwaveClient:
+    """Per-process Flutterwave client shared by all request threads"""
+
+    def __init__(self, config):
+        self.base_url = config['FLUTTERWAVE_BASE_URL'].rstrip('/')
+        self.timeout = (config['FLUTTERWAVE_CONNECT_TIMEOUT'], config['FLUTTERWAVE_READ_TIMEOUT'])
+        self.cache_ttl = config['FLUTTERWAVE_VERIFY_CACHE_TTL']
+        self.cache_size = config['FLUTTERWAVE_VERIFY_CACHE_SIZE']
+        self.breaker = CircuitBreaker(
+            config['FLUTTERWAVE_BREAKER_THRESHOLD'],
+            config['FLUTTERWAVE_BREAKER_RESET_SECONDS']
+        )
+
+        # Imported on first use so workers boot without requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['FLUTTERWAVE_POOL_SIZE'], max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f"Bearer {config['FLUTTERWAVE_SECRET_KEY']}",
+            'Content-Type': 'application/json'
+        })
+
+        self._cache = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str, **kwargs) -> dict:
+        """
+        Call the API through the circuit breaker
+        Raises: CircuitOpen, FlutterwaveError on network errors and 5xx responses
+        Returns: the decoded JSON body (4xx bodies included)
+        """
+        import requests
+
+        self.breaker.before_call()
+
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            raise FlutterwaveError(str(e)) from e
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise FlutterwaveError(f"Flutterwave returned {response.status_code}")
+
+        self.breaker.record_success()
+        try:
+            return response.json()
+        except ValueError as e:
+            raise FlutterwaveError('Flutterwave returned invalid JSON') from e
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                return entry[1]
+        return None
+
+    def _store(self, key, result: dict) -> None:
+        data = result.get('data')
+        final = result.get('status') == 'success' and isinstance(data, dict) and data.get('status') == 'successful'
+        ttl = self.cache_ttl if final else NON_FINAL_CACHE_TTL
+
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _single_flight(self, key, fetch) -> dict:
+        """Return a cached result, or fetch it once however many threads ask at the same time"""
+        result = self._cached(key)
+        if result is not None:
+            return result
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait(self.timeout[0] + self.timeout[1])
+            if not flight.done.is_set():
+                raise FlutterwaveError('Timed out waiting for a concurrent verification')
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            self._store(key, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def verify_transaction(self, transaction_id) -> dict:
+        """Verify a transaction by its Flutterwave id"""
+        transaction_id = str(transaction_id)
+        return self._single_flight(
+            ('id', transaction_id),
+            lambda: self.request('GET', f"/transactions/{quote(transaction_id, safe='')}/verify")
+        )
+
+    def verify_by_reference(self, tx_ref: str) -> dict:
+        """Verify a transaction by our tx_ref (for payments that never reached /verify)"""
+        return self._single_flight(
+            ('ref', tx_ref),
+            lambda: self.request('GET', '/transactions/verify_by_reference', params={'tx_ref': tx_ref})
+        )
+
+
+def get_client() -> FlutterwaveClient:
+    """Get the current app's client, creating it on first use"""
+    client = current_app.extensions.get('flutterwave')
+    if client is None:
+        client = current_app.extensions.setdefault('flutterwave', FlutterwaveClient(current_app.config))
+    return client
@@ -0,0 +1,259 @@
+"""
+Vote Fraud Detection
+
+Keeps sliding-window statistics per song in bounded memory and judges
+every vote as it is cast. Each window is a ring of one-minute buckets;
+a bucket holds the vote count, an account-age histogram, a count-min
+sketch of voter subnets and a HyperLogLog of voter IPs. Updating and
+evaluating touch a fixed number of buckets and cells, so the cost per
+vote does not depend on traffic.
+
+State lives in the worker process: each worker sees the share of votes
+routed to it, which is enough to catch bursts.
+"""
+import calendar
+import hashlib
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event
+
+from models import db, VoteFlag
+
+# Account-age histogram bin edges in hours (last bin is open-ended)
+AGE_BINS_HOURS = (1, 6, 24, 72, 168, 720)
+
+CMS_DEPTH = 4
+CMS_WIDTH = 64
+HLL_PRECISION = 8
+HLL_REGISTERS = 1 << HLL_PRECISION
+HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+
+
+def subnet_of(ip: str) -> str:
+    """Collapse an address to its /24 (IPv4) or /48 (IPv6) network"""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return 'unknown'
+
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+def _cms_cells(key: str) -> np.ndarray:
+    """Column index of key in each count-min sketch row"""
+    digest = hashlib.blake2b(key.encode(), digest_size=4 * CMS_DEPTH).digest()
+    return np.frombuffer(digest, dtype='<u4') % CMS_WIDTH
+
+
+def _hll_position(key: str) -> tuple:
+    """HyperLogLog register index and rank for key"""
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+    register = value & (HLL_REGISTERS - 1)
+    rest = value >> HLL_PRECISION
+    rank = (64 - HLL_PRECISION) - rest.bit_length() + 1
+    return register, rank
+
+
+def _hll_estimate(registers: np.ndarray) -> float:
+    estimate = HLL_ALPHA * HLL_REGISTERS ** 2 / np.sum(np.power(2.0, -registers))
+    zeros = int(np.count_nonzero(registers == 0))
+
+    # Small-range correction (linear counting)
+    if estimate <= 2.5 * HLL_REGISTERS and zeros:
+        estimate = HLL_REGISTERS * np.log(HLL_REGISTERS / zeros)
+
+    return float(estimate)
+
+
+class SongWindow:
+    """Ring of one-minute buckets for one song"""
+
+    __slots__ = ('minutes', 'counts', 'ages', 'cms', 'hll', 'flag_id', 'flagged_at')
+
+    def __init__(self, size: int):
+        self.minutes = np.full(size, -1, dtype=np.int64)
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.ages = np.zeros((size, len(AGE_BINS_HOURS) + 1), dtype=np.int64)
+        self.cms = np.zeros((size, CMS_DEPTH, CMS_WIDTH), dtype=np.int32)
+        self.hll = np.zeros((size, HLL_REGISTERS), dtype=np.int8)
+        self.flag_id = None
+        self.flagged_at = 0.0
+
+    def _bucket(self, minute: int) -> int:
+        slot = minute % len(self.minutes)
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            self.counts[slot] = 0
+            self.ages[slot] = 0
+            self.cms[slot] = 0
+            self.hll[slot] = 0
+        return slot
+
+    def add(self, minute: int, age_hours: float, ip: str, subnet_cells: np.ndarray) -> None:
+        slot = self._bucket(minute)
+        self.counts[slot] += 1
+        self.ages[slot, np.searchsorted(AGE_BINS_HOURS, age_hours, side='right')] += 1
+        self.cms[slot, np.arange(CMS_DEPTH), subnet_cells] += 1
+
+        register, rank = _hll_position(ip)
+        if rank > self.hll[slot, register]:
+            self.hll[slot, register] = rank
+
+    def live(self, minute: int) -> np.ndarray:
+        """Mask of buckets that fall inside the window ending at minute"""
+        return self.minutes > minute - len(self.minutes)
+
+
+class VoteFraudDetector:
+    """Per-process detector shared by all request threads"""
+
+    def __init__(self, config):
+        self.window_minutes = config['FRAUD_WINDOW_MINUTES']
+        self.min_votes_per_minute = config['FRAUD_MIN_VOTES_PER_MINUTE']
+        self.young_account_hours = config['FRAUD_YOUNG_ACCOUNT_HOURS']
+        self.subnet_share = config['FRAUD_SUBNET_SHARE']
+        self.distinct_ip_ratio = config['FRAUD_DISTINCT_IP_RATIO']
+        self.max_songs = config['FRAUD_MAX_TRACKED_SONGS']
+        self._songs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _window(self, song_id: int) -> SongWindow:
+        window = self._songs.get(song_id)
+        if window is None:
+            window = self._songs[song_id] = SongWindow(self.window_minutes)
+            if len(self._songs) > self.max_songs:
+                self._songs.popitem(last=False)
+        else:
+            self._songs.move_to_end(song_id)
+        return window
+
+    def observe(self, song_id: int, account_created_at, ip: str, now: float = None) -> dict:
+        """
+        Record a vote and judge the song's current window
+        Returns: dict with suspicious (bool), reasons (list) and stats (dict)
+        """
+        now = now or time.time()
+        minute = int(now // 60)
+        # created_at columns hold naive UTC datetimes
+        created = calendar.timegm(account_created_at.timetuple()) if account_created_at else now
+        age_hours = max(0.0, (now - created) / 3600)
+        ip = ip or 'unknown'
+        subnet_cells = _cms_cells(subnet_of(ip))
+
+        with self._lock:
+            window = self._window(song_id)
+            window.add(minute, age_hours, ip, subnet_cells)
+
+            live = window.live(minute)
+            votes = int(window.counts[live].sum())
+            rate = votes / self.window_minutes
+            stats = {'votes_in_window': votes, 'votes_per_minute': round(rate, 2)}
+
+            # Everything else only matters during a burst
+            if rate < self.min_votes_per_minute:
+                return {'suspicious': False, 'reasons': [], 'stats': stats}
+
+            ages = window.ages[live].sum(axis=0)
+            median_bin = int(np.searchsorted(np.cumsum(ages), votes / 2))
+            subnet_votes = int(window.cms[live][:, np.arange(CMS_DEPTH), subnet_cells].sum(axis=0).min())
+            distinct_ips = _hll_estimate(window.hll[live].max(axis=0))
+
+        median_age = AGE_BINS_HOURS[median_bin] if median_bin < len(AGE_BINS_HOURS) else None
+        stats.update(
+            median_account_age_hours_below=median_age,
+            subnet_share=round(subnet_votes / votes, 3),
+            distinct_ip_ratio=round(min(distinct_ips / votes, 1.0), 3)
+        )
+
+        reasons = []
+        if median_age is not None and median_age <= self.young_account_hours:
+            reasons.append('young_accounts')
+        if stats['subnet_share'] >= self.subnet_share:
+            reasons.append('shared_subnet')
+        if stats['distinct_ip_ratio'] <= self.distinct_ip_ratio:
+            reasons.append('shared_ip')
+
+        return {'suspicious': bool(reasons), 'reasons': reasons, 'stats': stats}
+
+    def open_flag(self, song_id: int, now: float = None):
+        """Flag id raised for this song within the current window, if any"""
+        now = now or time.time()
+        with self._lock:
+            window = self._songs.get(song_id)
+            if window and window.flag_id and now - window.flagged_at < self.window_minutes * 60:
+                return window.flag_id
+        return None
+
+    def remember_flag(self, song_id: int, flag_id: int, now: float = None) -> None:
+        with self._lock:
+            window = self._songs.get(song_id)
+            if window:
+                window.flag_id = flag_id
+                window.flagged_at = now or time.time()
+
+
+def get_detector() -> VoteFraudDetector:
+    """Get the current app's detector, creating it on first use"""
+    detector = current_app.extensions.get('vote_fraud')
+    if detector is None:
+        detector = current_app.extensions.setdefault('vote_fraud', VoteFraudDetector(current_app.config))
+    return detector
+
+
+@event.listens_for(db.session, 'after_commit')
+def _remember_committed_flags(session):
+    # Only a committed flag may be reused; a rolled back one never existed
+    pending = session.info.pop('vote_flags', None)
+    detector = current_app.extensions.get('vote_fraud') if pending else None
+    if detector:
+        for song_id, flag_id in pending.items():
+            detector.remember_flag(song_id, flag_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_pending_flags(session):
+    session.info.pop('vote_flags', None)
+
+
+def screen_vote(vote, account_created_at) -> bool:
+    """
+    Run a new vote through the detector (caller commits)
+    Raises one review flag per song per window and links the vote to it;
+    the detector reuses the flag only once the caller's commit lands.
+    Returns: True if the vote is quarantined and must not be counted
+    """
+    config = current_app.config
+    if not config['FRAUD_DETECTION_ENABLED']:
+        return False
+
+    detector = get_detector()
+    verdict = detector.observe(vote.song_id, account_created_at, vote.ip_address)
+    if not verdict['suspicious']:
+        return False
+
+    pending = db.session.info.setdefault('vote_flags', {})
+    flag_id = pending.get(vote.song_id) or detector.open_flag(vote.song_id)
+    if flag_id is None:
+        flag = VoteFlag(
+            song_id=vote.song_id,
+            contest_id=vote.contest_id,
+            reasons=verdict['reasons'],
+            stats=verdict['stats']
+        )
+        db.session.add(flag)
+        db.session.flush()
+        flag_id = flag.id
+        pending[vote.song_id] = flag_id
+        current_app.logger.warning(
+            f"Vote burst flagged for song {vote.song_id}: {', '.join(verdict['reasons'])}"
+        )
+
+    vote.flag_id = flag_id
+    vote.is_quarantined = config['FRAUD_QUARANTINE_ENABLED']
+    return vote.is_quarantined
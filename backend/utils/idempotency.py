@@ -0,0 +1,177 @@
+"""
+Idempotency-Key Support
+
+A client that retries a POST with the same Idempotency-Key header gets
+the stored response of the first attempt instead of re-running the view,
+so a retry costs one unique-index lookup. Keys are scoped to the user
+and endpoint; reusing one with a different body is rejected with 422.
+
+The first request claims the key by inserting it as 'processing'. A
+concurrent retry with the same key waits up to IDEMPOTENCY_WAIT_SECONDS
+for that response and otherwise gets 409 with Retry-After. 5xx
+responses and exceptions release the key so the request can be retried
+for real. Expired keys are deleted by `flask sweep-expired`.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks while another request holds the key
+POLL_INTERVAL = 0.1
+
+
+def _sha256(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _replay(entry: IdempotencyKey):
+    response = current_app.response_class(entry.response_body, status=entry.response_code,
+                                          mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _insert(key_hash: str, user_id: int, request_hash: str, now: datetime) -> bool:
+    """Claim a new key as processing (commits); False if another request inserted it first"""
+    config = current_app.config
+    db.session.add(IdempotencyKey(
+        key_hash=key_hash,
+        user_id=user_id,
+        endpoint=request.endpoint,
+        request_hash=request_hash,
+        status='processing',
+        locked_until=now + timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS']),
+        expires_at=now + timedelta(seconds=config['IDEMPOTENCY_KEY_TTL'])
+    ))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _take_over(key_hash: str, now: datetime) -> bool:
+    """Claim a processing key whose holder died (commits)"""
+    # Guarded UPDATE so only one retry can take over an abandoned key
+    taken = db.session.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.key_hash == key_hash,
+            IdempotencyKey.status == 'processing',
+            IdempotencyKey.locked_until < now
+        )
+        .values(locked_until=now + timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_SECONDS']))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return taken == 1
+
+
+def _lookup(key_hash: str):
+    entry = IdempotencyKey.query.filter_by(key_hash=key_hash).populate_existing().first()
+    # End the read so the next poll sees the other request's commit
+    db.session.commit()
+    return entry
+
+
+def _store(key_hash: str, response) -> None:
+    if response.status_code >= 500:
+        _release(key_hash)
+        return
+
+    db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key_hash == key_hash)
+        .values(
+            status='completed',
+            response_code=response.status_code,
+            response_body=response.get_data(as_text=True),
+            locked_until=None
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _release(key_hash: str) -> None:
+    db.session.rollback()
+    db.session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.key_hash == key_hash, IdempotencyKey.status == 'processing')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def idempotent(view):
+    """
+    Replay stored responses for retried requests carrying an Idempotency-Key header
+    Apply below @jwt_required() so keys are scoped to the caller.
+    Requests without the header run normally.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters'}), 400
+
+        user_id = int(get_jwt_identity())
+        key_hash = _sha256(user_id, request.endpoint, key)
+        request_hash = _sha256(request.method, request.path, request.get_data())
+
+        deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_SECONDS']
+        while True:
+            entry = _lookup(key_hash)
+            now = datetime.utcnow()
+
+            if entry is None:
+                if _insert(key_hash, user_id, request_hash, now):
+                    break
+                # Another request with this key got in first
+                continue
+
+            if entry.request_hash != request_hash:
+                return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+
+            if entry.status == 'completed':
+                return _replay(entry)
+
+            if entry.locked_until < now and _take_over(key_hash, now):
+                break
+
+            if time.monotonic() >= deadline:
+                response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(key_hash)
+            raise
+
+        _store(key_hash, response)
+        return response
+
+    return wrapper
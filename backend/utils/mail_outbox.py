@@ -0,0 +1,196 @@
+"""
+Email Outbox Delivery
+
+Claims due outbox rows in batches and delivers each batch over a single
+SMTP connection. A temporary failure is retried with exponential backoff
+until MAIL_OUTBOX_MAX_ATTEMPTS; a permanent (5xx) rejection or the last
+attempt marks the message failed. Claims are leases,
+so rows held by a sender that died are picked up again once the lease
+runs out. Password reset bodies are blanked as soon as they are sent or
+given up on.
+"""
+import random
+import smtplib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from models import db, EmailOutbox
+from .email import mail, build_message
+
+# Fresh connections tried per batch when the server hangs up mid-batch
+MAX_RECONNECTS = 1
+
+# The server refused this one message; the connection is still usable.
+# Checked before OSError, which every SMTPException subclasses
+REJECTIONS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _due(now):
+    return db.or_(
+        db.and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        db.and_(EmailOutbox.status == 'sending', EmailOutbox.claimed_until < now)
+    )
+
+
+def claim_batch(batch_size: int, now: datetime = None) -> list:
+    """Lease up to batch_size due messages to this sender and commit the claim"""
+    now = now or datetime.utcnow()
+    claimed_until = now + timedelta(seconds=current_app.config['MAIL_OUTBOX_LEASE_SECONDS'])
+
+    # Same claim pattern as the moderation queue: SKIP LOCKED where
+    # supported, and a guarded UPDATE so two senders never share a row
+    candidate_ids = [
+        message_id for message_id, in db.session.query(EmailOutbox.id)
+        .filter(_due(now))
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    ]
+    if not candidate_ids:
+        db.session.commit()
+        return []
+
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(candidate_ids), _due(now))
+        .values(status='sending', claimed_until=claimed_until)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return EmailOutbox.query.filter(
+        EmailOutbox.id.in_(candidate_ids),
+        EmailOutbox.claimed_until == claimed_until
+    ).order_by(EmailOutbox.id).all()
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter after the given number of failed attempts"""
+    config = current_app.config
+    delay = min(config['MAIL_OUTBOX_BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['MAIL_OUTBOX_MAX_BACKOFF_SECONDS'])
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def is_permanent(error: Exception) -> bool:
+    """Check if the server rejected the message for good (5xx)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def record_failure(message: EmailOutbox, error: Exception, now: datetime = None) -> None:
+    """Reschedule a message after a failed attempt, or give up on it (caller commits)"""
+    now = now or datetime.utcnow()
+    message.attempts += 1
+    message.last_error = str(error)[:1000]
+    message.claimed_until = None
+
+    if is_permanent(error) or message.attempts >= current_app.config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+        message.status = 'failed'
+        message.scrub()
+    else:
+        message.status = 'pending'
+        message.next_attempt_at = now + backoff_delay(message.attempts)
+
+
+def record_success(message: EmailOutbox, now: datetime = None) -> None:
+    message.attempts += 1
+    message.status = 'sent'
+    message.sent_at = now or datetime.utcnow()
+    message.claimed_until = None
+    message.last_error = None
+    message.scrub()
+
+
+def deliver_batch(messages: list) -> dict:
+    """
+    Send claimed messages over one SMTP connection and commit the outcomes
+    Delivery is at-least-once: a sender killed mid-batch leaves its rows
+    leased, and they are sent again once the lease expires.
+    Returns: dict with sent and failed counts
+    """
+    summary = {'sent': 0, 'failed': 0}
+    remaining = list(messages)
+    reconnects = 0
+
+    try:
+        while remaining:
+            try:
+                with mail.connect() as connection:
+                    while remaining:
+                        message = remaining[0]
+                        try:
+                            connection.send(build_message(message))
+                        except REJECTIONS as e:
+                            # Rejected by the server (bad recipient, policy, ...)
+                            record_failure(message, e)
+                            summary['failed'] += 1
+                        except (smtplib.SMTPServerDisconnected, OSError):
+                            raise
+                        except Exception as e:
+                            # The message itself could not be built or encoded
+                            record_failure(message, e)
+                            summary['failed'] += 1
+                        else:
+                            record_success(message)
+                            summary['sent'] += 1
+                        remaining.pop(0)
+            except (smtplib.SMTPException, OSError) as e:
+                if not remaining:
+                    # The connection failed on QUIT after everything was sent
+                    break
+
+                if isinstance(e, smtplib.SMTPServerDisconnected) and reconnects < MAX_RECONNECTS:
+                    reconnects += 1
+                    continue
+
+                current_app.logger.warning(f"SMTP connection failed with {len(remaining)} messages left: {e}")
+
+                # The message in flight counts as a failed attempt; the rest go
+                # back to the queue rather than hammering a dead server
+                record_failure(remaining.pop(0), e)
+                summary['failed'] += 1
+                for message in remaining:
+                    message.status = 'pending'
+                    message.claimed_until = None
+                break
+    finally:
+        db.session.commit()
+
+    return summary
+
+
+def send_outbox(batch_size: int = 100, max_batches: int = None) -> dict:
+    """
+    Deliver due messages until the outbox is drained (or max_batches is reached)
+    Returns: dict with sent and failed counts
+    """
+    summary = {'sent': 0, 'failed': 0}
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        messages = claim_batch(batch_size)
+        if not messages:
+            break
+
+        result = deliver_batch(messages)
+        summary['sent'] += result['sent']
+        summary['failed'] += result['failed']
+        batches += 1
+
+        if result['sent'] == 0:
+            # Nothing got through; let the backoff schedule decide when to retry
+            break
+
+    return summary
+
+
+def outbox_status() -> dict:
+    """Count of outbox messages per status"""
+    counts = dict(db.session.query(EmailOutbox.status, func.count()).group_by(EmailOutbox.status).all())
+    return {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'failed')}
@@ -0,0 +1,162 @@
+"""
+Password Hashing Utilities
+
+Hashes run inline in the request worker, but only PASSWORD_HASH_SLOTS of
+them at a time across every worker process on the host, so a login
+storm cannot pin all sync workers on scrypt and starve other requests.
+A slot is an flock on one of the files in PASSWORD_HASH_SLOT_DIR: the
+kernel arbitrates between gunicorn/Passenger processes and releases the
+lock if a worker dies mid-hash. A caller that cannot get a slot within
+PASSWORD_HASH_WAIT seconds gets HashingBusy (turned into a 503 with
+Retry-After) instead of queueing behind the storm.
+
+Bulk work (flask users import) uses its own process pool from
+hashing_pool().
+"""
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: slots are per process
+    fcntl = None
+
+# Seconds between attempts while every slot is taken
+POLL_INTERVAL = 0.01
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up in time"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__('Every password hashing slot is taken')
+        self.retry_after = retry_after
+
+
+class HashSlots:
+    """At most `size` holders at a time across the processes sharing `directory`"""
+
+    def __init__(self, directory: str, size: int):
+        self.size = size
+        self.paths = [os.path.join(directory, f"slot-{i}.lock") for i in range(size)]
+        if fcntl:
+            os.makedirs(directory, exist_ok=True)
+        else:
+            self._semaphore = threading.BoundedSemaphore(size)
+
+    def _try_acquire(self):
+        """An open, locked slot file descriptor, or None when all are taken"""
+        if not fcntl:
+            return True if self._semaphore.acquire(blocking=False) else None
+
+        # Random order so waiting processes do not all contend for slot 0
+        for path in random.sample(self.paths, len(self.paths)):
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def _release(self, slot) -> None:
+        if not fcntl:
+            self._semaphore.release()
+        else:
+            # Closing the descriptor drops the lock
+            os.close(slot)
+
+    @contextmanager
+    def hold(self, wait: float, retry_after: int):
+        deadline = time.monotonic() + wait
+        slot = self._try_acquire()
+        while slot is None:
+            if time.monotonic() >= deadline:
+                raise HashingBusy(retry_after)
+            time.sleep(POLL_INTERVAL)
+            slot = self._try_acquire()
+
+        try:
+            yield
+        finally:
+            self._release(slot)
+
+
+def _get_slots(directory: str, size: int) -> HashSlots:
+    key = (directory, size)
+    if key not in _slots:
+        with _slots_lock:
+            if key not in _slots:
+                _slots[key] = HashSlots(directory, size)
+    return _slots[key]
+
+
+def hashing_pool(max_workers: int) -> ProcessPoolExecutor:
+    """New hashing pool; spawn rather than fork since the parent holds DB connections"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+
+def _run(fn, *args):
+    """Run fn in a host-wide hashing slot, or without one when PASSWORD_HASH_SLOTS is 0"""
+    config = current_app.config
+    size = config['PASSWORD_HASH_SLOTS']
+    if size <= 0:
+        return fn(*args)
+
+    slots = _get_slots(config['PASSWORD_HASH_SLOT_DIR'], size)
+    with slots.hold(config['PASSWORD_HASH_WAIT'], config['PASSWORD_HASH_RETRY_AFTER']):
+        return fn(*args)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with the configured method"""
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_many(executor: ProcessPoolExecutor, passwords: list, chunksize: int = 16):
+    """
+    Submit a batch of passwords to a pool from hashing_pool()
+    Work starts immediately; the returned iterator yields hashes in order.
+    """
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    return executor.map(generate_password_hash, passwords, repeat(method), chunksize=chunksize)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password against a stored hash"""
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def _method_params(method: str) -> tuple:
+    """(method, params) with werkzeug's defaults filled in, e.g. 'scrypt' -> ('scrypt', (32768, 8, 1))"""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return name, (2 ** 15, 8, 1)
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        args = [hash_name, iterations]
+    return name, tuple(int(arg) if str(arg).isdigit() else arg for arg in args)
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """Check if a stored hash was made with other parameters than the configured method"""
+    stored = password_hash.split('$', 1)[0]
+    return _method_params(stored) != _method_params(current_app.config['PASSWORD_HASH_METHOD'])
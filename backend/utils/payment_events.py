@@ -0,0 +1,109 @@
+"""
+Payment Webhook Inbox
+
+The webhook stores each event and acknowledges immediately; the
+processor applies stored events in batches through utils.settlement.
+"""
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, PaymentEvent
+from .settlement import check_charge, settle_charges
+
+
+def record_event(payload: dict) -> bool:
+    """
+    Store a webhook event and commit
+    Returns: False if the same event was already stored
+    """
+    data = payload.get('data') or {}
+    event = PaymentEvent(
+        event_key=PaymentEvent.key_for(payload)[:200],
+        event_type=payload.get('event'),
+        tx_ref=data.get('tx_ref'),
+        payload=payload
+    )
+    db.session.add(event)
+
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _finish(ids: list, status: str, now: datetime, error: str = None) -> None:
+    if ids:
+        db.session.execute(
+            update(PaymentEvent)
+            .where(PaymentEvent.id.in_(ids))
+            .values(status=status, error=error, processed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def process_events(batch_size: int = 500) -> dict:
+    """
+    Apply one batch of received events and commit
+    Returns: dict with processed, settled, artists_paid, ignored and rejected counts
+    """
+    events = db.session.query(
+        PaymentEvent.id, PaymentEvent.event_type, PaymentEvent.payload
+    ).filter(
+        PaymentEvent.status == 'received'
+    ).order_by(PaymentEvent.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    summary = {'processed': 0, 'settled': 0, 'artists_paid': 0, 'ignored': 0, 'rejected': 0}
+    if not events:
+        db.session.commit()
+        return summary
+
+    now = datetime.utcnow()
+    charges = []
+    ignored = []
+    rejected = {}
+
+    for event_id, event_type, payload in events:
+        charge = (payload or {}).get('data') or {}
+        if event_type != 'charge.completed' or charge.get('status') != 'successful':
+            ignored.append(event_id)
+            continue
+
+        reason = check_charge(charge)
+        if reason:
+            rejected.setdefault(reason, []).append(event_id)
+        else:
+            charges.append((event_id, charge))
+
+    result = settle_charges([charge for _, charge in charges])
+
+    # Charges that matched nothing (unknown or already settled) are done too
+    _finish([event_id for event_id, _ in charges], 'processed', now)
+    _finish(ignored, 'ignored', now)
+    for reason, ids in rejected.items():
+        _finish(ids, 'rejected', now, reason)
+    db.session.commit()
+
+    summary.update(
+        processed=len(charges),
+        settled=result['settled'],
+        artists_paid=result['artists_paid'],
+        ignored=len(ignored),
+        rejected=sum(len(ids) for ids in rejected.values())
+    )
+    return summary
+
+
+def process_all_events(batch_size: int = 500) -> dict:
+    """Process batches until no received events are left"""
+    totals = {'processed': 0, 'settled': 0, 'artists_paid': 0, 'ignored': 0, 'rejected': 0}
+
+    while True:
+        summary = process_events(batch_size)
+        for key, value in summary.items():
+            totals[key] += value
+        if not any(summary.values()):
+            return totals
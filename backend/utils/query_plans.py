@@ -0,0 +1,259 @@
+"""
+Query Plan Checks
+
+`flask db check-plans` seeds a scratch database, drives the hot
+endpoints (HOT_REQUESTS) through the test client and runs EXPLAIN on
+every SELECT, UPDATE and DELETE they issued. A statement whose plan
+reads a whole table (SQLite "SCAN <table>", MySQL access type ALL or
+index) is a regression, unless the table is listed in ALLOWED_SCANS
+with the reason the scan is intended.
+
+MySQL tables are analyzed after seeding so the planner works from real
+statistics. SQLite is left unanalyzed: without statistics its planner
+uses any index that fits the WHERE clause, which is what the check is
+about, while with them it prefers scanning small tables such as
+contests and would hide a missing index there.
+"""
+import random
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import has_request_context, request
+from sqlalchemy import event, func, insert, inspect, select, update
+
+from models import db, User, Artist, Contest, ContestWinner, Song, Vote, Payment
+
+# Whole-table reads that are intended, with the reason
+ALLOWED_SCANS = {
+    'artists': 'GET /api/artists lists every paid, verified artist'
+}
+
+# (contest phase, method, path, caller, JSON body); paths are formatted with the seeded ids
+HOT_REQUESTS = [
+    ('submission', 'GET', '/api/songs', None, None),
+    ('submission', 'GET', '/api/songs/my-submissions', 'artist', None),
+    ('submission', 'POST', '/api/songs/submit', 'new_artist',
+     {'title': 'Plan check', 'audio_url': 'https://example.com/plan-check.mp3', 'duration': 180}),
+    ('submission', 'GET', '/api/artists/check-eligibility', 'winner', None),
+    ('voting', 'GET', '/api/songs', None, None),
+    ('voting', 'GET', '/api/songs/{song_id}', None, None),
+    ('voting', 'GET', '/api/leaderboard', None, None),
+    ('voting', 'GET', '/api/leaderboard/top/10', None, None),
+    ('voting', 'GET', '/api/leaderboard/contest/{past_contest_id}', None, None),
+    ('voting', 'GET', '/api/artists', None, None),
+    ('voting', 'GET', '/api/artists/{artist_id}', None, None),
+    ('voting', 'GET', '/api/artists/profile', 'artist', None),
+    ('voting', 'GET', '/api/auth/me', 'voter', None),
+    ('voting', 'GET', '/api/votes/status', 'voter', None),
+    ('voting', 'GET', '/api/votes/my-vote', 'voter', None),
+    ('voting', 'POST', '/api/votes/cast', 'new_voter', {'song_id': '{song_id}'}),
+    ('voting', 'GET', '/api/payments/status/{tx_ref}', 'artist', None),
+]
+
+Statement = namedtuple('Statement', ['endpoint', 'sql', 'parameters'])
+Finding = namedtuple('Finding', ['endpoint', 'sql', 'tables', 'plan'])
+
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+def seed(users: int = 2000, artists: int = 100, past_contests: int = 6, seed_value: int = 0) -> dict:
+    """
+    Bulk-load an empty database with past contests (songs, votes, winners)
+    and an active one, using executemany inserts.
+    Returns: the ids that fill HOT_REQUESTS and the user id of each caller
+    """
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+
+    db.session.execute(insert(User), [
+        {'email': f"user{i}@example.com", 'username': f"user{i}", 'password_hash': 'x', 'roles': ['user']}
+        for i in range(1, users + artists + 1)
+    ])
+    # Artists are the last `artists` users; every one of them has paid
+    artist_users = range(users + 1, users + artists + 1)
+    db.session.execute(insert(Payment), [
+        {'user_id': user_id, 'transaction_id': f"flw-{user_id}", 'tx_ref': f"SW-{user_id}", 'amount': 25000,
+         'status': 'successful', 'verified_at': now}
+        for user_id in artist_users
+    ])
+    db.session.execute(insert(Artist), [
+        {'user_id': user_id, 'stage_name': f"Artist {user_id}", 'is_paid': True, 'is_verified': True,
+         'payment_id': index}
+        for index, user_id in enumerate(artist_users, 1)
+    ])
+    db.session.execute(insert(Contest), [
+        {'title': f"Contest {i}", 'start_date': now - timedelta(days=30 * (past_contests - i + 2)),
+         'submission_end_date': now - timedelta(days=30 * (past_contests - i + 2) - 10),
+         'voting_end_date': now - timedelta(days=30 * (past_contests - i + 1)), 'phase': 'completed',
+         'is_active': False}
+        for i in range(1, past_contests + 1)
+    ] + [{'title': 'Current contest', 'start_date': now - timedelta(days=1),
+          'submission_end_date': now + timedelta(days=7), 'voting_end_date': now + timedelta(days=14),
+          'is_active': True}])
+    current_id = past_contests + 1
+
+    # Every artist but the last one enters every contest
+    songs = []
+    for contest_id in range(1, current_id + 1):
+        for artist_id in range(1, artists):
+            songs.append({'artist_id': artist_id, 'contest_id': contest_id, 'title': f"Song {len(songs) + 1}",
+                          'audio_url': f"https://example.com/{len(songs) + 1}.mp3",
+                          'status': 'approved' if rng.random() < 0.9 else 'pending', 'vote_count': 0})
+    db.session.execute(insert(Song), songs)
+
+    song_ids = {}
+    for song_id, song in enumerate(songs, 1):
+        if song['status'] == 'approved':
+            song_ids.setdefault(song['contest_id'], []).append(song_id)
+
+    # Every user votes in every past contest and half of them in the current one
+    votes = []
+    for contest_id in range(1, current_id + 1):
+        voters = range(1, users // 2 + 1) if contest_id == current_id else range(1, users + 1)
+        for user_id in voters:
+            song_id = rng.choice(song_ids[contest_id])
+            votes.append({'user_id': user_id, 'song_id': song_id, 'contest_id': contest_id, 'created_at': now})
+            songs[song_id - 1]['vote_count'] += 1
+    db.session.execute(insert(Vote), votes)
+    db.session.execute(update(Song), [
+        {'id': song_id, 'vote_count': song['vote_count']} for song_id, song in enumerate(songs, 1) if song['vote_count']
+    ])
+
+    # Artist 1 won the most recent past contest, the others the ones before
+    db.session.execute(insert(ContestWinner), [
+        {'contest_id': contest_id, 'artist_id': 1 + (past_contests - contest_id) % (artists - 1),
+         'song_id': song_ids[contest_id][0], 'final_vote_count': songs[song_ids[contest_id][0] - 1]['vote_count'],
+         'won_at': now - timedelta(days=30 * (past_contests - contest_id + 1))}
+        for contest_id in range(1, current_id)
+    ])
+    db.session.commit()
+
+    return {
+        'current_contest_id': current_id,
+        'past_contest_id': current_id - 1,
+        'song_id': song_ids[current_id][0],
+        'artist_id': 2,
+        'tx_ref': f"SW-{users + 2}",
+        'users': {
+            'voter': 1,
+            'new_voter': users,
+            'artist': users + 2,
+            'winner': users + 1,
+            'new_artist': users + artists
+        }
+    }
+
+
+def analyze() -> None:
+    """Refresh planner statistics for every table (MySQL only, see above)"""
+    with db.engine.begin() as connection:
+        if connection.dialect.name != 'sqlite':
+            for table in inspect(connection).get_table_names():
+                connection.exec_driver_sql(f"ANALYZE TABLE {connection.dialect.identifier_preparer.quote(table)}")
+
+
+def set_phase(contest_id: int, phase: str) -> None:
+    """Move a contest's dates so that get_phase() returns phase"""
+    now = datetime.utcnow()
+    submission_end = now + timedelta(days=7) if phase == 'submission' else now - timedelta(hours=1)
+    db.session.execute(update(Contest).where(Contest.id == contest_id).values(
+        submission_end_date=submission_end, voting_end_date=now + timedelta(days=14)
+    ))
+    db.session.commit()
+
+
+def full_scans(connection, statement: str, parameters) -> tuple:
+    """
+    Tables a statement reads in full, according to EXPLAIN
+    Returns: (scanned table names, plan lines)
+    """
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        plan = [row[-1] for row in rows]
+        tables = [match.group(1) for match in map(_SQLITE_SCAN.match, plan) if match]
+    else:
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+        plan = [f"{row['table']}: {row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+        tables = [row['table'] for row in rows if row['type'] in ('ALL', 'index')]
+    return tables, plan
+
+
+def capture_statements(engine, statements: list):
+    """Listener recording each explainable statement with the endpoint that issued it"""
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and _EXPLAINABLE.match(statement):
+            endpoint = request.endpoint if has_request_context() else None
+            statements.append(Statement(endpoint, statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    return record
+
+
+def run_hot_requests(app, ids: dict, tokens: dict, log=None) -> list:
+    """Issue HOT_REQUESTS phase by phase; returns the statements they ran"""
+    statements = []
+    client = app.test_client()
+
+    with app.app_context():
+        listener = capture_statements(db.engine, statements)
+
+    try:
+        for phase in ('submission', 'voting'):
+            with app.app_context():
+                set_phase(ids['current_contest_id'], phase)
+
+            for request_phase, method, path, caller, body in HOT_REQUESTS:
+                if request_phase != phase:
+                    continue
+                url = path.format(**ids)
+                if body:
+                    body = {key: int(value.format(**ids)) if isinstance(value, str) and value.startswith('{') else value
+                            for key, value in body.items()}
+                headers = {'Authorization': f"Bearer {tokens[caller]}"} if caller else {}
+
+                response = client.open(url, method=method, json=body, headers=headers)
+                if log:
+                    log(f"{method} {url} -> {response.status_code}")
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.get_data(as_text=True)}")
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    return statements
+
+
+def check_plans(app, users: int = 2000, artists: int = 100, log=None) -> tuple:
+    """
+    Seed, drive the hot endpoints and EXPLAIN what they ran
+    Returns: (number of distinct statements checked, list of Finding for unexpected full scans)
+    """
+    from utils.auth import issue_access_token
+
+    with app.app_context():
+        if db.session.scalar(select(func.count()).select_from(User)):
+            raise RuntimeError('check-plans needs an empty database; it seeds its own data')
+
+        ids = seed(users=users, artists=artists)
+        analyze()
+        tokens = {caller: issue_access_token(db.session.get(User, user_id)) for caller, user_id in ids['users'].items()}
+
+    statements = run_hot_requests(app, ids, tokens, log=log)
+
+    findings = []
+    seen = set()
+    with app.app_context(), db.engine.connect() as connection:
+        for statement in statements:
+            key = (statement.endpoint, statement.sql)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            tables, plan = full_scans(connection, statement.sql, statement.parameters)
+            unexpected = [table for table in tables if table not in ALLOWED_SCANS]
+            if unexpected:
+                findings.append(Finding(statement.endpoint, statement.sql, unexpected, plan))
+
+    return len(seen), findings
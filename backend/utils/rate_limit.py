@@ -0,0 +1,176 @@
+"""
+Rate Limiting
+
+The limiter is created here and bound in create_app, so routes can
+declare their own policies with @limit_from_config.
+
+Counters live in a small SQLite database in WAL mode (RATELIMIT_STORAGE_URI
+= sqlite:////path/to/file.db) that every worker process on the host
+opens, so "50 per hour" means 50 across all gunicorn workers and
+survives restarts, without needing Redis. Each check is a single
+BEGIN IMMEDIATE transaction on a per-thread connection: SQLite's write
+lock makes the read-compare-increment atomic across processes, and WAL
+with synchronous=NORMAL keeps it to a few microseconds with no fsync.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits.storage import Storage, SlidingWindowCounterSupport
+
+# Expired counters are purged every this many writes per connection
+PURGE_EVERY = 1000
+
+BUSY_TIMEOUT_MS = 1000
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport):
+    """
+    limits storage backed by one SQLite file shared by all local processes
+    Supports the fixed-window and sliding-window-counter strategies.
+    """
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        path = uri.split('://', 1)[1]
+        self.path = path[1:] if path.startswith('/') else path
+        self._local = threading.local()
+
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                'key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                     isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        self._local.writes = 0
+        return connection
+
+    def _read(self, connection, key: str, now: float) -> tuple:
+        row = connection.execute('SELECT count, expires_at FROM counters WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return 0, now
+        return row
+
+    def _write(self, connection, key: str, count: int, expires_at: float, now: float) -> None:
+        connection.execute(
+            'INSERT OR REPLACE INTO counters (key, count, expires_at) VALUES (?, ?, ?)',
+            (key, count, expires_at)
+        )
+
+        self._local.writes += 1
+        if self._local.writes % PURGE_EVERY == 0:
+            connection.execute('DELETE FROM counters WHERE expires_at <= ?', (now,))
+
+    def _add(self, connection, key: str, expiry: float, amount: int, now: float) -> int:
+        count, expires_at = self._read(connection, key, now)
+        if count == 0:
+            expires_at = now + expiry
+        self._write(connection, key, count + amount, expires_at, now)
+        return count + amount
+
+    def _transaction(self, fn):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(connection, time.time())
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        return self._transaction(lambda connection, now: self._add(connection, key, expiry, amount, now))
+
+    def get(self, key: str) -> int:
+        return self._read(self._connect(), key, time.time())[0]
+
+    def get_expiry(self, key: str) -> float:
+        return self._read(self._connect(), key, time.time())[1]
+
+    def check(self) -> bool:
+        try:
+            self._connect().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._transaction(lambda connection, now: connection.execute('DELETE FROM counters').rowcount)
+
+    def clear(self, key: str) -> None:
+        self._connect().execute('DELETE FROM counters WHERE key = ?', (key,))
+
+    @staticmethod
+    def _window_keys(key: str, expiry: int, now: float) -> tuple:
+        return f"{key}/{int((now - expiry) / expiry)}", f"{key}/{int(now / expiry)}"
+
+    def _window(self, connection, key: str, expiry: int, now: float) -> tuple:
+        """(previous count, previous ttl, current count, current ttl, current expires_at)"""
+        previous_key, current_key = self._window_keys(key, expiry, now)
+        rows = dict((row[0], row[1:]) for row in connection.execute(
+            'SELECT key, count, expires_at FROM counters WHERE key IN (?, ?) AND expires_at > ?',
+            (previous_key, current_key, now)
+        ))
+        previous_count = rows.get(previous_key, (0, None))[0]
+        current_count, current_expires_at = rows.get(current_key, (0, None))
+
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl, current_expires_at
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+
+        def acquire(connection, now):
+            previous_count, previous_ttl, current_count, _, expires_at = self._window(connection, key, expiry, now)
+            weighted = previous_count * previous_ttl / expiry + current_count
+            if math.floor(weighted) + amount > limit:
+                return False
+
+            # The current window's counter must outlive the next window, which weighs it
+            current_key = self._window_keys(key, expiry, now)[1]
+            self._write(connection, current_key, current_count + amount, expires_at or now + 2 * expiry, now)
+            return True
+
+        return self._transaction(acquire)
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple:
+        return self._window(self._connect(), key, expiry, time.time())[:4]
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for window_key in self._window_keys(key, expiry, time.time()):
+            self.clear(window_key)
+
+
+limiter = Limiter(key_func=get_remote_address)
+
+
+def limit_from_config(name: str):
+    """Rate limit a route with the policy string in config[name], e.g. '5 per minute'"""
+    return limiter.limit(lambda: current_app.config[name])
@@ -0,0 +1,141 @@
+"""
+Payment Reconciliation
+
+Pages through stale pending payments by id and verifies each page by
+tx_ref against Flutterwave from a bounded thread pool, paced by a shared
+rate budget. Each page is applied with set-based updates (utils.settlement
+for successful charges, one UPDATE for failures) and committed before
+the next page is fetched.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from models import db, Payment
+from .flutterwave import get_client, CircuitOpen, FlutterwaveError
+from .settlement import check_charge, settle_charges
+from .throttle import RateLimiter
+
+
+def _classify(result: dict, created_at: datetime, give_up_before: datetime) -> tuple:
+    """
+    Decide what to do with one verification response
+    Returns: (outcome, charge or reason)
+    """
+    charge = result.get('data') or {}
+
+    if result.get('status') != 'success' or not charge:
+        # Flutterwave has no transaction for this reference (yet)
+        if created_at < give_up_before:
+            return 'failed', 'no transaction found'
+        return 'pending', None
+
+    status = charge.get('status')
+    if status == 'successful':
+        reason = check_charge(charge)
+        return ('settle', charge) if reason is None else ('mismatch', reason)
+    if status == 'failed':
+        return 'failed', 'charge failed'
+
+    return 'pending', None
+
+
+def reconcile_payments(min_age_minutes: int = 15, give_up_hours: int = 24, page_size: int = 200,
+                       max_workers: int = 4, rate: float = 5, max_calls: int = None, log=None) -> dict:
+    """
+    Verify pending payments older than min_age_minutes and apply the results
+    Payments with no Flutterwave transaction after give_up_hours are marked failed.
+    rate caps gateway calls per second; max_calls caps them per run.
+    Returns: summary dict of outcome counts
+    """
+    now = datetime.utcnow()
+    newest = now - timedelta(minutes=min_age_minutes)
+    give_up_before = now - timedelta(hours=give_up_hours)
+
+    client = get_client()
+    limiter = RateLimiter(rate, burst=max(1, int(rate)))
+    summary = {
+        'checked': 0, 'settled': 0, 'artists_paid': 0, 'failed': 0,
+        'still_pending': 0, 'mismatch': 0, 'errors': 0, 'stopped': None
+    }
+
+    def verify(tx_ref):
+        limiter.acquire()
+        return client.verify_by_reference(tx_ref)
+
+    calls = 0
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while summary['stopped'] is None:
+            limit = page_size
+            if max_calls is not None:
+                limit = min(limit, max_calls - calls)
+                if limit <= 0:
+                    summary['stopped'] = 'call budget exhausted'
+                    break
+
+            page = db.session.query(Payment.id, Payment.tx_ref, Payment.created_at).filter(
+                Payment.status == 'pending',
+                Payment.created_at <= newest,
+                Payment.id > last_id
+            ).order_by(Payment.id).limit(limit).all()
+            if not page:
+                break
+            last_id = page[-1].id
+            calls += len(page)
+
+            # Release the read transaction while the gateway calls run
+            db.session.commit()
+
+            futures = [(row, executor.submit(verify, row.tx_ref)) for row in page]
+            charges = []
+            failed_ids = []
+
+            for row, future in futures:
+                try:
+                    outcome, detail = _classify(future.result(), row.created_at, give_up_before)
+                except CircuitOpen:
+                    summary['stopped'] = 'circuit breaker open'
+                    continue
+                except FlutterwaveError as e:
+                    summary['errors'] += 1
+                    if log:
+                        log(f"{row.tx_ref}: {e}")
+                    continue
+                except Exception as e:
+                    # A malformed body must not abort the page before it is applied
+                    summary['errors'] += 1
+                    if log:
+                        log(f"{row.tx_ref}: unexpected response ({e!r})")
+                    continue
+
+                summary['checked'] += 1
+                if outcome == 'settle':
+                    charges.append(detail)
+                elif outcome == 'failed':
+                    failed_ids.append(row.id)
+                elif outcome == 'mismatch':
+                    summary['mismatch'] += 1
+                    if log:
+                        log(f"{row.tx_ref}: {detail}")
+                else:
+                    summary['still_pending'] += 1
+
+            settled = settle_charges(charges)
+            if failed_ids:
+                summary['failed'] += db.session.execute(
+                    update(Payment)
+                    .where(Payment.id.in_(failed_ids), Payment.status == 'pending')
+                    .values(status='failed')
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+            db.session.commit()
+
+            summary['settled'] += settled['settled']
+            summary['artists_paid'] += settled['artists_paid']
+
+            if log:
+                log(f"Page ending at payment {last_id}: {len(charges)} paid, {len(failed_ids)} failed")
+
+    return summary
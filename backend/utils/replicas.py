@@ -0,0 +1,157 @@
+"""
+Read Replica Routing
+
+Replica URLs (REPLICA_DATABASE_URLS) become Flask-SQLAlchemy binds named
+replica_0, replica_1, ... GET requests to the blueprints in
+REPLICA_BLUEPRINTS read from the next healthy replica in round-robin
+order; everything else, and every query outside a request, uses the
+primary.
+
+A replica is checked with SELECT 1 at most every REPLICA_CHECK_SECONDS
+and skipped while the check fails, or as soon as a query on it loses
+its connection. If no replica is healthy, reads go to the primary.
+
+Read-your-writes: a successful write by an authenticated user marks
+that user (JWT identity) as sticky for REPLICA_STICKY_SECONDS, and their
+reads go to the primary meanwhile, which covers replication lag for
+flows like submit-then-list whatever the client does with cookies. The
+marks live in a limits storage (REPLICA_STICKY_STORAGE_URI, by default
+the rate limiter's) so every worker sharing it sees them: the SQLite
+file covers one host, a Redis URI several.
+"""
+import itertools
+import threading
+import time
+
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from limits.storage import storage_from_string
+from sqlalchemy import event, text
+
+from models import db
+from . import rate_limit  # noqa: F401 (registers the sqlite:// scheme)
+
+STICKY_KEY = 'replica-sticky/{identity}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Replica:
+    __slots__ = ('name', 'engine', 'healthy', 'checked_until', 'lock')
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.checked_until = 0.0
+        self.lock = threading.Lock()
+
+
+class ReplicaPool:
+    """Round-robin over replica engines, skipping the ones that fail health checks"""
+
+    def __init__(self, engines: dict, check_seconds: float):
+        self.replicas = [Replica(name, engine) for name, engine in engines.items()]
+        self.check_seconds = check_seconds
+        self._counter = itertools.count()
+
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect:
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine) -> None:
+        for replica in self.replicas:
+            if replica.engine is engine:
+                replica.healthy = False
+                replica.checked_until = time.monotonic() + self.check_seconds
+
+    def _check(self, replica: Replica, now: float) -> None:
+        # One thread checks; the others use the last known state
+        if not replica.lock.acquire(blocking=False):
+            return
+        try:
+            with replica.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            replica.healthy = True
+        except Exception as e:
+            if replica.healthy:
+                current_app.logger.warning(f"Read replica {replica.name} failed its health check: {e}")
+            replica.healthy = False
+        finally:
+            replica.checked_until = now + self.check_seconds
+            replica.lock.release()
+
+    def pick(self):
+        """Next healthy replica engine, or None to use the primary"""
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._counter) % len(self.replicas)]
+            if replica.checked_until <= now:
+                self._check(replica, now)
+            if replica.healthy:
+                return replica.engine
+        return None
+
+    def status(self) -> list:
+        return [{'name': replica.name, 'healthy': replica.healthy} for replica in self.replicas]
+
+
+def replica_binds(urls: list) -> dict:
+    """SQLALCHEMY_BINDS entries for the configured replica URLs"""
+    return {f'replica_{index}': url for index, url in enumerate(urls)}
+
+
+def get_replicas():
+    """The current app's ReplicaPool, or None when no replicas are configured"""
+    return current_app.extensions.get('replicas')
+
+
+def _identity():
+    """JWT identity of the request, or None (invalid tokens are left for the view to reject)"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _route_to_replica():
+    if request.method not in SAFE_METHODS or request.blueprint not in current_app.config['REPLICA_BLUEPRINTS']:
+        return
+
+    identity = _identity()
+    if identity is not None and current_app.extensions['replica_sticky'].get(STICKY_KEY.format(identity=identity)):
+        return
+
+    g.db_replica = get_replicas().pick()
+
+
+def _stick_to_primary(response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        identity = _identity()
+        if identity is not None:
+            storage = current_app.extensions['replica_sticky']
+            key = STICKY_KEY.format(identity=identity)
+            # incr keeps an existing expiry; start the window over from this write
+            storage.clear(key)
+            storage.incr(key, current_app.config['REPLICA_STICKY_SECONDS'])
+    return response
+
+
+def init_replicas(app) -> None:
+    """Build the replica pool and install the routing hooks (call after db.init_app)"""
+    names = list(replica_binds(app.config['REPLICA_DATABASE_URLS']))
+    if not names:
+        return
+
+    with app.app_context():
+        engines = {name: db.engines[name] for name in names}
+
+    app.extensions['replicas'] = ReplicaPool(engines, app.config['REPLICA_CHECK_SECONDS'])
+    app.extensions['replica_sticky'] = storage_from_string(
+        app.config['REPLICA_STICKY_STORAGE_URI'] or app.config['RATELIMIT_STORAGE_URI']
+    )
+    app.before_request(_route_to_replica)
+    app.after_request(_stick_to_primary)
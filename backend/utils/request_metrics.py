@@ -0,0 +1,165 @@
+"""
+Per-Request Metrics
+
+Every request counts the SQL statements it runs and the time spent in
+them (before/after_cursor_execute on every engine, primary and
+replicas), the time spent encoding JSON, and its total time. They are
+returned in a Server-Timing header, which browser dev tools show next
+to the request:
+
+    Server-Timing: db;dur=41.2;desc="275 queries", serialize;dur=3.1, app;dur=12.7, total;dur=57.0
+
+and logged as one line per request (INFO, key=value pairs). A request
+running more than REQUEST_METRICS_QUERY_THRESHOLD statements is also
+logged as a WARNING with its normalized statements (literals and IN
+lists collapsed) and how many times each ran, which is how N+1 loops
+such as one query per artist in a list show up.
+
+Statements run outside a request (CLI commands, background threads) are
+not counted.
+"""
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+from models import db
+
+# Statements listed in the threshold warning
+TOP_STATEMENTS = 10
+
+_PARAM = re.compile(r'%\(\w+\)s|%s')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_seconds', 'serialize_seconds', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.statements = Counter()
+
+
+def normalize_statement(statement: str) -> str:
+    """SQL with parameters and literals as ?, IN lists as IN (...), on one line"""
+    statement = _PARAM.sub('?', statement)
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('IN (...)', statement)
+    return _SPACES.sub(' ', statement).strip()
+
+
+def current_metrics():
+    """The RequestMetrics of the current request, or None"""
+    return g.get('request_metrics') if has_request_context() else None
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Adds JSON encoding time to the current request's metrics"""
+
+    def dumps(self, obj, **kwargs):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().dumps(obj, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.serialize_seconds += time.perf_counter() - start
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('request_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('request_metrics_started')
+    if not stack:
+        return
+    started = stack.pop()
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+        metrics.statements[statement] += 1
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for a failed statement
+    stack = exception_context.connection.info.get('request_metrics_started') if exception_context.connection else None
+    if stack:
+        started = stack.pop()
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_seconds += time.perf_counter() - started
+            metrics.statements[exception_context.statement] += 1
+
+
+def _start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def _report_request(response):
+    metrics = g.pop('request_metrics', None)
+    if metrics is None:
+        return response
+
+    total_ms = (time.perf_counter() - metrics.started) * 1000
+    db_ms = metrics.db_seconds * 1000
+    serialize_ms = metrics.serialize_seconds * 1000
+    app_ms = max(total_ms - db_ms - serialize_ms, 0.0)
+
+    if current_app.config['REQUEST_METRICS_SERVER_TIMING']:
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{metrics.queries} queries", serialize;dur={serialize_ms:.1f}, '
+            f'app;dur={app_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+
+    current_app.logger.info(
+        f"request method={request.method} path={request.path} endpoint={request.endpoint} "
+        f"status={response.status_code} queries={metrics.queries} db_ms={db_ms:.1f} "
+        f"serialize_ms={serialize_ms:.1f} app_ms={app_ms:.1f} total_ms={total_ms:.1f}"
+    )
+
+    threshold = current_app.config['REQUEST_METRICS_QUERY_THRESHOLD']
+    if threshold and metrics.queries > threshold:
+        normalized = Counter()
+        for statement, count in metrics.statements.items():
+            normalized[normalize_statement(statement)] += count
+        lines = '\n'.join(f"  {count:5d} x {statement}" for statement, count in normalized.most_common(TOP_STATEMENTS))
+        current_app.logger.warning(
+            f"{request.method} {request.path} ({request.endpoint}) ran {metrics.queries} SQL statements "
+            f"(threshold {threshold}), {len(normalized)} distinct:\n{lines}"
+        )
+
+    return response
+
+
+def init_request_metrics(app) -> None:
+    """
+    Install the SQL listeners, JSON provider and request hooks
+    (call after db.init_app and before other extensions' request hooks,
+    so the total covers them)
+    """
+    if not app.config['REQUEST_METRICS_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_request)
+    app.after_request(_report_request)
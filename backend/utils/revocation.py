@@ -0,0 +1,171 @@
+"""
+JWT Revocation
+
+Revoked token ids are kept in a Bloom filter and users whose tokens were
+all revoked in a dict of cut-off times, both in worker memory. Checking a
+token is a handful of hash probes; only a Bloom hit (a revoked token or a
+rare false positive) is confirmed against revoked_tokens.
+
+Each worker pulls new revocations from the database every
+REVOCATION_SYNC_SECONDS, so a revocation made in another worker takes
+effect there within that interval. The worker that revokes applies it
+immediately.
+"""
+import calendar
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db, User, RevokedToken
+
+# Re-read rows revoked shortly before the last sync, in case their
+# transaction had not committed yet when it ran
+SYNC_OVERLAP = timedelta(seconds=10)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing: h1 + i * h2 gives k independent-enough positions
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        if key in self:
+            return
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _timestamp(value: datetime) -> int:
+    # Naive UTC datetimes, compared against the integer iat claim
+    return calendar.timegm(value.timetuple())
+
+
+class RevocationList:
+    """Per-process view of revoked tokens shared by all request threads"""
+
+    def __init__(self, config):
+        self.capacity = config['REVOCATION_BLOOM_CAPACITY']
+        self.error_rate = config['REVOCATION_BLOOM_ERROR_RATE']
+        self.sync_seconds = config['REVOCATION_SYNC_SECONDS']
+        self.refresh_window = config['JWT_REFRESH_TOKEN_EXPIRES']
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        self.revoked_before = {}
+        self.synced_until = None
+        self.next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def _rebuild(self, now: datetime) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in db.session.scalars(select(RevokedToken.jti).where(RevokedToken.expires_at >= now)):
+            bloom.add(jti)
+        self.bloom = bloom
+
+    def sync(self, force: bool = False) -> None:
+        """Pull revocations made since the last sync"""
+        if not force and time.monotonic() < self.next_sync:
+            return
+
+        with self._lock:
+            if not force and time.monotonic() < self.next_sync:
+                return
+
+            now = datetime.utcnow()
+            if self.synced_until is None or self.bloom.count > self.capacity:
+                # First sync, or the filter is past its designed error rate
+                self._rebuild(now)
+            else:
+                for jti in db.session.scalars(
+                    select(RevokedToken.jti).where(RevokedToken.revoked_at >= self.synced_until)
+                ):
+                    self.bloom.add(jti)
+
+            # Cut-offs older than the longest token lifetime cannot match a live token
+            self.revoked_before = {
+                user_id: _timestamp(cutoff)
+                for user_id, cutoff in db.session.execute(
+                    select(User.id, User.tokens_revoked_before).where(
+                        User.tokens_revoked_before >= now - self.refresh_window
+                    )
+                )
+            }
+
+            self.synced_until = now - SYNC_OVERLAP
+            self.next_sync = time.monotonic() + self.sync_seconds
+
+    def is_revoked(self, payload: dict) -> bool:
+        self.sync()
+
+        cutoff = self.revoked_before.get(int(payload.get('sub', 0) or 0))
+        if cutoff is not None and payload.get('iat', 0) < cutoff:
+            return True
+
+        jti = payload.get('jti')
+        if not jti or jti not in self.bloom:
+            return False
+
+        return db.session.get(RevokedToken, jti) is not None
+
+    def add_token(self, jti: str) -> None:
+        with self._lock:
+            self.bloom.add(jti)
+
+    def add_user(self, user_id: int, cutoff: datetime) -> None:
+        with self._lock:
+            self.revoked_before[user_id] = _timestamp(cutoff)
+
+
+def get_revocation_list() -> RevocationList:
+    """Get the current app's revocation list, creating it on first use"""
+    revocations = current_app.extensions.get('jwt_revocation')
+    if revocations is None:
+        revocations = current_app.extensions.setdefault('jwt_revocation', RevocationList(current_app.config))
+    return revocations
+
+
+def is_token_revoked(jwt_header, jwt_payload) -> bool:
+    """JWTManager token_in_blocklist_loader callback"""
+    return get_revocation_list().is_revoked(jwt_payload)
+
+
+def revoke_token(jwt_payload: dict) -> None:
+    """Revoke one decoded token by its jti (caller commits)"""
+    jti = jwt_payload['jti']
+    if db.session.get(RevokedToken, jti) is None:
+        db.session.add(RevokedToken(
+            jti=jti,
+            user_id=int(jwt_payload['sub']) if jwt_payload.get('sub') else None,
+            token_type=jwt_payload.get('type', 'access'),
+            expires_at=datetime.utcfromtimestamp(jwt_payload['exp'])
+        ))
+    get_revocation_list().add_token(jti)
+
+
+def revoke_user_tokens(user: User) -> None:
+    """Revoke every token issued to a user so far (caller commits)"""
+    # iat has whole-second resolution, so the cut-off is the start of the
+    # next second: every token issued up to now, including earlier in this
+    # second, has iat < cutoff. A login later in this same second is
+    # revoked too and has to sign in again.
+    cutoff = datetime.utcnow().replace(microsecond=0) + timedelta(seconds=1)
+    user.tokens_revoked_before = cutoff
+    get_revocation_list().add_user(user.id, cutoff)
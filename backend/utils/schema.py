@@ -0,0 +1,71 @@
+"""
+Schema Upgrades
+
+Production workers no longer run create_all at boot (AUTO_CREATE_TABLES),
+so the schema is brought up to date by `flask db upgrade` at deploy time.
+It compares the models with the live database and only adds what is
+missing: tables, columns on existing tables, and indexes. Nothing is
+dropped or altered; removed columns stay until dropped by hand.
+"""
+from collections import namedtuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from models import db
+
+Step = namedtuple('Step', ['description', 'statement'])
+
+
+def plan_upgrade(connection) -> list:
+    """DDL steps needed to make the database match the models, in dependency order"""
+    inspector = inspect(connection)
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    existing_tables = set(inspector.get_table_names())
+    steps = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            steps.append(Step(f"create table {table.name}", CreateTable(table)))
+            for index in table.indexes:
+                steps.append(Step(f"create index {index.name}", CreateIndex(index)))
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            definition = CreateColumn(column).compile(dialect=dialect)
+            description = f"add column {table.name}.{column.name}"
+            steps.append(Step(description, text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}")))
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        existing_indexes |= {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                steps.append(Step(f"create index {index.name}", CreateIndex(index)))
+
+    return steps
+
+
+def upgrade_schema(dry_run: bool = False, log=None) -> list:
+    """
+    Apply the missing DDL, one step per transaction (MySQL commits DDL implicitly anyway)
+    Stops at the first failing step and re-raises its error.
+    Returns: descriptions of the steps applied (or planned, with dry_run)
+    """
+    with db.engine.connect() as connection:
+        steps = plan_upgrade(connection)
+
+    applied = []
+    for step in steps:
+        if log:
+            log(step.description)
+        if not dry_run:
+            with db.engine.begin() as connection:
+                connection.execute(step.statement)
+        applied.append(step.description)
+
+    return applied
@@ -2,7 +2,6 @@
 Security Utilities
 """
 import re
-import bleach
 
 
 def sanitize_input(value: str) -> str:
@@ -10,6 +9,9 @@ def sanitize_input(value: str) -> str:
     if not isinstance(value, str):
         return ''
     
+    # Imported on first use so workers boot without it
+    import bleach
+    
     # Remove HTML tags
     cleaned = bleach.clean(value, tags=[], strip=True)
     
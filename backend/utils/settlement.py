@@ -0,0 +1,98 @@
+"""
+Payment Settlement
+
+Applies confirmed Flutterwave charges to many pending payments at once:
+one UPDATE for the payments, one for the artists they pay for, and one
+counter bump, whatever the batch size. Used by the webhook event
+processor and by reconciliation.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import case, or_, select, update
+
+from models import db, Artist, Payment
+from .stats import bump_counters
+
+
+def check_charge(charge: dict) -> str:
+    """
+    Check a Flutterwave transaction is a successful registration fee payment
+    Returns: None if it can be applied, otherwise the reason it cannot
+    """
+    if charge.get('status') != 'successful':
+        return f"status is {charge.get('status')}"
+
+    expected_amount = current_app.config['ARTIST_REGISTRATION_FEE']
+    try:
+        amount = Decimal(str(charge.get('amount')))
+    except ArithmeticError:
+        return 'invalid amount'
+
+    if amount != expected_amount or charge.get('currency') != 'NGN':
+        return 'amount or currency mismatch'
+
+    return None
+
+
+def settle_charges(charges: list) -> dict:
+    """
+    Mark the pending payments matching these successful charges as paid (caller commits)
+    Each charge is a Flutterwave transaction dict (id, tx_ref, flw_ref, payment_type).
+    Charges for unknown or already-settled tx_refs are skipped.
+    Returns: dict with settled and artists_paid counts, and settled_refs
+    """
+    by_ref = {}
+    for charge in charges:
+        if charge.get('tx_ref'):
+            by_ref.setdefault(charge['tx_ref'], charge)
+
+    if not by_ref:
+        return {'settled': 0, 'artists_paid': 0, 'settled_refs': set()}
+
+    # Lock the pending rows so a concurrent verify or processor cannot settle them twice
+    pending = db.session.execute(
+        select(Payment.id, Payment.tx_ref, Payment.user_id)
+        .where(Payment.tx_ref.in_(list(by_ref)), Payment.status == 'pending')
+        .with_for_update()
+    ).all()
+
+    if not pending:
+        return {'settled': 0, 'artists_paid': 0, 'settled_refs': set()}
+
+    ids = {payment_id: by_ref[tx_ref] for payment_id, tx_ref, _ in pending}
+    now = datetime.utcnow()
+
+    settled = db.session.execute(
+        update(Payment)
+        .where(Payment.id.in_(list(ids)), Payment.status == 'pending')
+        .values(
+            status='successful',
+            transaction_id=case({pid: str(c.get('id')) for pid, c in ids.items()}, value=Payment.id),
+            flw_ref=case({pid: c.get('flw_ref') for pid, c in ids.items()}, value=Payment.id),
+            payment_type=case({pid: c.get('payment_type') for pid, c in ids.items()}, value=Payment.id),
+            verified_at=now
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    payment_for_user = {user_id: payment_id for payment_id, _, user_id in pending}
+    artists_paid = db.session.execute(
+        update(Artist)
+        .where(Artist.user_id.in_(list(payment_for_user)), or_(Artist.is_paid.is_(False), Artist.is_paid.is_(None)))
+        .values(
+            is_paid=True,
+            is_verified=True,
+            payment_id=case(payment_for_user, value=Artist.user_id)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    bump_counters(total_payments=settled, total_artists=artists_paid)
+
+    return {
+        'settled': settled,
+        'artists_paid': artists_paid,
+        'settled_refs': {tx_ref for _, tx_ref, _ in pending}
+    }
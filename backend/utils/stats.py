@@ -0,0 +1,91 @@
+"""
+Dashboard Stat Counters
+
+Write paths call bump_counters() inside their own transaction, so the
+counters commit or roll back together with the rows they count.
+"""
+import random
+
+from flask import current_app
+from sqlalchemy import case, func, insert, update
+
+from models import db, User, Artist, Song, Vote, Payment, StatsCounter
+
+COUNTERS = (
+    'total_users',
+    'total_artists',
+    'total_songs',
+    'pending_songs',
+    'approved_songs',
+    'total_votes',
+    'total_payments',
+)
+
+
+def bump_counters(**deltas) -> None:
+    """Add deltas to counters in a single UPDATE (caller commits)"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown stat counters: {', '.join(sorted(unknown))}")
+
+    slot = random.randrange(current_app.config['STATS_COUNTER_SLOTS'])
+
+    db.session.execute(
+        update(StatsCounter)
+        .where(StatsCounter.name.in_(deltas), StatsCounter.slot == slot)
+        .values(value=StatsCounter.value + case(deltas, value=StatsCounter.name, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def count_from_tables() -> dict:
+    """Recompute every counter with COUNT(*) queries"""
+    return {
+        'total_users': User.query.count(),
+        'total_artists': Artist.query.filter_by(is_paid=True).count(),
+        'total_songs': Song.query.count(),
+        'pending_songs': Song.query.filter_by(status='pending').count(),
+        'approved_songs': Song.query.filter_by(status='approved').count(),
+        'total_votes': Vote.query.count(),
+        'total_payments': Payment.query.filter_by(status='successful').count()
+    }
+
+
+def rebuild_counters() -> dict:
+    """Replace all counter rows with freshly counted totals (caller commits)"""
+    totals = count_from_tables()
+    slots = current_app.config['STATS_COUNTER_SLOTS']
+
+    StatsCounter.query.delete(synchronize_session=False)
+    db.session.execute(insert(StatsCounter), [
+        {'name': name, 'slot': slot, 'value': totals[name] if slot == 0 else 0}
+        for name in COUNTERS
+        for slot in range(slots)
+    ])
+
+    return totals
+
+
+def read_counters() -> dict:
+    """
+    Read every counter in one query
+    Rebuilds the table first if it is empty or was seeded with a different slot count.
+    """
+    rows = db.session.query(
+        StatsCounter.name,
+        func.sum(StatsCounter.value),
+        func.count()
+    ).group_by(StatsCounter.name).all()
+
+    slots = current_app.config['STATS_COUNTER_SLOTS']
+    totals = {name: int(total or 0) for name, total, seeded in rows if seeded == slots}
+
+    if set(totals) != set(COUNTERS):
+        totals = rebuild_counters()
+        db.session.commit()
+
+    return totals
@@ -0,0 +1,220 @@
+"""
+Bulk User Import
+
+Reads a CSV of users (and optional artist profiles) in batches. While the
+hashing pool works on one batch, the previous batch is inserted with
+executemany INSERTs and committed, so neither the pool nor the database
+waits on the other.
+
+CSV columns: email, username, password and optionally stage_name, bio and
+genre. Rows with a stage_name also get an artist profile.
+"""
+import csv
+import os
+from itertools import islice
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Artist
+from .passwords import hashing_pool, hash_many
+from .security import sanitize_input, validate_email, validate_password, validate_username
+from .stats import bump_counters
+
+REQUIRED_COLUMNS = ('email', 'username', 'password')
+REJECT_COLUMNS = ('line', 'email', 'username', 'reason')
+
+
+def _clean_row(row: dict) -> tuple:
+    """
+    Normalize and validate one CSV row
+    Returns: (record: dict or None, reason: str or None)
+    """
+    email = sanitize_input(row.get('email') or '').lower()
+    username = sanitize_input(row.get('username') or '')
+    password = row.get('password') or ''
+    stage_name = sanitize_input(row.get('stage_name') or '')
+
+    if not validate_email(email):
+        return None, 'Invalid email format'
+
+    username_valid, username_msg = validate_username(username)
+    if not username_valid:
+        return None, username_msg
+
+    password_valid, password_msg = validate_password(password)
+    if not password_valid:
+        return None, password_msg
+
+    record = {'email': email, 'username': username, 'password': password}
+    if stage_name:
+        record['artist'] = {
+            'stage_name': stage_name,
+            'bio': sanitize_input(row.get('bio') or '') or None,
+            'genre': sanitize_input(row.get('genre') or '') or None
+        }
+
+    return record, None
+
+
+def _existing(records: list) -> tuple:
+    """Emails and usernames of a batch that are already registered"""
+    emails = [record['email'] for record in records]
+    usernames = [record['username'] for record in records]
+
+    taken_emails = set(db.session.scalars(select(User.email).where(User.email.in_(emails))))
+    taken_usernames = set(db.session.scalars(select(User.username).where(User.username.in_(usernames))))
+    return taken_emails, taken_usernames
+
+
+def _filter_existing(records: list, reject) -> list:
+    taken_emails, taken_usernames = _existing(records)
+    fresh = []
+
+    for record in records:
+        if record['email'] in taken_emails:
+            reject(record, 'Email already registered')
+        elif record['username'] in taken_usernames:
+            reject(record, 'Username already taken')
+        else:
+            fresh.append(record)
+
+    return fresh
+
+
+def _insert_batch(records: list, hashes: list, mark_paid: bool) -> tuple:
+    """
+    Insert users, then artist profiles for the rows that have one (caller commits)
+    Returns: (users inserted, artists inserted)
+    """
+    db.session.execute(insert(User), [
+        {
+            'email': record['email'],
+            'username': record['username'],
+            'password_hash': password_hash,
+            'roles': ['artist'] if 'artist' in record else ['user']
+        }
+        for record, password_hash in zip(records, hashes)
+    ])
+
+    artists = [record for record in records if 'artist' in record]
+    if artists:
+        # MySQL has no INSERT ... RETURNING, so look the new ids up by email
+        user_ids = dict(db.session.execute(
+            select(User.email, User.id).where(User.email.in_([record['email'] for record in artists]))
+        ).all())
+
+        db.session.execute(insert(Artist), [
+            dict(record['artist'], user_id=user_ids[record['email']], is_paid=mark_paid)
+            for record in artists
+        ])
+
+    bump_counters(total_users=len(records), total_artists=len(artists) if mark_paid else 0)
+    return len(records), len(artists)
+
+
+def import_users(stream, reject_stream, batch_size: int = 1000, max_workers: int = None,
+                 mark_paid: bool = False) -> dict:
+    """
+    Import users from a CSV text stream, writing rejected rows to reject_stream
+    Each batch is committed on its own; a failed batch does not undo earlier ones.
+    Returns: dict with read, imported, artists and rejected counts
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+    rejects = csv.writer(reject_stream)
+    rejects.writerow(REJECT_COLUMNS)
+    summary = {'read': 0, 'imported': 0, 'artists': 0, 'rejected': 0}
+
+    def reject(record, reason):
+        rejects.writerow([record['line'], record.get('email', ''), record.get('username', ''), reason])
+        summary['rejected'] += 1
+
+    seen_emails = set()
+    seen_usernames = set()
+
+    def read_batch():
+        """Returns: (rows read, records that passed validation)"""
+        rows = 0
+        records = []
+        for row in islice(reader, batch_size):
+            rows += 1
+            record, reason = _clean_row(row)
+            if record is None:
+                reject({'line': reader.line_num, 'email': row.get('email'), 'username': row.get('username')}, reason)
+                continue
+
+            record['line'] = reader.line_num
+            if record['email'] in seen_emails:
+                reject(record, 'Duplicate email in file')
+            elif record['username'] in seen_usernames:
+                reject(record, 'Duplicate username in file')
+            else:
+                seen_emails.add(record['email'])
+                seen_usernames.add(record['username'])
+                records.append(record)
+
+        summary['read'] += rows
+        return rows, records
+
+    def flush(records, hashing):
+        hashes = dict(zip(map(id, records), hashing))
+        try:
+            users, artists = _insert_batch(records, [hashes[id(record)] for record in records], mark_paid)
+            db.session.commit()
+        except IntegrityError:
+            # Someone registered one of these while the batch was hashing
+            db.session.rollback()
+            records = _filter_existing(records, reject)
+            if not records:
+                return
+            try:
+                users, artists = _insert_batch(records, [hashes[id(record)] for record in records], mark_paid)
+                db.session.commit()
+            except IntegrityError:
+                # Another collision (a concurrent registration or a taken
+                # stage name): fall back to one row at a time
+                db.session.rollback()
+                users, artists = flush_rows(records, hashes)
+
+        summary['imported'] += users
+        summary['artists'] += artists
+
+    def flush_rows(records, hashes):
+        """Insert and commit row by row, rejecting the rows that still collide"""
+        users = artists = 0
+        for record in records:
+            try:
+                inserted = _insert_batch([record], [hashes[id(record)]], mark_paid)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                reject(record, 'Duplicate email, username or stage name')
+                continue
+            users += inserted[0]
+            artists += inserted[1]
+        return users, artists
+
+    with hashing_pool(max_workers or os.cpu_count()) as executor:
+        pending = None
+
+        while True:
+            rows, records = read_batch()
+            if records:
+                records = _filter_existing(records, reject)
+
+            # Queue this batch in the pool before inserting the previous one,
+            # so the pool stays busy while the database works
+            current = (records, hash_many(executor, [record['password'] for record in records])) if records else None
+
+            if pending:
+                flush(*pending)
+            pending = current
+
+            if not rows:
+                break
+
+    return summary